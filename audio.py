@@ -0,0 +1,49 @@
+# Audio manager. Long ambient tracks are streamed through pygame.mixer.music,
+# which decodes a little at a time, instead of being decoded whole into RAM
+# as Sounds. A track only starts or stops when the game changes state. Short
+# effects are decoded on first use into a small LRU of Sounds and play on
+# reserved channels, so they never compete with each other for a channel.
+from collections import OrderedDict
+
+import pygame
+
+
+class Audio:
+    def __init__(self, channels, max_effects=4):
+        # channels: names of the mixer channels to reserve, e.g. ("ui",
+        # "jingle"); each effect plays on one of them, cutting off whatever
+        # that channel was playing
+        pygame.mixer.set_reserved(len(channels))
+        self.channels = {name: pygame.mixer.Channel(i) for i, name in enumerate(channels)}
+        self.max_effects = max_effects
+        self.effects = OrderedDict()
+        self.track = None
+
+    def play_track(self, path, fade_ms=500):
+        # Loop the track at path, or stop the music for None. Asking for the
+        # track that is already playing does nothing.
+        if path == self.track:
+            return
+        self.track = path
+        if path is None:
+            pygame.mixer.music.fadeout(fade_ms)
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.play(-1, fade_ms=fade_ms)
+
+    def sound(self, path):
+        sound = self.effects.get(path)
+        if sound is not None:
+            self.effects.move_to_end(path)
+            return sound
+        sound = pygame.mixer.Sound(path)
+        self.effects[path] = sound
+        while len(self.effects) > self.max_effects:
+            self.effects.popitem(last=False)
+        return sound
+
+    def play(self, path, channel):
+        self.channels[channel].play(self.sound(path))
+
+    def stop(self, channel):
+        self.channels[channel].stop()
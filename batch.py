@@ -0,0 +1,97 @@
+# Vectorized scoring for bulk analysis. Hands are uint8 arrays of shape
+# (N, 3) holding card ids (see rules.card_id); dice are uint8 arrays of shape
+# (N, 3) holding face indices into POKER_DICE. Short hands and missing dice
+# are padded with PAD. Results come from the same tables as rules.score_hand
+# and rules.calc_multiplier.
+import numpy as np
+
+from rules import (
+    HAND_CATEGORIES,
+    HAND_STRIDE,
+    HAND_TABLE,
+    MULTIPLIER_TABLE,
+    NO_CARD,
+    POKER_DICE,
+    RANKS,
+    RANK_INDEX,
+)
+
+PAD = 255
+CATEGORY_NAMES = [name for name, _ in HAND_CATEGORIES]
+BASE_SCORES = np.array([score for _, score in HAND_CATEGORIES], dtype=np.uint8)
+
+_hand_table = np.frombuffer(HAND_TABLE, dtype=np.uint8)
+_multiplier_table = np.frombuffer(MULTIPLIER_TABLE, dtype=np.uint8)
+
+
+def encode_hands(hands):
+    out = np.full((len(hands), 3), PAD, dtype=np.uint8)
+    for row, hand in enumerate(hands):
+        for col, card in enumerate(hand):
+            out[row, col] = card.id
+    return out
+
+
+def encode_dice(rolls):
+    # rolls: Dice objects or lists of faces such as ["9", "K", "K"]
+    out = np.full((len(rolls), 3), PAD, dtype=np.uint8)
+    for row, roll in enumerate(rolls):
+        for col, face in enumerate(getattr(roll, "dice", roll)):
+            out[row, col] = RANK_INDEX[face]
+    return out
+
+
+def _check_shape(array, name, limit):
+    # limit: one past the largest valid id; anything else but PAD would
+    # index past the tables
+    array = np.asarray(array, dtype=np.uint8)
+    if array.ndim != 2 or array.shape[1] != 3:
+        raise ValueError(f"{name} must have shape (N, 3), got {array.shape}")
+    # Wrapping uint8 subtraction maps limit..PAD-1 below PAD - limit and
+    # everything valid above it, so the common case is one cheap pass
+    if (array - np.uint8(limit) < np.uint8(PAD - limit)).any():
+        row = np.flatnonzero(((array >= limit) & (array != PAD)).any(axis=1))[0]
+        raise ValueError(f"{name} row {row} has an id out of range: {array[row].tolist()}")
+    return array
+
+
+def _rank_masks(array):
+    # Per-row bit mask of the ranks present plus the count of non-PAD slots
+    valid = array != PAD
+    bits = np.left_shift(np.uint8(1), array % len(RANKS), dtype=np.uint8)
+    bits[~valid] = 0
+    return np.bitwise_or.reduce(bits, axis=1), valid.sum(axis=1)
+
+
+def score_hands_batch(hands):
+    # Returns (category ids, base scores), both uint8 arrays of length N
+    hands = _check_shape(hands, "hands", NO_CARD)
+    ids = np.where(hands == PAD, NO_CARD, hands).astype(np.intp)
+    keys = (ids[:, 0] * HAND_STRIDE + ids[:, 1]) * HAND_STRIDE + ids[:, 2]
+    categories = _hand_table[keys]
+    return categories, BASE_SCORES[categories]
+
+
+def multipliers_batch(hands, dice):
+    # Returns the dice multiplier per row as a uint8 array of length N; a row
+    # with no dice scores x1 like an unrolled hand
+    hands = _check_shape(hands, "hands", NO_CARD)
+    dice = _check_shape(dice, "dice", len(POKER_DICE))
+    if len(hands) != len(dice):
+        raise ValueError("hands and dice must have the same number of rows")
+    hand_mask, hand_size = _rank_masks(hands)
+    dice_mask, _ = _rank_masks(dice)
+    keys = (
+        (hand_size.astype(np.intp) << 12)
+        | (hand_mask.astype(np.intp) << 6)
+        | dice_mask.astype(np.intp)
+    )
+    return _multiplier_table[keys]
+
+
+if __name__ == "__main__":
+    import sys
+
+    import checks
+
+    sys.exit(checks.run("batch"))
@@ -0,0 +1,1013 @@
+# Benchmarks for the rules core and the pygame front end.
+#
+#   python bench.py memory [--holes 72] [--seed 0]
+#   python bench.py blit [--frames 2000]
+#   python bench.py hud [--frames 500]
+#   python bench.py dice [--frames 2000]
+#   python bench.py startup [--runs 5]
+#   python bench.py audio [--seconds 5] [--track assets/casino.mp3]
+#   python bench.py resize [--size 3840x2160]
+#   python bench.py scores [--games 1000000]
+#   python bench.py vecenv [--games 4096] [--steps 300]
+#   python bench.py replay [--games 20000] [--workers 1]
+#   python bench.py history [--games 20000] [--copies 20]
+#   python bench.py layers [--frames 300]
+#   python bench.py latency [--work-ms 0] [--seed 0]
+#   python bench.py suite [--baseline bench_baseline.json] [--threshold 0.5] [--runs 3] [--update]
+#
+# Front-end benchmarks run under the SDL dummy video/audio drivers unless
+# SDL_VIDEODRIVER/SDL_AUDIODRIVER are already set. Benchmarks that import
+# cardgame need the full asset set in assets/.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import rules
+from rules import (
+    CARDS,
+    MODES,
+    RANK_INDEX,
+    RANKS,
+    SUITS,
+    Deck,
+    Dice,
+    GameState,
+    calc_multiplier,
+    card_id,
+    score_hand,
+    values,
+)
+from simulate import GreedyPolicy, play_hole
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+def init_display(size=(800, 600)):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+
+    pygame.display.init()
+    pygame.font.init()
+    return pygame.display.set_mode(size)
+
+
+def load_face(card):
+    import pygame
+
+    return pygame.image.load(os.path.join(ASSETS, f"{card.rank}{card.suit}.png"))
+
+
+def time_frames(frames, draw):
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    return (time.perf_counter() - start) / frames
+
+
+class ListCard:
+    # Card as it was before the flyweights: a plain object with a __dict__
+    def __init__(self, rank, suit):
+        self.rank = rank
+        self.suit = suit
+        self.value = values[rank]
+        self.id = card_id(rank, suit)
+        self.rank_bit = 1 << RANK_INDEX[rank]
+
+
+class ListDeck:
+    # The shoe as it was before the bytearray: a list of new Card objects,
+    # rebuilt whenever it runs low. Same order and rng calls as Deck, so the
+    # same game is played; bench_memory's baseline.
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.cards = [ListCard(rank, suit) for suit in SUITS for rank in RANKS] * 3
+        self.shuffle()
+
+    def shuffle(self):
+        self.rng.shuffle(self.cards)
+
+    def deal(self, count):
+        if len(self.cards) < count:
+            self.cards = [ListCard(rank, suit) for suit in SUITS for rank in RANKS] * 3
+            self.shuffle()
+        return [self.cards.pop() for _ in range(count)]
+
+
+def trace_game(holes, seed):
+    # (game, retained bytes, peak bytes, snapshot diff) for one headless game
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    game = GameState(holes, random.Random(seed))
+    policy = GreedyPolicy()
+    while not game.is_over():
+        play_hole(game, policy)
+    current, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().compare_to(start, "lineno")
+    tracemalloc.stop()
+    return game, current - base, peak - base, stats
+
+
+def bench_memory(holes=72, seed=0, top=5):
+    # tracemalloc report for one headless game: memory still held by the
+    # finished GameState, the peak while playing, and the biggest
+    # allocation sites in the rules core, against the same game played
+    # with the list-of-Card shoe
+    real_deck = rules.Deck
+    rules.Deck = ListDeck
+    try:
+        baseline, baseline_retained, baseline_peak, _ = trace_game(holes, seed)
+    finally:
+        rules.Deck = real_deck
+    game, retained, peak, stats = trace_game(holes, seed)
+    assert baseline.score == game.score
+    return {
+        "holes": holes,
+        "score": game.score,
+        "baseline_retained_bytes": baseline_retained,
+        "baseline_peak_bytes": baseline_peak,
+        "retained_bytes": retained,
+        "peak_bytes": peak,
+        "top_sites": [
+            (str(stat.traceback), stat.size_diff)
+            for stat in stats
+            if "rules.py" in str(stat.traceback)
+        ][:top],
+    }
+
+
+def bench_blit(frames=2000):
+    # Per-frame cost of blitting a three-card hand the way draw_hand does:
+    # individually loaded, scaled, unconverted faces vs. atlas subsurfaces
+    import pygame
+
+    from sprites import CardSprites
+
+    screen = init_display()
+    hand = [CARDS[4], CARDS[10], CARDS[17]]
+    size = (100, 140)
+    loose = [pygame.transform.scale(load_face(card), size) for card in hand]
+    sprites = CardSprites(load_face, (size[0] * 3, size[1] * 3))
+    atlas = [sprites.get(card, size) for card in hand]
+
+    def draw(faces):
+        for i, face in enumerate(faces):
+            screen.blit(face, (295 + i * 105, 210))
+
+    return {
+        "loose_us": time_frames(frames, lambda: draw(loose)) * 1e6,
+        "atlas_us": time_frames(frames, lambda: draw(atlas)) * 1e6,
+    }
+
+
+# Strings a playing-screen frame renders: scoreboard, dice, score box,
+# buttons and the MENU label, as (font name, size, text, color)
+HUD_TEXT = [
+    ("arial", 36, "HOLE: 4/9", (0, 255, 255)),
+    ("arial", 36, "SCORE: 42", (255, 255, 0)),
+    ("arial", 36, "HIGH: 97", (0, 255, 0)),
+    ("arial", 24, "K", (255, 255, 255)),
+    ("arial", 24, "Q", (255, 255, 255)),
+    ("arial", 24, "9", (255, 255, 255)),
+    ("arial", 30, "Pair - 2 x4", (247, 193, 43)),
+    ("arial", 20, "DISCARD", (0, 0, 0)),
+    ("arial", 20, "REROLL", (0, 0, 0)),
+    ("arial", 20, "LOCK IN", (0, 0, 0)),
+    ("arial", 36, "MENU", (0, 0, 0)),
+]
+
+
+def bench_hud(frames=500):
+    # Per-frame HUD text cost: fonts held at import plus a SysFont lookup for
+    # the score box every frame (the old update_score_display) vs TextCache
+    import pygame
+
+    from textcache import TextCache
+
+    init_display()
+    fonts = {size: pygame.font.SysFont(name, size, bold=True) for name, size, _, _ in HUD_TEXT}
+    cache = TextCache()
+    cached = {size: cache.font(name, size, bold=True) for name, size, _, _ in HUD_TEXT}
+
+    def uncached():
+        fonts[30] = pygame.font.SysFont("arial", 30, bold=True)
+        for _, size, text, color in HUD_TEXT:
+            fonts[size].render(text, True, color)
+
+    def with_cache():
+        for _, size, text, color in HUD_TEXT:
+            cached[size].render(text, True, color)
+
+    return {
+        "uncached_us": time_frames(frames, uncached) * 1e6,
+        "cached_us": time_frames(frames, with_cache) * 1e6,
+    }
+
+
+def import_cardgame():
+    init_display()
+    # Benchmark games stay out of the player's score history
+    os.environ.setdefault("ROYALSET_SCORES", "")
+    import cardgame
+
+    return cardgame
+
+
+def bench_dice(frames=2000, seed=0):
+    # Per-frame cost of the dice row: drawing each die from primitives (the
+    # old draw_dice_row) vs one sprite blit per die
+    cardgame = import_cardgame()
+    game = GameState(9, random.Random(seed))
+    game.roll()
+    game.toggle_keep(0)
+    layout = cardgame.playing_layout(
+        cardgame.WIDTH, cardgame.HEIGHT, 1, len(game.hand), game.dice.count
+    )
+
+    def primitives():
+        for i, die in enumerate(game.dice.dice):
+            matched = die in [card.rank for card in game.hand]
+            rect = layout.rect("die", i)
+            cardgame.draw_die(cardgame.screen, rect, die, matched, game.dice.kept[i])
+
+    return {
+        "primitives_us": time_frames(frames, primitives) * 1e6,
+        "sprites_us": time_frames(frames, lambda: cardgame.draw_dice_row(game, layout)) * 1e6,
+    }
+
+
+# Run in a fresh interpreter: import the game and draw the first menu frame
+# and a hand of cards, printing the seconds that took
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import bench
+cardgame = bench.import_cardgame()
+cardgame.screen.blit(cardgame.background_image, (0, 0))
+cardgame.screen.blit(cardgame.playbutton_image, (0, 0))
+cardgame.screen.blit(cardgame.background, (0, 0))
+for card in bench.CARDS[:3]:
+    cardgame.draw_card(cardgame.screen, card, 0, 0)
+print(time.perf_counter() - start)
+"""
+
+
+def bench_startup(runs=5):
+    # Cold start to the first frame with the asset bundle vs decoding and
+    # scaling the image files (ROYALSET_BUNDLE=""). Each run is a new
+    # process, though the OS file cache stays warm between runs.
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    for label, bundle in (("files", ""), ("bundle", None)):
+        env = dict(os.environ)
+        if bundle is None:
+            env.pop("ROYALSET_BUNDLE", None)
+        else:
+            env["ROYALSET_BUNDLE"] = bundle
+        times = [
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", STARTUP_SCRIPT],
+                    cwd=here, env=env, capture_output=True, text=True, check=True,
+                ).stdout.split()[-1]
+            )
+            for _ in range(runs)
+        ]
+        report[f"{label}_ms"] = statistics.median(times) * 1e3
+    return report
+
+
+# Run in a fresh interpreter: hold an ambient track for some seconds of 60 FPS
+# frames, either decoded as a Sound and played every frame (the old
+# draw_hand/handle_menu) or streamed once through mixer.music. Prints the
+# resident-memory growth in bytes and the process CPU seconds.
+AUDIO_SCRIPT = """
+import os, sys, time
+import bench
+import pygame
+bench.init_display()
+pygame.mixer.init()
+mode, track, seconds = sys.argv[1], sys.argv[2], float(sys.argv[3])
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+base = rss()
+cpu = time.process_time()
+if mode == "sound":
+    sound = pygame.mixer.Sound(track)
+else:
+    from audio import Audio
+    Audio(("ui", "jingle")).play_track(track)
+clock = pygame.time.Clock()
+for _ in range(int(seconds * 60)):
+    if mode == "sound":
+        sound.play()
+    clock.tick(60)
+print(rss() - base, time.process_time() - cpu)
+"""
+
+
+def bench_audio(seconds=5, track=None):
+    # Resident memory and CPU for an ambient track, decoded Sound replayed
+    # every frame vs streamed (see AUDIO_SCRIPT). Linux only (/proc).
+    here = os.path.dirname(os.path.abspath(__file__))
+    track = track or os.path.join(ASSETS, "casino.mp3")
+    report = {}
+    for mode in ("sound", "stream"):
+        out = subprocess.run(
+            [sys.executable, "-c", AUDIO_SCRIPT, mode, track, str(seconds)],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        report[f"{mode}_bytes"] = int(out[-2])
+        report[f"{mode}_cpu"] = float(out[-1])
+    return report
+
+
+def micro(operation, loops, repeat=5):
+    # ns per call of operation(i) for i in range(loops), best of repeat runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for i in range(loops):
+            operation(i)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / loops
+
+
+def bench_micro(loops=20000, seed=0):
+    # Rules-core hot paths on pre-generated hands and dice
+    rng = random.Random(seed)
+    hands = [rng.sample(CARDS, 3) for _ in range(1024)]
+    dice = []
+    for _ in range(1024):
+        roll = Dice(3, rng)
+        roll.roll()
+        dice.append(roll)
+    deck = Deck(rng)
+    roller = Dice(3, rng)
+    return {
+        "score_hand_ns": micro(lambda i: score_hand(hands[i & 1023]), loops),
+        "calc_multiplier_ns": micro(lambda i: calc_multiplier(hands[i & 1023], dice[i & 1023]), loops),
+        "deck_deal_ns": micro(lambda i: deck.deal(3), loops),
+        "dice_roll_ns": micro(lambda i: roller.roll(), loops),
+    }
+
+
+# Scripted session for drive_game, as (frames to wait, event type, attrs):
+# start a 9-hole game, then each hole select a card, discard, roll, keep a
+# die, reroll and lock in; back to the menu from game over, then quit
+def game_script():
+    import pygame
+
+    click = pygame.MOUSEBUTTONDOWN
+    hole = [
+        (10, click, {"pos": (290, 300), "button": 1}),
+        (10, click, {"pos": (200, 520), "button": 1}),
+        (10, click, {"pos": (400, 520), "button": 1}),
+        (10, click, {"pos": (400, 385), "button": 1}),
+        (10, click, {"pos": (400, 520), "button": 1}),
+        (10, click, {"pos": (600, 520), "button": 1}),
+    ]
+    return (
+        [(10, click, {"pos": (650, 130), "button": 1})]
+        + hole * 9
+        + [(30, click, {"pos": (400, 530), "button": 1}), (30, pygame.QUIT, {})]
+    )
+
+
+class ScriptedClock:
+    # Stands in for cardgame's Clock: each tick() ends a frame, records its
+    # duration and posts the script's next event when due. Frames without
+    # input get a no-op USEREVENT so the loop never idles, and nothing
+    # sleeps, so the frame rate is uncapped.
+    def __init__(self, script, on_frame=None):
+        import pygame
+
+        self.pygame = pygame
+        self.script = list(script)
+        self.wait = self.script[0][0] if self.script else 0
+        self.on_frame = on_frame
+        self.frame_ns = []
+        self.last = time.perf_counter_ns()
+
+    def tick(self, framerate=0):
+        now = time.perf_counter_ns()
+        self.frame_ns.append(now - self.last)
+        self.last = now
+        if self.on_frame:
+            self.on_frame()
+        # Posted events always carry an attribute: with pygame 2.6.1,
+        # building attribute-less Events in this loop corrupted the
+        # reference count of unrelated objects and crashed the run
+        if self.script and self.wait <= 0:
+            _, kind, attrs = self.script.pop(0)
+            self.pygame.event.post(self.pygame.event.Event(kind, scripted=True, **attrs))
+            self.wait = self.script[0][0] if self.script else 0
+        else:
+            self.wait -= 1
+            self.pygame.event.post(self.pygame.event.Event(self.pygame.USEREVENT, scripted=True))
+        return 0
+
+
+def drive_game(trace_alloc=False, seed=0):
+    # Play game_script() through cardgame.main. Timing run: frames/sec and
+    # per-stage times from the frame profiler. Allocation run (tracemalloc
+    # slows everything down, so it is separate): peak and retained bytes.
+    cardgame = import_cardgame()
+    # The solver warm-up runs once per process; finish it first so frames
+    # and allocations are those of steady play
+    cardgame.warm_hints(float("inf"))
+    random.seed(seed)
+    cardgame.profiler.enabled = not trace_alloc
+    report = {}
+
+    def sample_memory():
+        report["alloc_peak_kib"] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+        report["alloc_retained_kib"] = (tracemalloc.get_traced_memory()[0] - base) / 1024
+
+    if trace_alloc:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    clock = cardgame.pacer.clock = ScriptedClock(game_script(), sample_memory if trace_alloc else None)
+    start = time.perf_counter()
+    try:
+        cardgame.main()
+    except SystemExit:
+        pass
+    elapsed = time.perf_counter() - start
+    if trace_alloc:
+        tracemalloc.stop()
+        return report
+    frames = sorted(clock.frame_ns)
+    report["frames"] = len(frames)
+    report["fps"] = len(frames) / elapsed
+    report["frame_ms_p50"] = frames[len(frames) // 2] / 1e6
+    report["frame_ms_p95"] = frames[len(frames) * 95 // 100] / 1e6
+    for name, _, p50, p95, _ in cardgame.profiler.report():
+        report[f"stage_ms_p50.{name}"] = p50
+        report[f"stage_ms_p95.{name}"] = p95
+    return report
+
+
+def bench_scores(games=1000000, seed=0):
+    # Score store with a long history: cost of record() on the game loop,
+    # batched write throughput, opening the store (loading the highs), and
+    # top-N/stats queries from the index and summary table vs computing
+    # them from the history
+    import tempfile
+
+    from scores import ScoreStore
+
+    rng = random.Random(seed)
+    rows = [(rng.choice(MODES), rng.randint(-50, 2000)) for _ in range(games)]
+    report = {"games": games}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scores.db")
+        store = ScoreStore(path)
+        start = time.perf_counter()
+        record_ns = []
+        for mode, score in rows:
+            t = time.perf_counter_ns()
+            store.record(mode, score)
+            record_ns.append(time.perf_counter_ns() - t)
+        store.flush()
+        report["write_rows_per_s"] = games / (time.perf_counter() - start)
+        record_ns.sort()
+        report["record_us_p50"] = record_ns[len(record_ns) // 2] / 1e3
+        report["record_us_p99"] = record_ns[len(record_ns) * 99 // 100] / 1e3
+        store.close()
+
+        start = time.perf_counter()
+        store = ScoreStore(path)
+        report["open_ms"] = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        for mode in MODES:
+            store.top(mode)
+            store.stats(mode)
+        report["queries_ms_index"] = (time.perf_counter() - start) * 1e3 / len(MODES)
+        start = time.perf_counter()
+        for mode in MODES:
+            store.db.execute(
+                "SELECT score, finished FROM games NOT INDEXED WHERE mode = ? "
+                "ORDER BY score DESC LIMIT 10",
+                (mode,),
+            ).fetchall()
+            store.db.execute(
+                "SELECT COUNT(*), AVG(score), MAX(score) FROM games WHERE mode = ?", (mode,)
+            ).fetchone()
+        report["queries_ms_scan"] = (time.perf_counter() - start) * 1e3 / len(MODES)
+        store.close()
+    return report
+
+
+def bench_vecenv(games=4096, steps=300, seed=0):
+    # VectorEnv.step vs stepping one GameState per game through the same
+    # actions (random legal ones, recorded from the VectorEnv run; with the
+    # same seeds both sides see the same games)
+    import numpy as np
+
+    from vecenv import VectorEnv, random_actions, step_game
+
+    env = VectorEnv(9, [random.Random(f"{seed}/{i}") for i in range(games)])
+    policy = np.random.default_rng(seed)
+    recorded = []
+    vector_s = 0.0
+    finished = 0
+    for _ in range(steps):
+        actions = random_actions(env.legal_actions(), policy)
+        recorded.append(actions.tolist())
+        start = time.perf_counter()
+        _, dones = env.step(actions)
+        vector_s += time.perf_counter() - start
+        finished += int(dones.sum())
+
+    states = [GameState(9, random.Random(f"{seed}/{i}")) for i in range(games)]
+    start = time.perf_counter()
+    for actions in recorded:
+        for i, action in enumerate(actions):
+            _, done = step_game(states[i], action)
+            if done:
+                states[i] = GameState(9, states[i].rng)
+    scalar_s = time.perf_counter() - start
+    assert [game.score for game in states] == env.score.tolist()
+    return {
+        "games": games,
+        "steps": steps,
+        "finished": finished,
+        "vector_steps_per_s": games * steps / vector_s,
+        "scalar_steps_per_s": games * steps / scalar_s,
+    }
+
+
+def bench_replay(games=20000, workers=1, seed=0):
+    # Replay log: recording overhead on live play, log size, streaming parse
+    # speed and replay (re-simulation) speed
+    import tempfile
+
+    from replay import RecordedGame, Recorder, read_games, verify
+
+    policy = GreedyPolicy()
+
+    def play(recorder):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(games):
+            game_seed = rng.getrandbits(64)
+            if recorder is None:
+                game = GameState(9, random.Random(game_seed))
+            else:
+                game = RecordedGame(9, game_seed, recorder)
+            while not game.is_over():
+                play_hole(game, policy)
+            if recorder is not None:
+                game.finish()
+        return time.perf_counter() - start
+
+    report = {"games": games}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.log")
+        plain_s = play(None)
+        recorder = Recorder(path)
+        recorded_s = play(recorder)
+        recorder.close()
+        report["log_bytes"] = os.path.getsize(path)
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            actions = sum(len(game[2]) for game in read_games(f))
+        report["parse_mb_per_s"] = report["log_bytes"] / 1e6 / (time.perf_counter() - start)
+        start = time.perf_counter()
+        replayed, _, mismatches, error = verify(path, workers)
+        replay_s = time.perf_counter() - start
+        assert replayed == games and not mismatches and error is None
+    report["actions"] = actions
+    report["record_overhead_us"] = (recorded_s - plain_s) * 1e6 / actions
+    report["record_overhead_pct"] = (recorded_s - plain_s) * 100 / plain_s
+    report["replay_actions_per_s"] = actions / replay_s
+    return report
+
+
+def bench_history(games=20000, copies=20, seed=0):
+    # Hand history: lock-in overhead of exporting on live play, bytes per
+    # hole, and memory-mapped aggregation speed over `copies` chunks
+    import shutil
+    import tempfile
+
+    from history import HandHistory, HistoryWriter
+
+    policy = GreedyPolicy()
+
+    def play(history):
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(games):
+            game = GameState(9, rng, history=history)
+            while not game.is_over():
+                play_hole(game, policy)
+        if history is not None:
+            history.close()
+        return time.perf_counter() - start
+
+    report = {"holes": games * 9}
+    with tempfile.TemporaryDirectory() as directory:
+        plain_s = play(None)
+        exported_s = play(HistoryWriter(directory, prefix="bench-"))
+        chunk = os.path.join(directory, "bench-000000")
+        report["bytes_per_hole"] = sum(
+            os.path.getsize(os.path.join(chunk, name)) for name in os.listdir(chunk)
+        ) / report["holes"]
+        for copy in range(1, copies):
+            shutil.copytree(chunk, os.path.join(directory, f"copy-{copy:06d}"))
+        history = HandHistory(directory)
+        start = time.perf_counter()
+        history.category_counts()
+        history.multiplier_by_hand_size()
+        holes = history.reroll_usage()[0]
+        report["aggregate_holes_per_s"] = holes / (time.perf_counter() - start)
+    report["export_overhead_us"] = (exported_s - plain_s) * 1e6 / report["holes"]
+    report["export_overhead_pct"] = (exported_s - plain_s) * 100 / plain_s
+    return report
+
+
+def bench_layers(frames=300, seed=0):
+    # Cost of redrawing the menu and playing screens in full: every static
+    # element drawn each frame (layers off, the old handlers) vs one blit of
+    # the cached static layer with the dynamic content on top. Both must
+    # leave the same pixels.
+    cardgame = import_cardgame()
+    import pygame
+
+    game = GameState(9, random.Random(seed))
+    game.roll()
+    screens = {
+        "menu": lambda: cardgame.render_menu({mode: 0 for mode in MODES}),
+        "playing": lambda: cardgame.render_playing(game),
+    }
+    report = {}
+    for name, handle in screens.items():
+
+        def frame():
+            cardgame.renderer.invalidate()
+            handle()
+            cardgame.renderer.pending.clear()
+
+        pixels = []
+        for enabled in (False, True):
+            cardgame.ui.layers.enabled = enabled
+            frame()
+            report[f"{name}_{'layered' if enabled else 'direct'}_us"] = (
+                time_frames(frames, frame) * 1e6
+            )
+            pixels.append(pygame.image.tobytes(cardgame.screen, "RGB"))
+        assert pixels[0] == pixels[1], name
+    return report
+
+
+RESIZE_FRAME = 60
+STEADY_FRAMES = 120
+
+
+def bench_resize(size=(3840, 2160), seed=0):
+    # Start a game from the menu and resize the window at RESIZE_FRAME:
+    # frame times while the assets for the new size are built, then how
+    # often anything is scaled by pygame.transform over STEADY_FRAMES frames
+    # once they are in use (each forced to redraw in full)
+    cardgame = import_cardgame()
+    import pygame
+
+    random.seed(seed)
+    calls = {"scales": 0}
+    for name in ("scale", "smoothscale", "rotozoom", "scale_by", "smoothscale_by"):
+        original = getattr(pygame.transform, name)
+
+        def counted(*args, _original=original, **kwargs):
+            calls["scales"] += 1
+            return _original(*args, **kwargs)
+
+        setattr(pygame.transform, name, counted)
+    marks = {}
+
+    def on_frame():
+        frame = len(clock.frame_ns)
+        if frame == RESIZE_FRAME:
+            marks["old_size"] = cardgame.ui.size
+            pygame.display.set_mode(size, pygame.RESIZABLE)
+            marks["resized"] = frame
+        elif "resized" not in marks:
+            return
+        elif "ready" not in marks:
+            if cardgame.ui.size != marks["old_size"]:
+                marks["ready"] = frame
+                calls["scales"] = 0
+        elif frame - marks["ready"] < STEADY_FRAMES:
+            cardgame.renderer.invalidate()
+        elif frame - marks["ready"] == STEADY_FRAMES:
+            pygame.event.post(pygame.event.Event(pygame.QUIT, scripted=True))
+
+    clock = cardgame.pacer.clock = ScriptedClock(game_script()[:1], on_frame)
+    try:
+        cardgame.main()
+    except SystemExit:
+        pass
+    building = sorted(clock.frame_ns[marks["resized"] + 1 : marks["ready"]])
+    steady = sorted(clock.frame_ns[marks["ready"] + 1 : marks["ready"] + STEADY_FRAMES])
+    return {
+        "canvas": cardgame.ui.size,
+        "build_frames": len(building),
+        "build_ms": sum(building) / 1e6,
+        "build_frame_ms_max": building[-1] / 1e6,
+        "build_frame_ms_p95": building[len(building) * 95 // 100] / 1e6,
+        "steady_frames": len(steady),
+        "steady_frame_ms_p50": steady[len(steady) // 2] / 1e6,
+        "steady_scales": calls["scales"],
+    }
+
+
+class TimedClock:
+    # Stands in for cardgame's Clock at real frame pacing, with the script's
+    # events delivered by SDL timers (ignoring its frame counts) at random
+    # points in the frame, each a random 100-300 ms after the one before.
+    # An event carries the time it is due as its seen_ns, so click latency
+    # is measured from then rather than from when the loop notices it.
+    # work_ms of busy work per frame stands in for slow hardware.
+    def __init__(self, script, rng, work_ms=0.0):
+        import pygame
+
+        self.pygame = pygame
+        self.clock = pygame.time.Clock()
+        self.script = list(script)
+        self.rng = rng
+        self.work_ns = int(work_ms * 1e6)
+        self.due = 0
+
+    def tick(self, framerate=0):
+        if self.work_ns:
+            end = time.perf_counter_ns() + self.work_ns
+            while time.perf_counter_ns() < end:
+                pass
+        result = self.clock.tick(framerate)
+        now = time.perf_counter_ns()
+        if self.script and now >= self.due:
+            # The last event is in: send the next
+            _, kind, attrs = self.script.pop(0)
+            delay_ms = self.rng.randint(100, 300)
+            self.due = now + delay_ms * 1000000
+            event = self.pygame.event.Event(kind, scripted=True, seen_ns=self.due, **attrs)
+            self.pygame.time.set_timer(event, delay_ms, 1)
+        return result
+
+
+def measure_latency(work_ms=0.0, seed=0):
+    # Play game_script() at real pacing (ROYALSET_PACER picks the pacer)
+    # and report the click-to-present latencies cardgame tracked
+    cardgame = import_cardgame()
+    cardgame.pacer.clock = TimedClock(game_script(), random.Random(seed), work_ms)
+    try:
+        cardgame.main()
+    except SystemExit:
+        pass
+    latency = cardgame.latency
+    p50, p95, p99 = latency.percentiles()
+    return {
+        "clicks": latency.count,
+        "unchanged": latency.unchanged,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": max(latency.samples),
+        "over_budget": latency.over_budget,
+        "early_wakes": cardgame.pacer.early_wakes,
+    }
+
+
+LATENCY_SCRIPT = """
+import json, sys
+import bench
+print(json.dumps(bench.measure_latency(float(sys.argv[1]), int(sys.argv[2]))))
+"""
+
+
+def bench_latency(work_ms=0.0, seed=0):
+    # Click-to-display latency of the scripted game under the fixed and the
+    # adaptive pacer, each run in a fresh process
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    for pacer in ("fixed", "adaptive"):
+        out = subprocess.run(
+            [sys.executable, "-c", LATENCY_SCRIPT, str(work_ms), str(seed)],
+            cwd=here, capture_output=True, text=True, check=True,
+            env=dict(os.environ, ROYALSET_PACER=pacer),
+        ).stdout.splitlines()[-1]
+        report[pacer] = json.loads(out)
+    return report
+
+
+DRIVE_SCRIPT = """
+import json, sys
+import bench
+print(json.dumps(bench.drive_game(sys.argv[1] == "alloc", int(sys.argv[2]))))
+"""
+
+# Metrics where bigger is better; everything else is a time or a size
+HIGHER_IS_BETTER = {"fps", "frames"}
+
+
+def bench_suite(seed=0, loops=20000, runs=3):
+    # Micro-benchmarks plus timing runs and an allocation run of the
+    # scripted game, each game run in a fresh process. Each metric keeps
+    # its best value over the timing runs, which damps scheduler noise.
+    here = os.path.dirname(os.path.abspath(__file__))
+    metrics = bench_micro(loops, seed)
+    for mode in ["time"] * runs + ["alloc"]:
+        out = subprocess.run(
+            [sys.executable, "-c", DRIVE_SCRIPT, mode, str(seed)],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.splitlines()[-1]
+        for name, value in json.loads(out).items():
+            best = max if name in HIGHER_IS_BETTER else min
+            metrics[name] = best(metrics.get(name, value), value)
+    metrics.pop("frames")
+    return metrics
+
+
+# Millisecond metrics within this much of the baseline never count as
+# regressions; stage times that small are mostly timer noise
+NOISE_FLOOR_MS = 0.05
+
+
+def regressions(metrics, baseline, threshold):
+    # (name, baseline, current) for every metric worse than its baseline by
+    # more than threshold (a fraction)
+    worse = []
+    for name, old in baseline.items():
+        new = metrics.get(name)
+        if new is None or not old:
+            continue
+        if "_ms" in name and abs(new - old) <= NOISE_FLOOR_MS:
+            continue
+        change = (old - new) / old if name in HIGHER_IS_BETTER else (new - old) / old
+        if change > threshold:
+            worse.append((name, old, new))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Royal Set benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    memory = commands.add_parser("memory", help="tracemalloc report for one game, list vs bytearray shoe")
+    memory.add_argument("--holes", type=int, default=72)
+    memory.add_argument("--seed", type=int, default=0)
+    blit = commands.add_parser("blit", help="card blit cost, loose surfaces vs atlas")
+    blit.add_argument("--frames", type=int, default=2000)
+    hud = commands.add_parser("hud", help="HUD text cost, per-frame render vs cache")
+    hud.add_argument("--frames", type=int, default=500)
+    dice = commands.add_parser("dice", help="dice row cost, primitives vs sprites")
+    dice.add_argument("--frames", type=int, default=2000)
+    startup = commands.add_parser("startup", help="cold start, asset bundle vs image files")
+    startup.add_argument("--runs", type=int, default=5)
+    audio = commands.add_parser("audio", help="ambient track memory/CPU, Sound vs stream")
+    audio.add_argument("--seconds", type=float, default=5)
+    audio.add_argument("--track")
+    scores = commands.add_parser("scores", help="score store writes, load and queries")
+    scores.add_argument("--games", type=int, default=1000000)
+    vecenv = commands.add_parser("vecenv", help="VectorEnv.step vs one GameState per game")
+    vecenv.add_argument("--games", type=int, default=4096)
+    vecenv.add_argument("--steps", type=int, default=300)
+    replay = commands.add_parser("replay", help="record overhead, log size, replay speed")
+    replay.add_argument("--games", type=int, default=20000)
+    replay.add_argument("--workers", type=int, default=1)
+    history = commands.add_parser("history", help="hand history export overhead, aggregation speed")
+    history.add_argument("--games", type=int, default=20000)
+    history.add_argument("--copies", type=int, default=20)
+    layers = commands.add_parser("layers", help="full-screen redraw, static layers vs direct")
+    layers.add_argument("--frames", type=int, default=300)
+    latency = commands.add_parser("latency", help="click-to-display latency, fixed vs adaptive pacing")
+    latency.add_argument("--work-ms", type=float, default=0.0,
+                         help="extra busy work per frame, standing in for slow hardware")
+    latency.add_argument("--seed", type=int, default=0)
+    resize = commands.add_parser("resize", help="frame times across a window resize")
+    resize.add_argument("--size", default="3840x2160")
+    suite = commands.add_parser("suite", help="headless game + micro-benchmarks vs a baseline")
+    suite.add_argument("--baseline", default="bench_baseline.json")
+    suite.add_argument("--threshold", type=float, default=0.5,
+                       help="allowed slowdown as a fraction of the baseline")
+    suite.add_argument("--update", action="store_true", help="write the baseline")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--runs", type=int, default=3, help="timing runs of the scripted game")
+    args = parser.parse_args(argv)
+
+    if args.command == "memory":
+        report = bench_memory(args.holes, args.seed)
+        print(f"{report['holes']}-hole game, final score {report['score']}")
+        print(f"{'':>16} {'retained':>9} {'peak':>7}")
+        print(f"{'list shoe':>16} {report['baseline_retained_bytes']:>9} "
+              f"{report['baseline_peak_bytes']:>7}")
+        print(f"{'bytearray shoe':>16} {report['retained_bytes']:>9} {report['peak_bytes']:>7}")
+        for site, size in report["top_sites"]:
+            print(f"  {size:>7} bytes  {site}")
+    elif args.command == "blit":
+        report = bench_blit(args.frames)
+        print(f"draw_hand blits, unconverted faces: {report['loose_us']:8.1f} us/frame")
+        print(f"draw_hand blits, atlas subsurfaces: {report['atlas_us']:8.1f} us/frame")
+    elif args.command == "hud":
+        report = bench_hud(args.frames)
+        print(f"HUD text, rendered every frame: {report['uncached_us']:8.1f} us/frame")
+        print(f"HUD text, TextCache:            {report['cached_us']:8.1f} us/frame")
+    elif args.command == "dice":
+        report = bench_dice(args.frames)
+        print(f"dice row, drawn from primitives: {report['primitives_us']:8.1f} us/frame")
+        print(f"dice row, sprite blits:          {report['sprites_us']:8.1f} us/frame")
+    elif args.command == "startup":
+        report = bench_startup(args.runs)
+        print(f"start to first frame, image files:  {report['files_ms']:7.1f} ms")
+        print(f"start to first frame, asset bundle: {report['bundle_ms']:7.1f} ms")
+    elif args.command == "audio":
+        report = bench_audio(args.seconds, args.track)
+        print(f"decoded Sound, played every frame: {report['sound_bytes'] / 1e6:6.1f} MB "
+              f"{report['sound_cpu']:6.2f} s CPU")
+        print(f"mixer.music stream, played once:   {report['stream_bytes'] / 1e6:6.1f} MB "
+              f"{report['stream_cpu']:6.2f} s CPU")
+    elif args.command == "scores":
+        report = bench_scores(args.games)
+        print(f"{report['games']} games recorded: record() p50 {report['record_us_p50']:.2f} us, "
+              f"p99 {report['record_us_p99']:.2f} us; "
+              f"{report['write_rows_per_s']:,.0f} rows/s committed")
+        print(f"open store and load highs: {report['open_ms']:8.2f} ms")
+        print(f"top-10 + stats per mode, index/summary: {report['queries_ms_index']:8.3f} ms")
+        print(f"top-10 + stats per mode, from history:  {report['queries_ms_scan']:8.3f} ms")
+    elif args.command == "vecenv":
+        report = bench_vecenv(args.games, args.steps)
+        print(f"{report['games']} games x {report['steps']} steps "
+              f"({report['finished']} games finished)")
+        print(f"GameState per game: {report['scalar_steps_per_s']:12,.0f} game-steps/s")
+        print(f"VectorEnv.step:     {report['vector_steps_per_s']:12,.0f} game-steps/s")
+    elif args.command == "replay":
+        report = bench_replay(args.games, args.workers)
+        print(f"{report['games']} 9-hole games, {report['actions']} actions: "
+              f"{report['log_bytes']} bytes logged "
+              f"({report['log_bytes'] / report['games']:.1f} bytes/game)")
+        print(f"recording overhead: {report['record_overhead_us']:.2f} us/action "
+              f"({report['record_overhead_pct']:.1f}% of play)")
+        print(f"streaming parse: {report['parse_mb_per_s']:.1f} MB/s")
+        print(f"replay: {report['replay_actions_per_s']:,.0f} actions/s "
+              f"with {args.workers} worker(s)")
+    elif args.command == "history":
+        report = bench_history(args.games, args.copies)
+        print(f"{report['holes']} holes exported: {report['bytes_per_hole']:.1f} bytes/hole, "
+              f"{report['export_overhead_us']:.2f} us per lock-in "
+              f"({report['export_overhead_pct']:.1f}% of play)")
+        print(f"aggregation over {args.copies} chunks: "
+              f"{report['aggregate_holes_per_s']:,.0f} holes/s")
+    elif args.command == "layers":
+        report = bench_layers(args.frames)
+        for name in ("menu", "playing"):
+            print(f"{name:>8}: {report[f'{name}_direct_us']:8.1f} us direct, "
+                  f"{report[f'{name}_layered_us']:8.1f} us with static layers")
+    elif args.command == "latency":
+        report = bench_latency(args.work_ms, args.seed)
+        print(f"click to present, ms (budget {1000 / 60:.1f} ms, "
+              f"{args.work_ms:g} ms extra work per frame):")
+        print(f"{'pacer':>9} {'clicks':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'over':>5} {'no-op':>6}")
+        for pacer, r in report.items():
+            print(f"{pacer:>9} {r['clicks']:>6} {r['p50_ms']:7.2f} {r['p95_ms']:7.2f} "
+                  f"{r['p99_ms']:7.2f} {r['max_ms']:7.2f} {r['over_budget']:>5} {r['unchanged']:>6}")
+    elif args.command == "resize":
+        report = bench_resize(tuple(int(n) for n in args.size.split("x")))
+        width, height = report["canvas"]
+        print(f"canvas {width}x{height}, assets built over {report['build_frames']} frames "
+              f"({report['build_ms']:.1f} ms)")
+        print(f"frame time while building: max {report['build_frame_ms_max']:6.2f} ms, "
+              f"p95 {report['build_frame_ms_p95']:6.2f} ms")
+        print(f"full redraw afterwards:    p50 {report['steady_frame_ms_p50']:6.2f} ms, "
+              f"{report['steady_scales']} transform scales in {report['steady_frames']} frames")
+    elif args.command == "suite":
+        metrics = bench_suite(args.seed, runs=args.runs)
+        baseline = None
+        if os.path.exists(args.baseline) and not args.update:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["metrics"]
+        for name, value in sorted(metrics.items()):
+            old = f"{baseline[name]:12.3f}" if baseline and name in baseline else ""
+            print(f"{name:<28}{value:12.3f}{old}")
+        if baseline is None:
+            with open(args.baseline, "w") as f:
+                json.dump({"metrics": metrics}, f, indent=2, sort_keys=True)
+            print(f"baseline written to {args.baseline}")
+            return
+        worse = regressions(metrics, baseline, args.threshold)
+        for name, old, new in worse:
+            print(f"REGRESSION {name}: {old:.3f} -> {new:.3f}")
+        if worse:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Build step for the packed asset bundle: decodes and pre-scales the card
+# faces (as one atlas per size), backgrounds and play button once and writes them to
+# assets/bundle.bin for cardgame to memory-map at startup. The card master and
+# the backgrounds are also kept at the files' full resolution.
+#
+#   python build_assets.py [--out assets/bundle.bin]
+import argparse
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from bundle import card_atlas_name, write_bundle  # noqa: E402
+from sprites import CardSprites  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Sizes the front end draws at; cardgame falls back to the image files when
+# a bundled image does not have the size it expects
+SCREEN_SIZE = (800, 600)
+CARD_MASTER_SIZE = (750, 1050)
+CARD_SIZES = [CARD_MASTER_SIZE, (100, 140)]
+BACKGROUNDS = {
+    "first": "first.jpg",
+    "casino_background": "casino_background.jpg",
+}
+
+
+def asset(name):
+    return os.path.join(HERE, "assets", name)
+
+
+def build(out):
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    sprites = CardSprites(
+        lambda card: pygame.image.load(asset(f"{card.rank}{card.suit}.png")),
+        CARD_MASTER_SIZE,
+    )
+    images = {}
+    for size in CARD_SIZES:
+        images[card_atlas_name(size)] = sprites.faces(size)[0].get_parent()
+    for name, filename in BACKGROUNDS.items():
+        original = pygame.image.load(asset(filename))
+        images[name] = pygame.transform.scale(original, SCREEN_SIZE)
+        # Full size, under the file's name, for other canvas sizes to scale from
+        images[filename] = original
+    images["playbutton_image"] = pygame.image.load(asset("playbutton_image.png"))
+    write_bundle(out, images)
+    return images
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack game images into one bundle file")
+    parser.add_argument("--out", default=asset("bundle.bin"))
+    args = parser.parse_args(argv)
+    images = build(args.out)
+    print(f"wrote {len(images)} images, {os.path.getsize(args.out):,} bytes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
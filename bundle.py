@@ -0,0 +1,108 @@
+# Packed asset bundle: pre-scaled, display-ready BGRA pixel data for the card
+# atlas, backgrounds and play button in one file, written by build_assets.py.
+# The runtime memory-maps the file and wraps each image in a Surface that
+# shares the mapped pages, so nothing is decoded or scaled at startup.
+#
+# Layout: MAGIC, u32 little-endian header length, JSON header, then each
+# image's pixels at the offset the header gives (64-byte aligned).
+import json
+import mmap
+import struct
+
+import pygame
+
+MAGIC = b"RSBUNDL1"
+ALIGN = 64
+FORMAT = "BGRA"
+
+
+class BundleError(Exception):
+    pass
+
+
+class AssetBundle:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            # ACCESS_COPY gives a private, writable mapping (Surfaces need a
+            # writable buffer); pages are only copied if something writes
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if self.map[: len(MAGIC)] != MAGIC:
+            raise BundleError(f"{path} is not an asset bundle")
+        (length,) = struct.unpack_from("<I", self.map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self.map[start : start + length])
+        self.entries = self.header["entries"]
+        # A truncated file can still have a whole header; frombuffer would
+        # fail on the first short entry, so check them all up front
+        for name, entry in self.entries.items():
+            width, height = entry["size"]
+            if entry["offset"] + width * height * 4 > len(self.map):
+                raise BundleError(f"{path}: {name} runs past the end of the file")
+        self.view = memoryview(self.map)
+        self.surfaces = {}
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def surface(self, name):
+        surface = self.surfaces.get(name)
+        if surface is None:
+            entry = self.entries[name]
+            width, height = entry["size"]
+            offset = entry["offset"]
+            pixels = self.view[offset : offset + width * height * 4]
+            surface = pygame.image.frombuffer(pixels, (width, height), FORMAT)
+            if entry["opaque"]:
+                # Without per-pixel alpha the blit can take the plain copy
+                # path; convert() to the display format is a straight copy
+                surface.set_alpha(None)
+                if pygame.display.get_surface() is not None:
+                    surface = surface.convert()
+            self.surfaces[name] = surface
+        return surface
+
+
+def card_atlas_name(size):
+    width, height = size
+    return f"cards_{width}x{height}"
+
+
+def load_bundle(path):
+    # The bundle, or None when it is missing or unreadable so callers can
+    # fall back to loading the original image files
+    try:
+        return AssetBundle(path)
+    except (OSError, ValueError, KeyError, struct.error, BundleError):
+        return None
+
+
+def write_bundle(path, images, meta=None):
+    # images: {name: Surface}. Pixels are stored as BGRA, which matches the
+    # usual 32-bit display format so blits need no conversion.
+    blobs = {name: pygame.image.tobytes(surface, FORMAT) for name, surface in images.items()}
+    # The header length shifts the data offsets, so lay out until it settles
+    header = b""
+    while True:
+        entries = {}
+        offset = _align(len(MAGIC) + 4 + len(header))
+        for name, surface in images.items():
+            entries[name] = {
+                "offset": offset,
+                "size": list(surface.get_size()),
+                "opaque": not surface.get_flags() & pygame.SRCALPHA,
+            }
+            offset = _align(offset + len(blobs[name]))
+        laid_out = json.dumps({"entries": entries, **(meta or {})}).encode()
+        settled = len(laid_out) == len(header)
+        header = laid_out
+        if settled:
+            break
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name in images:
+            f.write(b"\0" * (entries[name]["offset"] - f.tell()))
+            f.write(blobs[name])
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
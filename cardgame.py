@@ -1,14 +1,38 @@
 import pygame
 import random
 import sys
-import time
 import os
 
+import solver
+from rules import MODES, POKER_DICE, GameState
+from functools import lru_cache, partial
+from time import perf_counter
+from types import SimpleNamespace
+
+from audio import Audio
+from bundle import card_atlas_name, load_bundle
+from layers import LayerCache
+from layout import Layout
+from pacing import FramePacer, LatencyTracker
+from profiler import FrameProfiler
+from replay import RecordedGame, open_recorder
+from renderer import DirtyRenderer
+from scheduler import Scheduler
+from scores import open_store
+from sprites import CardSprites, DiceSprites
+from textcache import TextCache
+from viewport import ResolutionCache, Scale, allocate, fit, letterbox
+
+# Draw at the display's real resolution on Windows instead of having it
+# bitmap-stretched on HiDPI monitors
+os.environ.setdefault("SDL_WINDOWS_DPI_AWARENESS", "permonitorv2")
+
 # Initialize Pygame
 pygame.init()
 pygame.mixer.init()
 
-# Constants for easy adjustments
+# Constants for easy adjustments. All drawing is laid out on a WIDTH x HEIGHT
+# logical canvas, scaled to fit the window (see viewport.py).
 WIDTH = 800
 HEIGHT = 600
 CARD_WIDTH = 100
@@ -36,578 +60,632 @@ def resource_path(relative_path):
     base_path = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-# Window settings
-screen = pygame.display.set_mode((800, 600))  # Width, Height
-pygame.display.set_caption("Royal Card Game")
-# Load background image
-background_image = pygame.image.load(resource_path("assets/first.jpg"))  # Load the image
-background_image = pygame.transform.scale(
-    background_image, (800, 600)
-)  # Scale to screen size
-
-background = pygame.image.load(resource_path("assets/casino_background.jpg"))  # Path to your background image
-background = pygame.transform.scale(background, (800, 600))
-
-playbutton_image = pygame.image.load(resource_path("assets/playbutton_image.png"))
-# Display the background
-screen.blit(background, (0, 0))
-
-# Fonts for text display
-font = pygame.font.SysFont("arial", 36, bold=True)
-suit_font = pygame.font.SysFont("arial", 60, bold=True)
-little_font = pygame.font.SysFont("helvetica", 28, bold=True)
-big_font = pygame.font.SysFont("arial", 48, bold=True)
-small_font = pygame.font.SysFont("arial", 24, bold=True)
-button_font = pygame.font.SysFont("arial", 20, bold=True)
-
-# Game assets
-SUITS = ["H", "D", "C"]
-RANKS = ["9", "10", "J", "Q", "K", "A"]
-POKER_DICE = ["9", "10", "J", "Q", "K", "A"]
-values = {"9": 9, "10": 10, "J": 10, "Q": 10, "K": 10, "A": 11}
+# Set up the display and clock. The window is resizable; F11 switches to
+# fullscreen at the desktop resolution, as does ROYALSET_FULLSCREEN=1 at start.
+fullscreen = os.environ.get("ROYALSET_FULLSCREEN") == "1"
+windowed_size = (WIDTH, HEIGHT)
+if fullscreen:
+    window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+else:
+    window = pygame.display.set_mode(windowed_size, pygame.RESIZABLE)
+pygame.display.set_caption("Royal Set Poker")
+
+clock = pygame.time.Clock()
+# With nothing to redraw the main loop sleeps until an event or the next
+# scheduler timer, waking at least this often so time-based state gets a look
+IDLE_TIMEOUT_MS = 1000
+# Frames end in the adaptive pacer, which wakes early for input (see
+# pacing.py); ROYALSET_PACER=fixed sleeps out each frame with Clock.tick(60).
+# Click-to-display latency is tracked and shown in the F3 overlay.
+pacer = FramePacer(clock, adaptive=os.environ.get("ROYALSET_PACER") != "fixed")
+latency = LatencyTracker()
+
+# Timers and presentation tweens, driven once per frame by main(). Tweens
+# only animate what is drawn; the game state is already final, so input is
+# handled as usual while they run.
+scheduler = Scheduler()
+DEAL_MS = 250
+DEAL_STAGGER_MS = 80
+DICE_TUMBLE_MS = 450
+DICE_TUMBLE_FACES = 9
+SCORE_COUNT_MS = 600
+GAME_OVER_QUIT_MS = 2000
+
+# Frame profiler. F3 turns it on with an overlay of per-stage percentiles;
+# ROYALSET_PROFILE=trace.json turns it on from the start and writes a Chrome
+# trace there on quit.
+profile_path = os.environ.get("ROYALSET_PROFILE")
+profiler = FrameProfiler()
+profiler.enabled = bool(profile_path)
+show_profile = False
+profile_overlay = (0, None)
+PROFILE_OVERLAY_MS = 500
+
+# Pre-scaled images come from the asset bundle (python build_assets.py) when
+# it is present; ROYALSET_BUNDLE picks another file, or disables it if empty
+bundle_path = os.environ.get("ROYALSET_BUNDLE", "assets/bundle.bin")
+bundle = load_bundle(resource_path(bundle_path)) if bundle_path else None
+
+
+def load_image(name, path, size=None):
+    # Bundled image if it has the wanted size, else decode (and scale) the file
+    if bundle is not None and name in bundle:
+        image = bundle.surface(name)
+        if size is None or image.get_size() == size:
+            return image
+    image = pygame.image.load(resource_path(path))
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+# Load background image (at logical size; other canvas sizes get their own
+# copies, scaled from the file at its full resolution)
+background_image = load_image("first", "assets/first.jpg", (800, 600))
+background = load_image("casino_background", "assets/casino_background.jpg", (800, 600))
+playbutton_image = load_image("playbutton_image", "assets/playbutton_image.png")
+IMAGES = {
+    "background_image": (background_image, "assets/first.jpg"),
+    "background": (background, "assets/casino_background.jpg"),
+    "playbutton_image": (playbutton_image, "assets/playbutton_image.png"),
+}
+
+
+@lru_cache(maxsize=None)
+def source_image(path):
+    # An image at its file's full resolution, to scale other canvas sizes'
+    # copies from: bundled under the file's name, else decoded
+    name = os.path.basename(path)
+    if bundle is not None and name in bundle:
+        return bundle.surface(name).convert_alpha()
+    return pygame.image.load(resource_path(path)).convert_alpha()
+
+
+# Fonts for text display as (name, logical size), resolved once per canvas
+# size; rendered strings are cached
+text_cache = TextCache()
+FONTS = {
+    "font": ("arial", 36),
+    "suit_font": ("arial", 60),
+    "little_font": ("helvetica", 28),
+    "big_font": ("arial", 48),
+    "small_font": ("arial", 24),
+    "button_font": ("arial", 20),
+    "score_font": ("arial", 30),
+}
+
+# High scores and the history of completed games persist in an SQLite file;
+# ROYALSET_SCORES picks another file, or keeps scores in memory if empty
+scores_path = os.environ.get(
+    "ROYALSET_SCORES", os.path.join(os.path.expanduser("~"), ".royalset", "scores.db")
+)
+score_store = open_store(scores_path) if scores_path else None
+
+
+# ROYALSET_RECORD appends every game played to a replay log (see replay.py)
+record_path = os.environ.get("ROYALSET_RECORD")
+recorder = open_recorder(record_path) if record_path else None
+# ROYALSET_HISTORY exports every hole locked in to a columnar hand history
+# directory (see history.py); NumPy is only loaded when it is set
+history_path = os.environ.get("ROYALSET_HISTORY")
+hand_history = None
+if history_path:
+    from history import open_history
+
+    hand_history = open_history(history_path)
+
+
+def new_game(mode, high_scores):
+    # Every game draws from its own Random, so its seed and actions replay it
+    seed = random.getrandbits(64)
+    if recorder is not None:
+        return RecordedGame(mode, seed, recorder, high_scores, hand_history)
+    return GameState(mode, random.Random(seed), high_scores, hand_history)
+
+
+def record_game(game, high_scores):
+    # Called once when a game is completed
+    if score_store is not None:
+        score_store.record(game.max_holes, game.score)
+    else:
+        high_scores[game.max_holes] = max(high_scores[game.max_holes], game.score)
+
 
 # dice_roll = pygame.mixer.Sound('./assets/dice_roll.mp3')
-background_sound = pygame.mixer.Sound(resource_path("assets/casino.mp3"))
-mouse_click = pygame.mixer.Sound(resource_path("assets/mouse_click.mp3"))
-game_over_sound = pygame.mixer.Sound(resource_path("assets/game_over.mp3"))
-background_nature = pygame.mixer.Sound(resource_path("assets/nature_birds.mp3"))
+mouse_click = resource_path("assets/mouse_click.mp3")
+game_over_sound = resource_path("assets/game_over.mp3")
+# Ambient track streamed while in each state; None is silence
+STATE_TRACKS = {
+    "menu": resource_path("assets/nature_birds.mp3"),
+    "playing": resource_path("assets/casino.mp3"),
+    "game_over": None,
+}
+audio = Audio(("ui", "jingle"))
+
+# Card faces live in one display-format atlas, loaded on first use and kept
+# at the face files' own resolution, so every size scales from the originals
+CARD_SOURCE_SIZE = (750, 1050)
+card_sprites = CardSprites(
+    lambda card: pygame.image.load(resource_path(f"assets/{card.rank}{card.suit}.png")),
+    CARD_SOURCE_SIZE,
+)
+if bundle is not None:
+    for size in (card_sprites.master_size, (CARD_WIDTH, CARD_HEIGHT)):
+        if card_atlas_name(size) in bundle:
+            card_sprites.add_atlas(bundle.surface(card_atlas_name(size)), size)
+
+
+def card_image(card):
+    return ui.cards[card.id]
+
+
+def draw_card(screen, card, x, y, selected=False):
+    px = ui.scale
+    width, height = ui.card_size
+    rect = pygame.Rect(x, y, width, height)
+    screen.blit(card_image(card), (x, y))
+
+    # Border
+    pygame.draw.rect(screen, BLACK, rect, px(2), border_radius=px(5))
+
+    # Shadow for selected card
+    if selected:
+        shadow_surf = pygame.Surface((width + px(8), height + px(8)), pygame.SRCALPHA)
+        pygame.draw.rect(
+            shadow_surf,
+            (0, 0, 0, 100),
+            (px(4), px(4), width, height),
+            border_radius=px(5),
+        )
+        screen.blit(shadow_surf, (x - px(4), y - px(4)))
+        pygame.draw.rect(screen, CYAN, rect, px(4), border_radius=px(5))
 
-# Set up the display and clock
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Royal Set Poker")
 
-clock = pygame.time.Clock()
+# Drawing functions. Each screen's static content is drawn once into a
+# cached layer of the asset set in use (see layers.py) and blitted as a
+# whole; the rest is drawn over it.
+def draw_gradient(surface):
+    width, height = surface.get_size()
+    for y in range(height):
+        shade = int(50 + (y / height) * 50)
+        pygame.draw.line(surface, (0, shade, 0), (0, y), (width, y))
+    pygame.draw.rect(surface, DARK_GREEN, (0, 0, width, height), ui.scale(10))
 
-# Card class with enhanced graphics
-class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
-        self.value = values[rank]
-        self.image_path = resource_path(f"assets/{rank}{suit}.png")  # Image file path
-        self.image = pygame.image.load(self.image_path)  # Load the image
-        self.image = pygame.transform.scale(
-            self.image, (CARD_WIDTH, CARD_HEIGHT)
-        )  # Resize
-
-    def draw(self, screen, x, y, selected=False):
-        rect = pygame.Rect(x, y, CARD_WIDTH, CARD_HEIGHT)
-        screen.blit(self.image, (x, y))
-
-        # Border
-        pygame.draw.rect(screen, BLACK, rect, 2, border_radius=5)
-
-        # Shadow for selected card
-        if selected:
-            shadow_surf = pygame.Surface(
-                (CARD_WIDTH + 8, CARD_HEIGHT + 8), pygame.SRCALPHA
-            )
-            pygame.draw.rect(
-                shadow_surf,
-                (0, 0, 0, 100),
-                (4, 4, CARD_WIDTH, CARD_HEIGHT),
-                border_radius=5,
-            )
-            screen.blit(shadow_surf, (x - 4, y - 4))
-            pygame.draw.rect(screen, CYAN, rect, 4, border_radius=5)
-
-
-# Deck class to manage cards
-class Deck:
-    def __init__(self):
-        self.cards = [Card(rank, suit) for suit in SUITS for rank in RANKS] * 3
-        self.shuffle()
-
-    def shuffle(self):
-        random.shuffle(self.cards)
-
-    def deal(self, count):
-        if len(self.cards) < count:
-            self.cards = [Card(rank, suit) for suit in SUITS for rank in RANKS] * 3
-            self.shuffle()
-        return [self.cards.pop() for _ in range(count)]
-
-# Dice class with corrected mechanics
-class Dice:
-    def __init__(self, count):
-        self.count = count
-        self.dice = []
-        self.kept = [False] * count
-
-    def roll(self):
-        self.dice = [random.choice(POKER_DICE) for _ in range(self.count)]
-        self.kept = [False] * self.count
-
-    def reroll(self, game):
-        if game.score >= 5 and self.count == 3 and any(not kept for kept in self.kept):
-            game.score -= 5
-            for i in range(self.count):
-                if not self.kept[i]:
-                    self.dice[i] = random.choice(POKER_DICE)
-
-    def toggle_keep(self, index):
-        if 0 <= index < self.count:
-            self.kept[index] = not self.kept[index]
-
-# GameState class
-class GameState:
-    def __init__(self, max_holes):
-        self.round = 1
-        self.score = 0
-        self.high_scores = {3: 0, 9: 0, 18: 0, 36: 0, 54: 0, 72: 0}
-        self.max_holes = max_holes
-        self.deck = Deck()
-        self.hand = self.deck.deal(3)
-        self.dice = Dice(3)
-        self.selected = [False] * 3
-        self.rolled = False
-        self.roll_count = 0
-        self.max_rolls = 2
-        self.discarded = False
-
-    def update_max_rolls(self):
-        hand_size = len(self.hand)
-        if hand_size == 3:
-            self.max_rolls = 2
-            self.dice = Dice(3)
-        elif hand_size == 2:
-            self.max_rolls = 1
-            self.dice = Dice(2)
-        elif hand_size == 1:
-            self.max_rolls = 1
-            self.dice = Dice(1)
-        else:
-            self.max_rolls = 0
-            self.dice = Dice(0)
-        self.rolled = False
-        self.roll_count = 0
-
-
-# Scoring functions
-def score_hand(hand):
-    if not hand:
-        return "Nothing", 0
-    ranks = [card.rank for card in hand]
-    suits = [card.suit for card in hand]
-    rank_counts = {rank: ranks.count(rank) for rank in set(ranks)}
-    suit_counts = {suit: suits.count(suit) for suit in set(suits)}
-    rank_order = "910JQKA"
-    rank_indices = sorted([rank_order.index(rank) for rank in ranks])
-    is_straight = (
-        len(rank_indices) == 3
-        and rank_indices[2] - rank_indices[0] == 2
-        and len(set(rank_indices)) == 3
-    )
 
-    # Royal Set: Three of a kind, all same suit
-    if len(set(ranks)) == 1 and len(set(suits)) == 1:
-        return "Royal Set", 50
-    # Royal Flush: A, K, Q same suit
-    if set(ranks) == {"A", "K", "Q"} and len(set(suits)) == 1:
-        return "Royal Flush", 40
-    # Straight Flush: Three consecutive ranks, same suit
-    if is_straight and len(set(suits)) == 1:
-        return "Straight Flush", 30
-    # Triple Double: Three of a kind, two same suit
-    if (
-        3 in rank_counts.values()
-        and len(set(suits)) == 2
-        and max(suit_counts.values()) == 2
-    ):
-        return "Triple Double", 20
-    # Trips: Three of a kind, all different suits
-    if 3 in rank_counts.values() and len(set(suits)) == 3:
-        return "Trips", 25
-    # Paired Flush: Flush with a pair
-    if len(set(suits)) == 1 and 2 in rank_counts.values():
-        return "Paired Flush", 15
-    # Flushed Pair: Pair with same suit, third different
-    if 2 in rank_counts.values():
-        pair_rank = [r for r, c in rank_counts.items() if c == 2][0]
-        pair_suits = [s for r, s in zip(ranks, suits) if r == pair_rank]
-        if len(set(pair_suits)) == 1 and len(set(suits)) > 1:
-            return "Flushed Pair", 10
-    # Flush: Three cards, same suit (no pair or straight)
-    if len(set(suits)) == 1 and 2 not in rank_counts.values() and not is_straight:
-        return "Flush", 5
-    # Straight: Three consecutive ranks, mixed suits
-    if is_straight and len(set(suits)) > 1:
-        return "Straight", 3
-    # Pair: Two cards same rank
-    if 2 in rank_counts.values():
-        return "Pair", 2
-    # High Card: None of the above
-    return "High Card", 1
-
-
-def calc_multiplier(hand, dice):
-    if not dice.dice:
-        return 1
-    hand_ranks = set(card.rank for card in hand)
-    dice_ranks = set(dice.dice)
-    matches = len(hand_ranks & dice_ranks)
-    max_matches = len(hand)
-    if matches == max_matches:
-        return 8
-    elif matches == 2:
-        return 4
-    elif matches == 1:
-        return 2
-    return 1
-
-
-# Drawing functions
 def draw_background():
-    for y in range(HEIGHT):
-        shade = int(50 + (y / HEIGHT) * 50)
-        pygame.draw.line(screen, (0, shade, 0), (0, y), (WIDTH, y))
-    pygame.draw.rect(screen, DARK_GREEN, (0, 0, WIDTH, HEIGHT), 10)
+    # Plain green gradient backdrop, drawn line by line only once per size
+    ui.layers.blit(screen, "gradient", None, draw_gradient)
 
     ### Score
 
 
-def draw_scoreboard(game):
-    round_text = font.render(f"HOLE: {game.round}/{game.max_holes}", True, CYAN)
-    score_text = font.render(f"SCORE: {game.score}", True, YELLOW)
-    high_text = font.render(f"HIGH: {game.high_scores[game.max_holes]}", True, GREEN)
-    screen.blit(round_text, (20, 20))
-    screen.blit(score_text, (20, 60))
-    screen.blit(high_text, (20, 100))
+def shown_score(game):
+    # Counts up to the real score after a lock-in
+    return round(scheduler.value("score", game.score))
+
+
+def deal_offsets(game):
+    # Horizontal offset (in canvas pixels) of each card still sliding in
+    return tuple(
+        round(scheduler.value(f"deal{i}", 0) * ui.scale.factor) for i in range(len(game.hand))
+    )
+
+
+def tumble_frame(game):
+    # Step of the dice tumble animation, or None when the dice are at rest
+    t = scheduler.value("tumble", None)
+    return None if t is None else int(t * DICE_TUMBLE_FACES)
+
+
+def animate_deal(game, slots):
+    # Tweened in logical units, so a resize mid-deal keeps the motion
+    layout = playing_layout(WIDTH, HEIGHT, 1, len(game.hand), game.dice.count)
+    for n, i in enumerate(slots):
+        x = layout.rect("card", i).x
+        scheduler.tween(DEAL_MS, WIDTH - x, 0, delay_ms=n * DEAL_STAGGER_MS, key=f"deal{i}")
+
 
+def animate_roll():
+    # dice_roll.play()
+    scheduler.tween(DICE_TUMBLE_MS, key="tumble")
 
-def draw_hand(game):
 
-    hand_size = len(game.hand)
-    total_width = hand_size * (CARD_WIDTH + 5) - 5
-    start_x = (WIDTH - total_width) // 2
+def animate_score(old, new):
+    if new != old:
+        scheduler.tween(SCORE_COUNT_MS, old, new, key="score")
+
+
+def draw_scoreboard(game, layout):
+    x, y = layout.rect("scoreboard").topleft
+    round_text = ui.font.render(f"HOLE: {game.round}/{game.max_holes}", True, CYAN)
+    score_text = ui.font.render(f"SCORE: {shown_score(game)}", True, YELLOW)
+    high_text = ui.font.render(f"HIGH: {game.high_scores[game.max_holes]}", True, GREEN)
+    screen.blit(round_text, (x, y))
+    screen.blit(score_text, (x, y + ui.scale(40)))
+    screen.blit(high_text, (x, y + ui.scale(80)))
+
+
+def draw_hand(game, layout):
+    offsets = deal_offsets(game)
     for i, card in enumerate(game.hand):
-        x = start_x + i * (CARD_WIDTH + 5)
-        card.draw(
-            screen, x, HEIGHT // 2 - CARD_HEIGHT / 2 - 20, game.selected[i]
-        )  # start draw x = 290, 365, 440 range 75
-    background_sound.play()
+        rect = layout.rect("card", i)
+        draw_card(screen, card, rect.x + offsets[i], rect.y, game.selected[i])
+
+
+def draw_die(surface, rect, die, matched, kept, assets=None):
+    # assets: the scaled asset set to draw with (the one in use by default)
+    assets = assets or ui
+    px = assets.scale
+    rect = pygame.draw.rect(surface, BLACK, rect, border_radius=px(1))
+    color = GREEN if matched else MAGENTA
+
+    pygame.draw.rect(surface, DARK_GREY, rect)
+    pygame.draw.polygon(
+        surface,
+        LIGHT_GREY,
+        [
+            (rect.left, rect.top),
+            (rect.right, rect.top),
+            (rect.right - px(5), rect.top + px(5)),
+            (rect.left + px(5), rect.top + px(5)),
+        ],
+    )
+    pygame.draw.polygon(
+        surface,
+        BLACK,
+        [
+            (rect.left, rect.bottom),
+            (rect.right, rect.bottom),
+            (rect.right - px(2), rect.bottom - px(2)),
+            (rect.left + px(2), rect.bottom - px(2)),
+        ],
+    )
+    pygame.draw.rect(surface, color, rect, px(1), border_radius=px(5))
+    if kept:
+        pygame.draw.rect(
+            surface, CYAN, rect.inflate(px(1), px(1)), px(1), border_radius=px(5)
+        )  # dice_card cover cyan color
+    text = assets.small_font.render(die, True, WHITE)
+    surface.blit(text, (rect.x + px(12), rect.y + px(8)))
 
 
-def draw_dice_row(game):
-    if game.rolled:
+DIE_INDEX = {face: i for i, face in enumerate(POKER_DICE)}
+
 
-        STOP_SOUND_EVENT = pygame.USEREVENT + 1
+def draw_dice_row(game, layout):
+    if game.rolled:
         # dice_roll.play()
 
-        dice_count = game.dice.count
-        total_width = dice_count * (DICE_SIZE + 10) - 10
-        start_x = (WIDTH - total_width) // 2
-        for i in range(dice_count):
-            x = start_x + i * (DICE_SIZE + 10)
+        frame = tumble_frame(game)
+        for i in range(game.dice.count):
+            rect = layout.rect("die", i)
             die = game.dice.dice[i]
-            matched = die in [card.rank for card in game.hand]
-            kept = game.dice.kept[i]
-            rect = pygame.draw.rect(
-                screen,
-                BLACK,
-                (x, HEIGHT // 2 + 70, DICE_SIZE, DICE_SIZE),
-                border_radius=1,
-            )
-            color = GREEN if matched else MAGENTA
+            if frame is not None and not game.dice.kept[i]:
+                die = POKER_DICE[(DIE_INDEX[die] + frame + 2 * i + 1) % len(POKER_DICE)]
+            sprite = ui.dice_sprites.get(die, die in game.hand_ranks, game.dice.kept[i])
+            screen.blit(sprite, ui.dice_sprites.origin(rect.x, rect.y))
 
-            pygame.draw.rect(screen, DARK_GREY, rect)
-            pygame.draw.polygon(
-                screen,
-                LIGHT_GREY,
-                [
-                    (x, y)
-                    for x, y in [
-                        (rect.left, rect.top),
-                        (rect.right, rect.top),
-                        (rect.right - 5, rect.top + 5),
-                        (rect.left + 5, rect.top + 5),
-                    ]
-                ],
-            )
-            pygame.draw.polygon(
-                screen,
-                BLACK,
-                [
-                    (x, y)
-                    for x, y in [
-                        (rect.left, rect.bottom),
-                        (rect.right, rect.bottom),
-                        (rect.right - 2, rect.bottom - 2),
-                        (rect.left + 2, rect.bottom - 2),
-                    ]
-                ],
-            )
-            pygame.draw.rect(screen, color, rect, 1, border_radius=5)
-            if kept:
-                pygame.draw.rect(
-                    screen, CYAN, rect.inflate(1, 1), 1, border_radius=5
-                )  # dice_card cover cyan color
-            text = small_font.render(die, True, WHITE)
-            screen.blit(text, (x + 12, HEIGHT // 2 + 78))
-
-
-def update_score_display(game):
-    hand_name, base_score = score_hand(game.hand)
-    multiplier = calc_multiplier(game.hand, game.dice) if game.rolled else 1
+
+def draw_score_box(surface, layout):
+    rect = layout.rect("score_box")
+    px = ui.scale
+    glow_surf = pygame.Surface(rect.size, pygame.SRCALPHA)
+    pygame.draw.rect(glow_surf, (255, 0, 255, 50), ((0, 0), rect.size), border_radius=px(5))
+    surface.blit(glow_surf, rect)
+    pygame.draw.rect(surface, GOLD, rect, px(2), border_radius=px(5))
+
+
+def update_score_display(game, layout):
+    # The hand's score, in the box drawn with the static layer
+    hand_name, base_score, multiplier = game.hand_score()
     text = f"{hand_name} - {base_score} x{multiplier}"
-    font = pygame.font.SysFont("arial", 30, bold=True)
-    hand_text = font.render(text, True, GOLD)  # high card score
-    glow_surf = pygame.Surface((280, 40), pygame.SRCALPHA)
-    pygame.draw.rect(glow_surf, (255, 0, 255, 50), (0, 0, 280, 40), border_radius=5)
-    screen.blit(glow_surf, (WIDTH // 2 - 140, HEIGHT // 2 + 120))
-    pygame.draw.rect(
-        screen, GOLD, (WIDTH // 2 - 140, HEIGHT // 2 + 120, 280, 40), 2, border_radius=5
-    )
-    rect = pygame.Rect(WIDTH // 2 - 140, HEIGHT // 2 + 120, 280, 40)
+    hand_text = ui.score_font.render(text, True, GOLD)  # high card score
     hand_text_rect = hand_text.get_rect()
-    hand_text_rect.center = rect.center
+    hand_text_rect.center = layout.rect("score_box").center
     screen.blit(hand_text, hand_text_rect)
-    # screen.blit(hand_text, (WIDTH // 2 - 95, HEIGHT // 2 + 120))
 
-    ##### draw discard, reroll, lock in
 
+# Solver hint, toggled with the H key. The text is recomputed only when the
+# hand, dice or roll state changes.
+show_hint = False
+hint_cache = (None, "")
+# The solver's tables take ~80 ms per score to build, which would stall the
+# frame of the first H press. While a game is played they are built a step
+# at a time at the end of each frame, at most HINT_WARM_MS per frame.
+HINT_WARM_MS = 4
+hint_warm_up = solver.warm_up()
+
+
+def warm_hints(budget_ms):
+    # Step the solver warm-up for about budget_ms; True while work is left
+    global hint_warm_up
+    if hint_warm_up is None:
+        return False
+    deadline = perf_counter() + budget_ms / 1000
+    for _ in hint_warm_up:
+        if perf_counter() >= deadline:
+            return True
+    hint_warm_up = None
+    return False
+
+
+def hint_text(game):
+    global hint_cache
+    key = (
+        game.round,
+        tuple(card.id for card in game.hand),
+        game.discarded,
+        game.rolled,
+        game.roll_count,
+        tuple(game.dice.dice),
+        tuple(game.dice.kept),
+        game.score,
+    )
+    if hint_cache[0] != key:
+        hint_cache = (key, solver.hint(game))
+    return hint_cache[1]
 
-def draw_buttons(game, mouse_pos):
-    discard_rect = pygame.Rect(150, 500, BUTTON_WIDTH, BUTTON_HEIGHT)
-    active = not game.discarded and not game.rolled
-    if active and discard_rect.collidepoint(mouse_pos):
-        glow_surf = pygame.Surface(
-            (BUTTON_WIDTH + 10, BUTTON_HEIGHT + 10), pygame.SRCALPHA
-        )
-        pygame.draw.rect(
-            glow_surf,
-            (0, 255, 255, 100),
-            (5, 5, BUTTON_WIDTH, BUTTON_HEIGHT),
-            border_radius=5,
-        )
-        screen.blit(glow_surf, (145, 495))
-        pygame.draw.rect(screen, RED, discard_rect, 0, border_radius=5)
-    else:
-        pygame.draw.rect(screen, RED, discard_rect, 2, border_radius=5)
-    discard_text = button_font.render("DISCARD", True, BLACK)
-    screen.blit(discard_text, (160, 510))
 
-    STOP_SOUND_EVENT = pygame.USEREVENT + 1
+def draw_hint(game, layout):
+    if not show_hint:
+        return
+    text = ui.button_font.render(hint_text(game), True, WHITE)
+    screen.blit(text, text.get_rect(center=layout.rect("hint").center))
 
-    def diceroll_sound():
-        # dice_roll.play()
-        pygame.time.set_timer(STOP_SOUND_EVENT, 2000)
+    ##### draw discard, reroll, lock in
 
-    # reroll
-    roll_label = "REROLL" if game.rolled else "ROLL"
-    roll_rect = pygame.Rect(
-        WIDTH // 2 - BUTTON_WIDTH // 2, 500, BUTTON_WIDTH, BUTTON_HEIGHT
-    )
 
-    # Updated roll button logic
-    roll_active = False
-    if not game.rolled:
-        roll_active = True
-    elif game.rolled and game.roll_count < game.max_rolls:
-        if len(game.hand) == 3:
-            # For 3-card hands: allow two free rolls
-            roll_active = any(not k for k in game.dice.kept)
-        elif len(game.hand) == 2:
-            # For 2-card hands: only one roll allowed
-            roll_active = False
-        elif len(game.hand) == 1:
-            # For 1-card hands: only one roll allowed
-            roll_active = False
-
-    if roll_active and roll_rect.collidepoint(mouse_pos):
-        diceroll_sound()
+def draw_button(surface, rect, color, label, text_x, hot):
+    # hot: the button is usable and under the mouse
+    px = ui.scale
+    if hot:
         glow_surf = pygame.Surface(
-            (BUTTON_WIDTH + 10, BUTTON_HEIGHT + 10), pygame.SRCALPHA
+            (rect.width + px(10), rect.height + px(10)), pygame.SRCALPHA
         )
         pygame.draw.rect(
             glow_surf,
             (0, 255, 255, 100),
-            (5, 5, BUTTON_WIDTH, BUTTON_HEIGHT),
-            border_radius=5,
+            (px(5), px(5), rect.width, rect.height),
+            border_radius=px(5),
         )
-        screen.blit(glow_surf, (WIDTH // 2 - BUTTON_WIDTH // 2 - 5, 495))
-        pygame.draw.rect(screen, GOLD, roll_rect, 0, border_radius=5)
+        surface.blit(glow_surf, (rect.x - px(5), rect.y - px(5)))
+        pygame.draw.rect(surface, color, rect, 0, border_radius=px(5))
     else:
-        pygame.draw.rect(screen, GOLD, roll_rect, 2, border_radius=5)
-    roll_text = button_font.render(roll_label, True, BLACK)
-    screen.blit(roll_text, (WIDTH // 2 - 25, 510))
-    pygame.time.set_timer(STOP_SOUND_EVENT, 2000)  # Cancel the timer
-
-    # lock in
-    lock_rect = pygame.Rect(650 - BUTTON_WIDTH, 500, BUTTON_WIDTH, BUTTON_HEIGHT)
-    if game.rolled and lock_rect.collidepoint(mouse_pos):
-        glow_surf = pygame.Surface(
-            (BUTTON_WIDTH + 10, BUTTON_HEIGHT + 10), pygame.SRCALPHA
-        )
-        pygame.draw.rect(
-            glow_surf,
-            (0, 255, 255, 100),
-            (5, 5, BUTTON_WIDTH, BUTTON_HEIGHT),
-            border_radius=5,
-        )
-        screen.blit(glow_surf, (645 - BUTTON_WIDTH, 495))
-        pygame.draw.rect(screen, WHITE, lock_rect, 0, border_radius=5)
-        # dice_roll.stop()
-    else:
-        pygame.draw.rect(screen, WHITE, lock_rect, 2, border_radius=5)
-    lock_text = button_font.render("LOCK IN", True, BLACK)
-    screen.blit(lock_text, (665 - BUTTON_WIDTH, 510))
+        pygame.draw.rect(surface, color, rect, px(2), border_radius=px(5))
+    text = ui.button_font.render(label, True, BLACK)
+    surface.blit(text, (rect.x + px(text_x), rect.y + px(10)))
+
+
+def action_buttons(rolled):
+    # (layout name, color, label, label x offset) of discard, reroll, lock in
+    return [
+        ("discard", RED, "DISCARD", 10),
+        ("roll", GOLD, "REROLL" if rolled else "ROLL", 25),
+        ("lock", WHITE, "LOCK IN", 15),
+    ]
+
+
+def draw_menu_button(surface, layout, hot):
+    px = ui.scale
+    back_rect = layout.rect("back")
+    pygame.draw.rect(surface, CYAN, back_rect, 0 if hot else px(2), border_radius=px(2))
+    back_text = ui.font.render("MENU", True, BLACK)
+    surface.blit(back_text, (back_rect.x + px(5), back_rect.y + px(10)))  # back to menu letter
+
+
+def draw_playing_static(surface, layout, rolled):
+    # Background, the score box frame and every button in its idle state
+    surface.blit(ui.background, (0, 0))
+    draw_score_box(surface, layout)
+    draw_menu_button(surface, layout, False)
+    for name, color, label, text_x in action_buttons(rolled):
+        draw_button(surface, layout.rect(name), color, label, text_x, False)
+
+
+def draw_buttons(game, layout, hover):
+    # The hovered button, when usable, over its idle frame
+    if hover is None:
+        return
+    if hover == ("back", None):
+        draw_menu_button(screen, layout, True)
+        return
+    usable = {"discard": game.can_discard(), "roll": game.can_roll(), "lock": game.rolled}
+    for name, color, label, text_x in action_buttons(game.rolled):
+        if hover == (name, None) and usable[name]:
+            draw_button(screen, layout.rect(name), color, label, text_x, True)
+
+
+# Widget rects of each screen, built once per screen size and scale (and hand
+# size and dice count) and shared by drawing, hover and click dispatch. The
+# builders work in logical coordinates; the rects are stored in canvas pixels.
+@lru_cache(maxsize=8)
+def playing_layout(width, height, factor, hand_size, dice_count):
+    layout = Layout((width, height), scale=Scale(factor))
+    layout.add("scoreboard", (20, 20, 320, 125), clickable=False)
+    layout.add("back", (width - 120, 30, 100, 60))
+    card_y = height // 2 - CARD_HEIGHT // 2 - 20
+    layout.add("hand", (0, card_y - 4, width, CARD_HEIGHT + 8), clickable=False)
+    start_x = (width - (hand_size * (CARD_WIDTH + 5) - 5)) // 2
+    for i in range(hand_size):
+        layout.add("card", (start_x + i * (CARD_WIDTH + 5), card_y, CARD_WIDTH, CARD_HEIGHT), i)
+    dice_y = height // 2 + 70
+    layout.add("dice", (0, dice_y - 1, width, DICE_SIZE + 2), clickable=False)
+    start_x = (width - (dice_count * (DICE_SIZE + 10) - 10)) // 2
+    for i in range(dice_count):
+        layout.add("die", (start_x + i * (DICE_SIZE + 10), dice_y, DICE_SIZE, DICE_SIZE), i)
+    layout.add("score_box", (width // 2 - 140, height // 2 + 120, 280, 40), clickable=False)
+    layout.add("hint", (0, height // 2 + 160, width, 30), clickable=False)
+    button_y = height - 100
+    layout.add("discard", (width // 2 - 250, button_y, BUTTON_WIDTH, BUTTON_HEIGHT))
+    layout.add("roll", (width // 2 - BUTTON_WIDTH // 2, button_y, BUTTON_WIDTH, BUTTON_HEIGHT))
+    layout.add("lock", (width // 2 + 250 - BUTTON_WIDTH, button_y, BUTTON_WIDTH, BUTTON_HEIGHT))
+    return layout
+
+
+@lru_cache(maxsize=8)
+def menu_layout(width, height, factor):
+    layout = Layout((width, height), scale=Scale(factor))
+    for i, mode in enumerate(MODES):
+        rect = playbutton_image.get_rect(center=(width // 2 + 250, 130 + i * 80))
+        layout.add("mode", rect, mode)
+    return layout
+
+
+@lru_cache(maxsize=8)
+def game_over_layout(width, height, factor):
+    layout = Layout((width, height), scale=Scale(factor))
+    layout.add("text", (0, 90, width, 210), clickable=False)
+    layout.add("back", (width // 2 - 123, height - 100, 250, 60))
+    return layout
+
+
+# Regions of the playing screen for the dirty-rectangle renderer. Each key
+# captures everything the region's pixels depend on.
+def playing_regions(game, layout, hover):
+    glow = ui.scale(10)
+    return [
+        (
+            "scoreboard",
+            layout.rect("scoreboard"),
+            (game.round, game.max_holes, shown_score(game), game.high_scores[game.max_holes]),
+        ),
+        ("back", layout.rect("back"), hover == ("back", None)),
+        (
+            "hand",
+            layout.rect("hand"),
+            (tuple(card.id for card in game.hand), tuple(game.selected), deal_offsets(game)),
+        ),
+        (
+            "dice",
+            layout.rect("dice"),
+            (
+                game.rolled,
+                tuple(game.dice.dice),
+                tuple(game.dice.kept),
+                len(game.hand),
+                tumble_frame(game),
+            ),
+        ),
+        ("score_box", layout.rect("score_box"), game.hand_score()),
+        ("hint", layout.rect("hint"), show_hint and hint_text(game)),
+        (
+            "discard",
+            layout.rect("discard").inflate(glow, glow),
+            game.can_discard() and hover == ("discard", None),
+        ),
+        (
+            "roll",
+            layout.rect("roll").inflate(glow, glow),
+            (game.rolled, game.can_roll() and hover == ("roll", None)),
+        ),
+        ("lock", layout.rect("lock").inflate(glow, glow), game.rolled and hover == ("lock", None)),
+    ]
+
 
 # State handling functions
-def handle_menu(high_scores):
-    background_nature.play()
-    screen.blit(background_image, (0, 0))
-    modes = [3, 9, 18, 36, 54, 72]
-    button_rects = []
-    for i, mode in enumerate(modes):
-        y = 100 + i * 80
-        rect = playbutton_image.get_rect(center=(WIDTH // 2 + 250, y + 30))
-        text = little_font.render(f"Play { mode } Holes", True, BLACK)
-        high_text = small_font.render(f"High: {high_scores[mode]}", True, YELLOW)
-        if rect.collidepoint(pygame.mouse.get_pos()):
-            screen.blit(playbutton_image, rect.topleft)
-        else:
-            screen.blit(playbutton_image, rect.topleft)
+def draw_menu(surface, layout, high_scores):
+    px = ui.scale
+    surface.blit(ui.background_image, (0, 0))
+    for mode in MODES:
+        rect = layout.rect("mode", mode)
+        text = ui.little_font.render(f"Play { mode } Holes", True, BLACK)
+        high_text = ui.button_font.render(f"High: {high_scores[mode]}", True, BLACK)
+        surface.blit(ui.playbutton_image, rect.topleft)
+        surface.blit(text, (rect.centerx - px(90), rect.centery - px(30)))
+        surface.blit(high_text, (rect.centerx - px(90), rect.centery + px(4)))
+
+
+# Each state has an update function, which handles the frame's input and
+# returns the next state, and a render function, which draws the state.
+def render_menu(high_scores):
+    layout = menu_layout(WIDTH, HEIGHT, ui.scale.factor)
+    # The whole menu is static until a high score changes
+    key = tuple(high_scores[mode] for mode in MODES)
+    if renderer.begin("menu", [("menu", screen.get_rect(), key)]):
+        with profiler.stage("menu"):
+            ui.layers.blit(
+                screen, "menu", key, partial(draw_menu, layout=layout, high_scores=high_scores)
+            )
+        renderer.end()
 
-        screen.blit(text, (WIDTH // 2 + 160, y + 10))
-        button_rects.append((rect, mode))
-    for event in pygame.event.get():
+
+def update_menu(events, high_scores):
+    layout = menu_layout(WIDTH, HEIGHT, ui.scale.factor)
+    for event in events:
         if event.type == pygame.QUIT:
             return "quit", None
         if event.type == pygame.MOUSEBUTTONDOWN:
-            x, y = event.pos
-            for rect, mode in button_rects:
-                if rect.collidepoint(x, y):
-                    mouse_click.play()
-                    return "playing", GameState(mode)
+            target = layout.hit(canvas_pos(event.pos))
+            if target is not None:
+                audio.play(mouse_click, "ui")
+                # Drop animations left over from the last game
+                scheduler.cancel_all()
+                game = new_game(target[1], high_scores)
+                animate_deal(game, range(len(game.hand)))
+                return "playing", game
     return "menu", None
 
-def handle_playing(game):
-    background_nature.stop()
-    screen.blit(background, (0, 0))
-
-    draw_scoreboard(game)
-    draw_hand(game)
-    draw_dice_row(game)
-    update_score_display(game)
-    mouse_pos = pygame.mouse.get_pos()
-    draw_buttons(game, mouse_pos)
-
-    back_rect = pygame.Rect(680, 30, 100, 60)
-    mouse_pos = pygame.mouse.get_pos()
-    if back_rect.collidepoint(mouse_pos):
-        pygame.draw.rect(screen, CYAN, back_rect, 0, border_radius=2)
-    else:
-        pygame.draw.rect(screen, CYAN, back_rect, 2, border_radius=2)
-    back_text = font.render("MENU", True, BLACK)
-    screen.blit(back_text, (685, 40))  # back to menu letter
 
-    for event in pygame.event.get():
+def render_playing(game):
+    layout = playing_layout(WIDTH, HEIGHT, ui.scale.factor, len(game.hand), game.dice.count)
+    hover = layout.hit(canvas_pos(pygame.mouse.get_pos()))
+    if renderer.begin("playing", playing_regions(game, layout, hover)):
+        with profiler.stage("background"):
+            ui.layers.blit(
+                screen,
+                "playing",
+                game.rolled,
+                partial(draw_playing_static, layout=layout, rolled=game.rolled),
+            )
+        with profiler.stage("scoreboard"):
+            draw_scoreboard(game, layout)
+        with profiler.stage("hand"):
+            draw_hand(game, layout)
+        with profiler.stage("dice"):
+            draw_dice_row(game, layout)
+        with profiler.stage("score_box"):
+            update_score_display(game, layout)
+        with profiler.stage("hint"):
+            draw_hint(game, layout)
+        with profiler.stage("buttons"):
+            draw_buttons(game, layout, hover)
+        renderer.end()
+
+
+def update_playing(events, game):
+    global show_hint
+    layout = playing_layout(WIDTH, HEIGHT, ui.scale.factor, len(game.hand), game.dice.count)
+    for event in events:
         if event.type == pygame.QUIT:
             return "quit", game
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+            show_hint = not show_hint
         if event.type == pygame.MOUSEBUTTONDOWN:
-            x, y = event.pos
-            if (
-                not game.discarded
-                and not game.rolled
-                and HEIGHT // 2 - CARD_HEIGHT // 2
-                <= y
-                <= HEIGHT // 2 + CARD_HEIGHT // 2
-            ):
-                hand_size = len(game.hand)
-                total_width = hand_size * (CARD_WIDTH + 5) - 5
-                start_x = (WIDTH - total_width) // 2
-                for i in range(hand_size):
-                    card_rect = pygame.Rect(
-                        start_x + i * (CARD_WIDTH + 5),
-                        HEIGHT // 2 - CARD_HEIGHT / 2,
-                        CARD_WIDTH,
-                        CARD_HEIGHT,
-                    )
-                    if card_rect.collidepoint(x, y):
-                        game.selected[i] = not game.selected[i]
-            if game.rolled and HEIGHT // 2 + 70 <= y <= HEIGHT // 2 + 70 + DICE_SIZE:
-                dice_count = game.dice.count
-                total_width = dice_count * (DICE_SIZE + 10) - 10
-                start_x = (WIDTH - total_width) // 2
-                for i in range(dice_count):
-                    dice_rect = pygame.Rect(
-                        start_x + i * (DICE_SIZE + 10),
-                        HEIGHT // 2 + 70,
-                        DICE_SIZE,
-                        DICE_SIZE,
-                    )
-                    if dice_rect.collidepoint(x, y):
-                        game.dice.toggle_keep(i)
-            if back_rect.collidepoint(x, y):
-                background_sound.stop()
+            target = layout.hit(canvas_pos(event.pos))
+            if target is None:
+                continue
+            kind, index = target
+            if kind == "card" and game.can_discard():
+                game.toggle_select(index)
+            elif kind == "die" and game.rolled:
+                game.toggle_keep(index)
+            elif kind == "back":
                 return "menu", game
-            if 500 <= y <= 540:
-                if 150 <= x <= 250 and not game.discarded and not game.rolled:
-                    selected_indices = [i for i, s in enumerate(game.selected) if s]
-                    if selected_indices:
-                        new_hand = [
-                            card
-                            for i, card in enumerate(game.hand)
-                            if i not in selected_indices
-                        ]
-                        discards = len(selected_indices)
-                        new_cards = game.deck.deal(discards)
-                        game.hand = new_hand + new_cards
-                        game.discarded = True
-                        game.selected = [False] * len(game.hand)
-                        game.update_max_rolls()
-                elif (
-                    WIDTH // 2 - BUTTON_WIDTH // 2
-                    <= x
-                    <= WIDTH // 2 + BUTTON_WIDTH // 2
-                ):
-                    if not game.rolled:
-                        game.dice.roll()
-                        game.rolled = True
-                        game.roll_count = 1
-                    elif game.roll_count < game.max_rolls:
-                        # Free reroll for 3-card hands (max 2 free rolls)
-                        if len(game.hand) == 3 and game.roll_count < 2:
-                            if any(not k for k in game.dice.kept):
-                                game.dice.dice = [
-                                    random.choice(POKER_DICE) if not kept else die
-                                    for die, kept in zip(game.dice.dice, game.dice.kept)
-                                ]
-                                game.roll_count += 1
-                        # Free reroll for 2-card hands (max 1 free roll)
-                        elif len(game.hand) == 2 and game.roll_count < 1:
-                            if any(not k for k in game.dice.kept):
-                                game.dice.dice = [
-                                    random.choice(POKER_DICE) if not kept else die
-                                    for die, kept in zip(game.dice.dice, game.dice.kept)
-                                ]
-                                game.roll_count += 1
-                        # Paid reroll (costs 5 points)
-                        elif game.score >= 5 and any(not k for k in game.dice.kept):
-                            game.score -= 5
-                            game.dice.dice = [
-                                random.choice(POKER_DICE) if not kept else die
-                                for die, kept in zip(game.dice.dice, game.dice.kept)
-                            ]
-                            game.roll_count += 1
-                elif 650 - BUTTON_WIDTH <= x <= 650 and game.rolled:
-                    hand_name, base_score = score_hand(game.hand)
-                    multiplier = calc_multiplier(game.hand, game.dice)
-                    game.score += base_score * multiplier
-                    game.high_scores[game.max_holes] = max(
-                        game.high_scores[game.max_holes], game.score
-                    )
-                    game.round += 1
-                    if game.round > game.max_holes:
-                        return "game_over", game
-                    game.hand = game.deck.deal(3)
-                    game.dice = Dice(3)
-                    game.selected = [False] * 3
-                    game.rolled = False
-                    game.roll_count = 0
-                    game.discarded = False
-                    game.update_max_rolls()
+            elif kind == "discard" and game.can_discard():
+                discarding = game.selected.count(True)
+                if game.discard():
+                    hand_size = len(game.hand)
+                    animate_deal(game, range(hand_size - discarding, hand_size))
+            elif kind == "roll":
+                if game.roll():
+                    animate_roll()
+            elif kind == "lock" and game.rolled:
+                old_score = game.score
+                game.lock_in()
+                animate_score(old_score, game.score)
+                if game.is_over():
+                    return "game_over", game
+                animate_deal(game, range(len(game.hand)))
             # Add mulligan button handling
             # if (game.mulligans_remaining > 0 and not game.used_mulligan_this_hole
             #     and 150 <= x <= 250 and 450 <= y <= 490):
@@ -625,66 +703,292 @@ def handle_playing(game):
     return "playing", game
 
 
-def handle_game_over(game, high_scores):
-    background_sound.stop()
-    screen.fill(DARK_GREEN)
+def render_game_over(game):
+    layout = game_over_layout(WIDTH, HEIGHT, ui.scale.factor)
+    hover = layout.hit(canvas_pos(pygame.mouse.get_pos()))
+    regions = [
+        ("text", layout.rect("text"), (game.score, game.high_scores[game.max_holes])),
+        ("back", layout.rect("back"), hover == ("back", None)),
+    ]
+    if renderer.begin("game_over", regions):
+        with profiler.stage("game_over"):
+            draw_game_over(game, layout, hover)
+        renderer.end()
+
+
+def draw_game_over(game, layout, hover):
+    ui.layers.blit(
+        screen,
+        "game_over",
+        (game.score, game.high_scores[game.max_holes]),
+        partial(draw_game_over_static, game=game, layout=layout),
+    )
+    if hover == ("back", None):
+        draw_back_to_menu(screen, layout, True)
+
 
-    if not hasattr(handle_game_over, "game_over_sound"):
-        handle_game_over.game_over_sound = False
+def draw_back_to_menu(surface, layout, hot):
+    px = ui.scale
+    back_rect = layout.rect("back")
+    pygame.draw.rect(surface, CYAN, back_rect, 0 if hot else px(2), border_radius=px(5))
+    back_text = ui.font.render("BACK TO MENU", True, BLACK)
+    surface.blit(back_text, (back_rect.x + px(13), back_rect.y + px(10)))  # back to menu letter
 
-    over_text = big_font.render("GAME OVER", True, RED)
-    score_text = font.render(f"Score: {game.score}", True, YELLOW)
-    high_text = font.render(
+
+def draw_game_over_static(surface, game, layout):
+    # Final and high score plus the idle back button
+    px = ui.scale
+    surface.fill(DARK_GREEN)
+    over_text = ui.big_font.render("GAME OVER", True, RED)
+    score_text = ui.font.render(f"Score: {game.score}", True, YELLOW)
+    high_text = ui.font.render(
         f"High Score: {game.high_scores[game.max_holes]}", True, GREEN
     )
-    back_rect = pygame.Rect(WIDTH // 2 - 123, HEIGHT - 100, 250, 60)
-    mouse_pos = pygame.mouse.get_pos()
-    if back_rect.collidepoint(mouse_pos):
-        pygame.draw.rect(screen, CYAN, back_rect, 0, border_radius=5)
-    else:
-        pygame.draw.rect(screen, CYAN, back_rect, 2, border_radius=5)
-    back_text = font.render("BACK TO MENU", True, BLACK)
-    screen.blit(over_text, (WIDTH // 2 - 120, 100))
-    screen.blit(score_text, (WIDTH // 2 - 80, 200))
-    screen.blit(high_text, (WIDTH // 2 - 120, 250))
-    screen.blit(back_text, (WIDTH // 2 - 110, HEIGHT - 90))  # back to menu letter
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            game_over_sound.play()
-            time.sleep(2)
-            game_over_sound.stop()
-            handle_game_over.game_over_sound = False
-            return "quit", None
+    draw_back_to_menu(surface, layout, False)
+    text_rect = layout.rect("text")
+    surface.blit(over_text, (text_rect.centerx - px(120), text_rect.y + px(10)))
+    surface.blit(score_text, (text_rect.centerx - px(80), text_rect.y + px(110)))
+    surface.blit(high_text, (text_rect.centerx - px(120), text_rect.y + px(160)))
+
+
+def update_game_over(events, game):
+    if not hasattr(update_game_over, "game_over_sound"):
+        update_game_over.game_over_sound = False
+        update_game_over.quitting = None
+
+    layout = game_over_layout(WIDTH, HEIGHT, ui.scale.factor)
+    for event in events:
+        if event.type == pygame.QUIT and update_game_over.quitting is None:
+            # Let the jingle play out, then quit; the loop keeps running
+            audio.play(game_over_sound, "jingle")
+            update_game_over.quitting = scheduler.after(
+                GAME_OVER_QUIT_MS, lambda: audio.stop("jingle")
+            )
         if event.type == pygame.MOUSEBUTTONDOWN:
-            if back_rect.collidepoint(event.pos):
-                background_sound.stop()
+            if layout.hit(canvas_pos(event.pos)) == ("back", None):
+                if update_game_over.quitting is not None:
+                    # Back out of a pending quit: the next game over starts
+                    # afresh
+                    update_game_over.quitting.cancel()
+                    audio.stop("jingle")
+                update_game_over.quitting = None
+                update_game_over.game_over_sound = False
                 return "menu", None
-    if not handle_game_over.game_over_sound:
+    if update_game_over.quitting is not None and update_game_over.quitting.done:
+        update_game_over.quitting = None
+        update_game_over.game_over_sound = False
+        return "quit", None
+    if not update_game_over.game_over_sound:
 
-        handle_game_over.game_over_sound = True
+        update_game_over.game_over_sound = True
     return "game_over", game
 
 
+def get_events():
+    # The frame's input, minus F3, which toggles the profiler overlay
+    # anywhere, and F11, which toggles fullscreen
+    global show_profile
+    events = []
+    for event in pacer.poll():
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_profile = not show_profile
+            profiler.enabled = show_profile or bool(profile_path)
+            draw_profile_overlay.rect = None
+            renderer.invalidate()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+            toggle_fullscreen()
+        else:
+            events.append(event)
+    follow_window()
+    return events
+
+
+def toggle_fullscreen():
+    global fullscreen, windowed_size
+    if fullscreen:
+        pygame.display.set_mode(windowed_size, pygame.RESIZABLE)
+    else:
+        windowed_size = pygame.display.get_surface().get_size()
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    fullscreen = not fullscreen
+    follow_window()
+
+
+# Assets for each canvas size: the backgrounds, play button, fonts, card
+# faces, dice sprites and static layers the draw code uses through `ui`. A
+# set for a new window size is built a step at a time, at most UI_BUILD_MS
+# per frame, while the previous set keeps drawing.
+UI_BUILD_MS = 4
+
+
+def build_ui(factor, size):
+    assets = SimpleNamespace(scale=Scale(factor), size=size)
+    px = assets.scale
+    for name, (image, path) in IMAGES.items():
+        target = px.size(image.get_size())
+        if target == image.get_size():
+            scaled = image
+        else:
+            # Allocated here, a slice per step, and filled on the worker
+            # (see viewport.py) from the full-size file
+            source = source_image(path)
+            yield
+            scaled = yield from allocate(target, image.get_flags() & pygame.SRCALPHA)
+            yield partial(pygame.transform.smoothscale, source, target, scaled)
+        setattr(assets, name, scaled)
+        yield
+    for name, (family, points) in FONTS.items():
+        setattr(assets, name, text_cache.font(family, px(points), bold=True))
+        yield
+    assets.card_size = px.size((CARD_WIDTH, CARD_HEIGHT))
+    assets.cards = yield from card_sprites.build(assets.card_size)
+    # Every face in every matched/kept state, pre-rendered
+    assets.dice_sprites = DiceSprites(
+        px.size((DICE_SIZE, DICE_SIZE)), POKER_DICE, partial(draw_die, assets=assets)
+    )
+    yield from assets.dice_sprites.build()
+    assets.layers = LayerCache(size)
+    yield from assets.layers.reserve()
+    return assets
+
+
+def use_ui(assets):
+    # Draw with this asset set from now on, its canvas centred in the window
+    global ui, screen
+    ui = assets
+    window = pygame.display.get_surface()
+    window.fill(BLACK)
+    screen = window.subsurface(letterbox(ui.size, window.get_size()))
+    renderer.retarget(screen)
+
+
+def follow_window():
+    # Called after every event pump. A resize replaces the display surface,
+    # so the canvas is re-placed right away (with the assets in use, until
+    # the set for the new size is ready)
+    size = pygame.display.get_surface().get_size()
+    if size == follow_window.size:
+        return
+    follow_window.size = size
+    use_ui(ui_cache.request(*fit((WIDTH, HEIGHT), size)) or ui)
+
+
+def canvas_pos(pos):
+    # Window coordinates to canvas coordinates
+    x, y = screen.get_abs_offset()
+    return pos[0] - x, pos[1] - y
+
+
+def draw_profile_overlay():
+    # Per-stage p50/p95/p99 in ms, re-rendered every PROFILE_OVERLAY_MS
+    global profile_overlay
+    now = pygame.time.get_ticks()
+    if profile_overlay[1] is None or now - profile_overlay[0] >= PROFILE_OVERLAY_MS:
+        overlay_font = text_cache.font("couriernew", 14).font
+        lines = [f"{'stage':<11}{'p50':>7}{'p95':>7}{'p99':>7}"] + [
+            f"{name:<11}{p50:7.2f}{p95:7.2f}{p99:7.2f}"
+            for name, _, p50, p95, p99 in profiler.report()
+        ]
+        clicks = latency.percentiles()
+        if clicks is not None:
+            lines.append(f"{'click':<11}" + "".join(f"{ms:7.2f}" for ms in clicks))
+            lines.append(f"{'over frame':<11}{latency.over_budget:>7}/{latency.count}")
+        line_height = overlay_font.get_linesize()
+        width = max(overlay_font.size(line)[0] for line in lines)
+        surface = pygame.Surface((width + 12, line_height * len(lines) + 12)).convert()
+        for i, line in enumerate(lines):
+            surface.blit(overlay_font.render(line, True, WHITE), (6, 6 + i * line_height))
+        profile_overlay = (now, surface)
+    surface = profile_overlay[1]
+    rect = screen.blit(surface, (screen.get_width() - surface.get_width() - 10, 100))
+    renderer.push(rect)
+    previous = getattr(draw_profile_overlay, "rect", None)
+    if previous is not None and not rect.contains(previous):
+        # The overlay shrank or moved: show where it was now, and redraw the
+        # scene under it next frame
+        renderer.push(previous)
+        renderer.invalidate()
+    draw_profile_overlay.rect = rect
+
+
+ui_cache = ResolutionCache(build_ui)
+follow_window.size = window.get_size()
+ui = ui_cache.get(*fit((WIDTH, HEIGHT), follow_window.size))
+screen = window.subsurface(letterbox(ui.size, follow_window.size))
+renderer = DirtyRenderer(screen)
+
+
 # Main game loop
 def main():
-    high_scores = {3: 0, 9: 0, 18: 0, 36: 0, 54: 0, 72: 0}
+    if score_store is not None:
+        high_scores = score_store.high_scores
+    else:
+        high_scores = {mode: 0 for mode in MODES}
     state = "menu"
     game = None
     running = True
+    audio.play_track(STATE_TRACKS[state])
 
     while running:
-        if state == "menu":
-            state, game = handle_menu(high_scores)
-        elif state == "playing":
-            state, game = handle_playing(game)
-        elif state == "game_over":
-            state, game = handle_game_over(game, high_scores)
+        scheduler.update(pygame.time.get_ticks())
+        follow_window()
+        assets = ui_cache.step(UI_BUILD_MS)
+        if assets is not None:
+            use_ui(assets)
+        previous = state
+        # Input, then update, then render: the frame that handles a click
+        # also draws and presents its effect
+        with profiler.stage("events"):
+            events = get_events()
+            if state == "menu":
+                state, game = update_menu(events, high_scores)
+            elif state == "playing":
+                state, game = update_playing(events, game)
+            elif state == "game_over":
+                state, game = update_game_over(events, game)
+        latency.handled(events)
+        if state != previous:
+            # Ambient audio only changes on a state transition
+            audio.play_track(STATE_TRACKS.get(state))
+            if state == "game_over":
+                record_game(game, high_scores)
+            if previous == "playing" and recorder is not None:
+                # Finished, abandoned for the menu or quit: the log gets it
+                game.finish()
+            if previous == "playing" and hand_history is not None:
+                # Its holes go to disk now rather than with a later chunk
+                hand_history.flush()
         if state == "quit":
             running = False
-        pygame.display.flip()
-        clock.tick(60)
-
+        with profiler.stage("render"):
+            if state == "menu":
+                render_menu(high_scores)
+            elif state == "playing":
+                render_playing(game)
+            elif state == "game_over":
+                render_game_over(game)
+        if show_profile:
+            # Drawn over the frame every time, so the loop stays at frame
+            # pace (and keeps producing samples) while the overlay is up
+            draw_profile_overlay()
+        with profiler.stage("present"):
+            presented = renderer.present()
+        latency.presented(presented)
+        # After the present, so the warm-up eats into the frame's sleep
+        warming = state == "playing" and warm_hints(HINT_WARM_MS)
+        # Idle when nothing changed and no input was handled: sleep until an
+        # event arrives (or a timer is due) instead of spinning at 60 FPS
+        busy = presented or events or scheduler.busy() or ui_cache.building() or warming
+        pacer.wait(bool(busy), scheduler.wait_ms(IDLE_TIMEOUT_MS))
+
+    if profile_path:
+        profiler.export(profile_path)
+    if score_store is not None:
+        score_store.close()
+    if recorder is not None:
+        recorder.close()
+    if hand_history is not None:
+        hand_history.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,12 @@
+# The modules' self-checks are pytest tests under tests/; a module's "check"
+# command (or plain `python module.py` for the library modules) runs its
+# test file through this.
+import os
+
+
+def run(name, *args):
+    # Exit status of pytest over tests/test_<name>.py
+    import pytest
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", f"test_{name}.py")
+    return pytest.main(["-q", path, *args])
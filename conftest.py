@@ -0,0 +1,2 @@
+# The modules sit at the top of the tree; this puts them on sys.path for the
+# tests under tests/
@@ -0,0 +1,288 @@
+# Exact score distributions under a policy (simulate.py's Policy classes),
+# for payout auditing where Monte Carlo is too noisy. hole_distribution()
+# enumerates every deal, discard draw, roll and reroll of one hole with its
+# probability; game_distribution() convolves that over the holes of a mode.
+#
+# Assumptions, both true of the simulate.py policies and the current rules:
+#   - Every hole is dealt from a fresh shoe. In a real game the shoe carries
+#     over between holes, which makes holes slightly dependent; with a fresh
+#     shoe they are independent and the game is a plain sum of holes.
+#   - Once the dice are out the policy decides from the hand's size, rank
+#     set and base score, the dice, the kept flags and the roll count, so
+#     that phase is memoized on those rather than on the exact cards.
+# Discards refill the hand to three cards and both rerolls of a three-card
+# hand are free, so a hole's points never depend on the score so far; the
+# policy is asked with a score of 0.
+#
+# Probabilities are floats. Games are summed by direct convolution (not FFT,
+# whose rounding noise would swamp tail probabilities below ~1e-16).
+#
+#   python distribution.py --policy greedy --modes 3 9 72 --tail 500 1000
+#   python distribution.py --check
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from itertools import combinations_with_replacement, product
+from math import comb
+
+import numpy as np
+
+from rules import CARDS, MODES, NUM_CARDS, POKER_DICE, SHOE, SHOE_COUNTS, GameState, score_hand
+from simulate import POLICIES
+
+HAND_SIZE = 3
+
+
+def _draws(counts, count):
+    # Every multiset of `count` cards the shoe can deal, with its probability
+    total = comb(sum(counts), count)
+    ids = [i for i in range(NUM_CARDS) if counts[i]]
+    for drawn in combinations_with_replacement(ids, count):
+        ways = 1
+        for i in set(drawn):
+            ways *= comb(counts[i], drawn.count(i))
+        if ways:
+            yield drawn, ways / total
+
+
+def _ordered_deals():
+    # Every ordered deal of a hand from a fresh shoe: (card ids, probability,
+    # card counts left in the shoe)
+    total = len(SHOE) * (len(SHOE) - 1) * (len(SHOE) - 2)
+    for deal in product(range(NUM_CARDS), repeat=HAND_SIZE):
+        counts = bytearray(SHOE_COUNTS)
+        ways = 1
+        for i in deal:
+            ways *= counts[i]
+            counts[i] -= 1
+        if ways:
+            yield deal, ways / total, counts
+
+
+def _add(into, dist, p):
+    for points, q in dist.items():
+        into[points] += p * q
+
+
+class HoleCalculator:
+    def __init__(self, policy):
+        self.policy = policy
+        # One GameState whose fields are set to each state the policy is
+        # asked about
+        self.game = GameState(MODES[0], random.Random(0))
+        self.examples = {}
+        self.rolled = {}
+        self.rerolls = {}
+        self.discards = {}
+
+    def _info(self, ids):
+        # Memo key of a hand for the dice phase, remembering one hand per key
+        hand = [CARDS[i] for i in ids]
+        mask = 0
+        for card in hand:
+            mask |= card.rank_bit
+        info = (len(hand), mask, score_hand(hand)[1])
+        self.examples.setdefault(info, hand)
+        return info
+
+    def _set_hand(self, hand):
+        game = self.game
+        game.hand = list(hand)
+        game.selected = [False] * len(hand)
+        game.discarded = False
+        game.score = 0
+        game.update_max_rolls()
+
+    def _after_roll(self, info, dice, kept, roll_count):
+        # Distribution of the hole's points from the state just after a roll,
+        # following simulate.play_hole: set the kept dice, reroll while the
+        # policy wants to, then lock in
+        key = (info, dice, kept, roll_count)
+        dist = self.rolled.get(key)
+        if dist is not None:
+            return dist
+        game = self.game
+        self._set_hand(self.examples[info])
+        game.rolled = True
+        game.roll_count = roll_count
+        game.dice.dice = [POKER_DICE[face] for face in dice]
+        game.dice.kept = list(kept)
+        reroll = False
+        if game.can_roll():
+            for i, keep in enumerate(self.policy.keep(game)):
+                if game.dice.kept[i] != keep:
+                    game.toggle_keep(i)
+            reroll = game.can_roll() and self.policy.reroll(game)
+        if not reroll:
+            _, base, multiplier = game.hand_score()
+            dist = {base * multiplier: 1.0}
+        else:
+            dist = self._reroll(info, dice, tuple(game.dice.kept), roll_count, game.roll_cost())
+        self.rolled[key] = dist
+        return dist
+
+    def _reroll(self, info, dice, kept, roll_count, cost):
+        # The rerolled faces do not matter, so the result is memoized on the
+        # kept ones only
+        key = (info, tuple(die if keep else None for die, keep in zip(dice, kept)), roll_count)
+        dist = self.rerolls.get(key)
+        if dist is not None:
+            return dist
+        unkept = [i for i, keep in enumerate(kept) if not keep]
+        p = 1 / len(POKER_DICE) ** len(unkept)
+        total = defaultdict(float)
+        for faces in product(range(len(POKER_DICE)), repeat=len(unkept)):
+            rolled = list(dice)
+            for i, face in zip(unkept, faces):
+                rolled[i] = face
+            _add(total, self._after_roll(info, tuple(rolled), kept, roll_count + 1), p)
+        dist = self.rerolls[key] = {points - cost: q for points, q in total.items()}
+        return dist
+
+    def dice_phase(self, info):
+        # Distribution of the points from rolling a hand with this memo key
+        dist = defaultdict(float)
+        p = 1 / len(POKER_DICE) ** info[0]
+        unkept = (False,) * info[0]
+        for dice in product(range(len(POKER_DICE)), repeat=info[0]):
+            _add(dist, self._after_roll(info, dice, unkept, 1), p)
+        return dist
+
+    def _discard_outcomes(self, hand_ids, kept_ids):
+        # {memo key: probability} of the hands a discard can leave
+        key = (tuple(sorted(hand_ids)), tuple(sorted(kept_ids)))
+        outcomes = self.discards.get(key)
+        if outcomes is None:
+            counts = bytearray(SHOE_COUNTS)
+            for i in hand_ids:
+                counts[i] -= 1
+            outcomes = defaultdict(float)
+            for drawn, p in _draws(counts, HAND_SIZE - len(kept_ids)):
+                outcomes[self._info(kept_ids + drawn)] += p
+            self.discards[key] = outcomes
+        return outcomes
+
+    def hole(self):
+        # {points: probability} of one hole dealt from a fresh shoe. Deals are
+        # ordered (the policy sees the cards in the order they were dealt).
+        game = self.game
+        mixture = defaultdict(float)
+        for deal, p, counts in _ordered_deals():
+            self._set_hand([CARDS[i] for i in deal])
+            game.deck.counts = counts
+            discard = [i for i in self.policy.discard(game) if 0 <= i < HAND_SIZE]
+            if not discard:
+                mixture[self._info(deal)] += p
+                continue
+            kept_ids = tuple(deal[i] for i in range(HAND_SIZE) if i not in discard)
+            for info, q in self._discard_outcomes(deal, kept_ids).items():
+                mixture[info] += p * q
+        dist = defaultdict(float)
+        for info, p in mixture.items():
+            _add(dist, self.dice_phase(info), p)
+        return dict(dist)
+
+
+def hole_distribution(policy="greedy"):
+    return HoleCalculator(POLICIES[policy]()).hole()
+
+
+def to_array(dist):
+    # {points: probability} as an array indexed by points from the lowest
+    # score; returns (lowest score, array)
+    low, high = min(dist), max(dist)
+    array = np.zeros(high - low + 1)
+    for points, p in dist.items():
+        array[points - low] = p
+    return low, array
+
+
+def game_distribution(hole, holes):
+    # Distribution of the sum of `holes` independent holes by repeated
+    # squaring; returns (lowest score, array)
+    low, array = to_array(hole)
+    result_low, result = 0, np.ones(1)
+    power_low, power = low, array
+    while holes:
+        if holes & 1:
+            result = np.convolve(result, power)
+            result_low += power_low
+        holes >>= 1
+        if holes:
+            power = np.convolve(power, power)
+            power_low *= 2
+    return result_low, result
+
+
+class Distribution:
+    def __init__(self, low, probabilities):
+        self.low = low
+        self.p = probabilities
+        self.scores = np.arange(low, low + len(probabilities))
+        # tail[i] = P(score >= low + i), summed from the top so small tails
+        # keep their precision
+        self.tail = np.cumsum(probabilities[::-1])[::-1]
+
+    def mean(self):
+        return float(self.scores @ self.p)
+
+    def std(self):
+        return float(np.sqrt(((self.scores - self.mean()) ** 2) @ self.p))
+
+    def at_least(self, score):
+        index = score - self.low
+        if index <= 0:
+            return 1.0
+        if index >= len(self.tail):
+            return 0.0
+        return float(self.tail[index])
+
+    def percentile(self, q):
+        # Lowest score s with P(score <= s) >= q
+        return int(self.low + np.searchsorted(np.cumsum(self.p), q - 1e-12))
+
+    def exceeded_once_in(self, n):
+        # Lowest score reached with probability at most 1/n
+        index = np.flatnonzero(self.tail <= 1 / n)
+        return int(self.low + index[0]) if index.size else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact Royal Set score distributions")
+    parser.add_argument("--policy", default="greedy", choices=sorted(POLICIES))
+    parser.add_argument("--modes", type=int, nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--tail", type=int, nargs="*", default=[],
+                        help="also print P(score >= each of these)")
+    parser.add_argument("--check", action="store_true",
+                        help="run the tests against sampled holes and the solver's EV")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        import checks
+
+        sys.exit(checks.run("distribution"))
+
+    start = time.perf_counter()
+    hole = hole_distribution(args.policy)
+    hole_s = time.perf_counter() - start
+    print(f"policy={args.policy}: one hole enumerated in {hole_s:.2f}s, "
+          f"{len(hole)} distinct point totals")
+    print(f"{'holes':>6} {'mean':>9} {'std':>8} {'p1':>6} {'p50':>6} {'p99':>6} "
+          f"{'1e-3':>6} {'1e-6':>6} {'1e-9':>6}")
+    start = time.perf_counter()
+    for mode in args.modes:
+        dist = Distribution(*game_distribution(hole, mode))
+        rare = [dist.exceeded_once_in(n) for n in (1e3, 1e6, 1e9)]
+        print(f"{mode:>6} {dist.mean():>9.2f} {dist.std():>8.2f} {dist.percentile(0.01):>6} "
+              f"{dist.percentile(0.5):>6} {dist.percentile(0.99):>6} "
+              + " ".join(f"{'-' if r is None else r:>6}" for r in rare))
+        for score in args.tail:
+            print(f"{'':>6} P(score >= {score}) = {dist.at_least(score):.6e}")
+    print(f"convolved in {time.perf_counter() - start:.2f}s "
+          f"(1e-k: lowest score reached with probability <= 1e-k)")
+
+
+if __name__ == "__main__":
+    main()
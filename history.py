@@ -0,0 +1,306 @@
+# Columnar hand history for bulk analysis: one row per hole locked in, live
+# or simulated. A HistoryWriter is handed to GameState as its history; each
+# lock-in packs one fixed-width row into a bytearray (no I/O, no NumPy per
+# row) and every chunk_rows holes the buffer is split into one .npy file per
+# column, batch.py's encoding (card ids, face indices, PAD for missing):
+#
+#   DIR/<chunk>/mode.npy hole.npy dealt.npy discard_mask.npy hand.npy ...
+#
+# A chunk is written to a temporary directory and renamed into place, so a
+# crash never leaves a partial chunk on disk; rows still buffered are lost.
+# cardgame flushes when a game ends or is left, so a crash there loses at
+# most the game in progress; an export loses at most its open chunks.
+# HandHistory memory-maps the columns a
+# chunk at a time, so aggregations over any number of holes run in bounded
+# memory.
+#
+#   python history.py export DIR --mode 9 --games 100000 [--policy greedy]
+#   python history.py stats DIR
+#   python history.py check
+import argparse
+import os
+import random
+import shutil
+import struct
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from batch import CATEGORY_NAMES, PAD
+from rules import (
+    CATEGORY_IDS,
+    HAND_STRIDE,
+    HAND_TABLE,
+    MODES,
+    RANK_INDEX,
+    REROLL_COST,
+    score_hand,
+)
+
+# Row layout; ROW_DTYPE is the same bytes as seen by NumPy
+ROW = struct.Struct("<BB3BB3BBB3BBBBh")
+ROW_DTYPE = np.dtype([
+    ("mode", "u1"),
+    ("hole", "u1"),
+    # Hand as dealt, and the positions in it thrown away (bit i: card i)
+    ("dealt", "u1", (3,)),
+    ("discard_mask", "u1"),
+    # Hand and dice as locked in
+    ("hand", "u1", (3,)),
+    ("hand_size", "u1"),
+    ("category", "u1"),
+    ("dice", "u1", (3,)),
+    ("roll_count", "u1"),
+    ("paid_rerolls", "u1"),
+    ("multiplier", "u1"),
+    ("points", "<i2"),
+])
+COLUMNS = ROW_DTYPE.names
+CHUNK_ROWS = 1 << 20
+
+
+def _ids(cards):
+    ids = [card.id for card in cards]
+    return ids + [PAD] * (3 - len(ids))
+
+
+def _faces(dice):
+    faces = [RANK_INDEX[face] for face in dice]
+    return faces + [PAD] * (3 - len(faces))
+
+
+class HistoryWriter:
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, prefix=None):
+        # Chunks are named prefix + sequence number; the default prefix is
+        # unique to this writer, so several may share a directory
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        if prefix is None:
+            prefix = f"{time.time_ns():x}-{os.getpid()}-"
+        self.prefix = prefix
+        self.chunks = 0
+        self.rows = bytearray()
+        self.count = 0
+
+    def add(self, game, multiplier, points):
+        # Called by GameState.lock_in before the next hole is dealt
+        hand = game.hand
+        dice = game.dice.dice
+        if len(hand) == 3 and len(dice) == 3:
+            # Every hole under the current rules: no padding, and the
+            # category straight from the hand table
+            h0, h1, h2 = hand[0].id, hand[1].id, hand[2].id
+            d0, d1, d2 = game.dealt
+            self.rows += ROW.pack(
+                game.max_holes,
+                game.round,
+                d0.id, d1.id, d2.id,
+                game.discard_mask,
+                h0, h1, h2,
+                3,
+                HAND_TABLE[(h0 * HAND_STRIDE + h1) * HAND_STRIDE + h2],
+                RANK_INDEX[dice[0]], RANK_INDEX[dice[1]], RANK_INDEX[dice[2]],
+                game.roll_count,
+                game.paid_rerolls,
+                multiplier,
+                points,
+            )
+        else:
+            self._add_padded(game, multiplier, points)
+        self.count += 1
+        if self.count >= self.chunk_rows:
+            self.flush()
+
+    def _add_padded(self, game, multiplier, points):
+        hand = game.hand
+        self.rows += ROW.pack(
+            game.max_holes,
+            game.round,
+            *_ids(game.dealt),
+            game.discard_mask,
+            *_ids(hand),
+            len(hand),
+            CATEGORY_IDS[score_hand(hand)],
+            *_faces(game.dice.dice),
+            game.roll_count,
+            game.paid_rerolls,
+            multiplier,
+            points,
+        )
+
+    def flush(self):
+        # Write the buffered rows out as a chunk
+        if not self.count:
+            return
+        rows = np.frombuffer(bytes(self.rows), dtype=ROW_DTYPE)
+        self.rows = bytearray()
+        self.count = 0
+        chunk = os.path.join(self.path, f"{self.prefix}{self.chunks:06d}")
+        self.chunks += 1
+        temporary = chunk + ".tmp"
+        os.makedirs(temporary, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(temporary, name + ".npy"), np.ascontiguousarray(rows[name]))
+        try:
+            os.rename(temporary, chunk)
+        except OSError:
+            # Most likely a chunk of that name exists already
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+    def close(self):
+        self.flush()
+
+
+def open_history(path):
+    # A HistoryWriter into path, or None when the directory cannot be made
+    try:
+        return HistoryWriter(path)
+    except OSError:
+        return None
+
+
+class HandHistory:
+    def __init__(self, path):
+        self.path = path
+        self.chunks = sorted(
+            name
+            for name in os.listdir(path)
+            if not name.endswith(".tmp") and os.path.isdir(os.path.join(path, name))
+        )
+
+    def columns(self, *names):
+        # Per chunk, a tuple of the named columns memory-mapped read-only
+        for chunk in self.chunks:
+            yield tuple(
+                np.load(os.path.join(self.path, chunk, name + ".npy"), mmap_mode="r")
+                for name in names
+            )
+
+    def __len__(self):
+        return sum(len(mode) for mode, in self.columns("mode"))
+
+    def category_counts(self, mode=None):
+        # Holes locked in per hand category (index into CATEGORY_NAMES)
+        counts = np.zeros(len(CATEGORY_NAMES), dtype=np.int64)
+        for modes, categories in self.columns("mode", "category"):
+            if mode is not None:
+                categories = categories[modes == mode]
+            counts += np.bincount(categories, minlength=len(CATEGORY_NAMES))
+        return counts
+
+    def multiplier_by_hand_size(self):
+        # {hand size: (holes, mean multiplier)}
+        holes = np.zeros(4, dtype=np.int64)
+        total = np.zeros(4)
+        for sizes, multipliers in self.columns("hand_size", "multiplier"):
+            holes += np.bincount(sizes, minlength=4)
+            total += np.bincount(sizes, weights=multipliers, minlength=4)
+        return {size: (int(holes[size]), total[size] / holes[size]) for size in range(4) if holes[size]}
+
+    def reroll_usage(self):
+        # (holes, holes per roll count, holes with a paid reroll, points
+        # spent on paid rerolls)
+        holes = paid_holes = paid = 0
+        rolls = np.zeros(4, dtype=np.int64)
+        for roll_counts, paid_rerolls in self.columns("roll_count", "paid_rerolls"):
+            holes += len(roll_counts)
+            rolls += np.bincount(roll_counts, minlength=4)[:4]
+            paid_holes += int(np.count_nonzero(paid_rerolls))
+            paid += int(paid_rerolls.sum(dtype=np.int64))
+        return holes, rolls, paid_holes, paid * REROLL_COST
+
+    def discard_counts(self):
+        # Holes per discard mask (0: hand kept as dealt)
+        counts = np.zeros(8, dtype=np.int64)
+        for masks, in self.columns("discard_mask"):
+            counts += np.bincount(masks, minlength=8)
+        return counts
+
+
+def export_chunk(task):
+    # Worker entry point: plays `games` games into their own chunks, seeded
+    # like simulate.run_chunk; returns the holes written
+    from simulate import POLICIES, play_game
+
+    path, mode, policy_name, games, seed, chunk, chunk_rows, run = task
+    rng = random.Random(f"{seed}/{mode}/{chunk}")
+    policy = POLICIES[policy_name]()
+    writer = HistoryWriter(path, chunk_rows, prefix=f"{seed}-{mode:02d}-{run}-{chunk:05d}-")
+    for _ in range(games):
+        play_game(mode, policy, rng, writer)
+    writer.close()
+    return games * mode
+
+
+def export(path, mode, games, policy="greedy", seed=0, workers=None,
+           games_per_task=20000, chunk_rows=CHUNK_ROWS):
+    # Simulated games into path across a process pool; returns holes written.
+    # Chunk names carry the run, so repeated exports into one directory add
+    # to it rather than collide
+    run = f"{time.time_ns():x}-{os.getpid()}"
+    tasks = [
+        (path, mode, policy, min(games_per_task, games - start), seed, chunk, chunk_rows, run)
+        for chunk, start in enumerate(range(0, games, games_per_task))
+    ]
+    if workers == 1:
+        return sum(map(export_chunk, tasks))
+    with Pool(workers) as pool:
+        return sum(pool.imap_unordered(export_chunk, tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Royal Set hand history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="simulate games into a history")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--mode", type=int, default=9, choices=MODES)
+    export_parser.add_argument("--games", type=int, default=100000)
+    export_parser.add_argument("--policy", default="greedy")
+    export_parser.add_argument("--seed", type=int, default=0)
+    export_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    stats = commands.add_parser("stats", help="aggregate a history")
+    stats.add_argument("path")
+    commands.add_parser("check", help="run the export and reading tests")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        import checks
+
+        sys.exit(checks.run("history"))
+
+    if args.command == "export":
+        start = time.perf_counter()
+        holes = export(args.path, args.mode, args.games, args.policy, args.seed, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"{holes} holes exported in {elapsed:.2f}s ({holes / elapsed:,.0f} holes/sec)")
+        return
+
+    history = HandHistory(args.path)
+    start = time.perf_counter()
+    counts = history.category_counts()
+    by_size = history.multiplier_by_hand_size()
+    holes, rolls, paid_holes, paid_points = history.reroll_usage()
+    discards = history.discard_counts()
+    elapsed = time.perf_counter() - start
+    print(f"{holes} holes in {len(history.chunks)} chunks")
+    for name, count in zip(CATEGORY_NAMES, counts):
+        if count:
+            print(f"{name:>15} {count:>12} {count / holes:8.3%}")
+    for size, (n, mean) in by_size.items():
+        print(f"{size}-card hands: {n} holes, mean multiplier x{mean:.3f}")
+    print("holes by roll count: " + ", ".join(f"{i}: {n}" for i, n in enumerate(rolls) if n))
+    print(f"paid rerolls in {paid_holes} holes ({paid_holes / holes:.3%}), "
+          f"{paid_points} points spent")
+    by_cards = [0] * 4
+    for mask, n in enumerate(discards):
+        by_cards[bin(mask).count("1")] += n
+    print(f"holes discarding 0/1/2/3 cards: {'/'.join(map(str, by_cards))}")
+    print(f"aggregated in {elapsed:.2f}s ({holes / elapsed:,.0f} holes/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Static composition layers. The parts of a screen that stay put from frame
+# to frame (backgrounds, idle button frames, labels) are drawn once into a
+# display-format surface, and every redraw of the screen starts with one
+# opaque blit of it; only the dynamic layers (cards, dice, scores, hovered
+# buttons) are drawn on top. A layer is cached under a key naming the state
+# its pixels depend on, so a state change redraws it on its next use.
+#
+# Each canvas size's asset set has its own LayerCache, so a resize switches
+# to other layers. Layers cover the whole canvas, which is big at high
+# resolutions: only the max_layers most recently used are kept, a layer is
+# redrawn into the surface it already has, and the surfaces are allocated
+# (and their pages touched) a slice at a time while the asset set is built,
+# so neither a build step nor the first frame at a new size pays for them.
+import pygame
+
+from viewport import allocate
+
+
+class LayerCache:
+    def __init__(self, size, max_layers=2):
+        self.size = size
+        self.max_layers = max_layers
+        # name -> (key, surface), least recently used first
+        self.layers = {}
+        self.spare = []
+        self.enabled = True
+        self.builds = 0
+
+    def reserve(self):
+        # Generator for an asset set's build: allocates the (opaque)
+        # surfaces, a big one over several steps
+        while len(self.spare) < self.max_layers:
+            surface = yield from allocate(self.size)
+            self.spare.append(surface)
+            yield
+
+    def get(self, name, key, target, draw):
+        # The layer's surface, drawn by draw(surface) when the key changed;
+        # draw must cover the whole surface
+        entry = self.layers.pop(name, None)
+        if entry is not None and entry[0] == key:
+            self.layers[name] = entry
+            return entry[1]
+        if entry is not None:
+            surface = entry[1]
+        elif self.spare:
+            surface = self.spare.pop()
+        elif len(self.layers) >= self.max_layers:
+            surface = self.layers.pop(next(iter(self.layers)))[1]
+        else:
+            surface = pygame.Surface(self.size, 0, target)
+        draw(surface)
+        self.layers[name] = (key, surface)
+        self.builds += 1
+        return surface
+
+    def blit(self, target, name, key, draw):
+        # Put the layer on target (within its clip). With caching off,
+        # draw(target) runs every time instead, as a baseline to compare
+        if not self.enabled:
+            draw(target)
+            return
+        target.blit(self.get(name, key, target, draw), (0, 0))
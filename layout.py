@@ -0,0 +1,50 @@
+# Screen layout shared by drawing, hover and click dispatch. A Layout holds
+# the named widget rects of one screen, built once per layout change (screen
+# size, hand size, dice count) instead of being re-derived in every draw and
+# event branch. Clickable widgets are also indexed in a uniform grid hash,
+# so hit() looks at the few widgets in the cell under the point rather than
+# testing every rect. Builders give rects in logical coordinates; with a
+# scale (viewport.Scale) they are stored in canvas pixels.
+import pygame
+
+
+class Layout:
+    def __init__(self, size, cell=64, scale=None):
+        self.size = size
+        self.cell = cell
+        self.scale = scale
+        self.rects = {}
+        self.grid = {}
+        self.order = {}
+
+    def add(self, kind, rect, index=None, clickable=True):
+        # A widget is keyed (kind, index), e.g. ("card", 2) or ("roll", None).
+        # Later clickable widgets win over earlier ones where they overlap.
+        key = (kind, index)
+        rect = pygame.Rect(rect) if self.scale is None else self.scale.rect(rect)
+        self.rects[key] = rect
+        if clickable:
+            self.order[key] = len(self.order)
+            for cell in self._cells(rect):
+                self.grid.setdefault(cell, []).append(key)
+        return rect
+
+    def _cells(self, rect):
+        cell = self.cell
+        for cx in range(rect.left // cell, (rect.right - 1) // cell + 1):
+            for cy in range(rect.top // cell, (rect.bottom - 1) // cell + 1):
+                yield cx, cy
+
+    def rect(self, kind, index=None):
+        return self.rects[(kind, index)]
+
+    def hit(self, pos):
+        # (kind, index) of the topmost clickable widget at pos, or None
+        x, y = pos
+        best = None
+        for key in self.grid.get((x // self.cell, y // self.cell), ()):
+            if self.rects[key].collidepoint(x, y) and (
+                best is None or self.order[key] > self.order[best]
+            ):
+                best = key
+        return best
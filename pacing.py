@@ -0,0 +1,131 @@
+# Frame pacing and input-to-display latency for the main loop, which runs
+# poll input -> update -> render -> present each frame.
+#
+# FramePacer ends a frame. The fixed pacer is Clock.tick(60): it sleeps out
+# the rest of the frame period whatever arrives meanwhile. The adaptive pacer
+# sleeps until the next frame is due on a 60 Hz grid (the software display
+# has no vsync to wait on) or until an input event arrives, whichever comes
+# first, so a click that lands mid-sleep is handled and shown at once. Mouse
+# motion does not cut a frame short (hover can wait for the next frame).
+# With nothing to animate both sleep until an event or the next timer.
+#
+# Events are stamped with perf_counter_ns() when the loop first sees them:
+# when the pacer's wait returns them, else when the frame polls them. pygame
+# events carry no time of their own, so an event queued while a frame is
+# being drawn is stamped at the next poll, up to one frame's work late.
+# LatencyTracker takes each MOUSEBUTTONDOWN from its stamp to the present
+# that ends the frame which handled it; that frame draws after handling
+# input, so it is the first present that can reflect the click.
+from collections import deque
+from time import perf_counter_ns
+
+import pygame
+
+FRAME_MS = 1000 / 60
+
+
+def stamp(events, now=None):
+    # Give each event not seen before the time it is first seen
+    for event in events:
+        if not hasattr(event, "seen_ns"):
+            now = now or perf_counter_ns()
+            event.seen_ns = now
+    return events
+
+
+class FramePacer:
+    def __init__(self, clock, adaptive=True, frame_ms=FRAME_MS):
+        # clock: a pygame Clock (or a stand-in with tick()), kept ticking
+        # for its frame bookkeeping
+        self.clock = clock
+        self.adaptive = adaptive
+        self.frame_ns = int(frame_ms * 1e6)
+        self.deadline = None
+        self.events = []
+        self.early_wakes = 0
+
+    def poll(self):
+        # Events that woke the pacer, then everything queued since, stamped
+        events = self.events + stamp(pygame.event.get())
+        self.events = []
+        return events
+
+    def wait(self, busy, idle_ms):
+        # End the frame. busy: more frames are wanted (something is moving,
+        # or the frame had input); else sleep up to idle_ms for an event.
+        if not busy:
+            self.deadline = None
+            self._wait_event(idle_ms)
+            self.clock.tick()
+            return
+        if not self.adaptive:
+            self.clock.tick(60)
+            return
+        self.clock.tick()
+        now = perf_counter_ns()
+        # The next frame is due a period after the last deadline, not after
+        # this frame's end, so frames stay on the grid; a late frame starts
+        # a new grid instead of bursting to catch up
+        if self.deadline is None or self.deadline + self.frame_ns <= now:
+            self.deadline = now + self.frame_ns
+        else:
+            self.deadline += self.frame_ns
+        while True:
+            timeout_ms = (self.deadline - perf_counter_ns()) // 1000000
+            if timeout_ms < 1:
+                return
+            if self._wait_event(timeout_ms, motion_wakes=False):
+                self.early_wakes += 1
+                self.deadline = None
+                return
+
+    def _wait_event(self, timeout_ms, motion_wakes=True):
+        # Sleep until an event arrives or timeout_ms passes; True if an event
+        # that ends the sleep arrived. Events are kept for the next poll.
+        event = pygame.event.wait(timeout_ms)
+        if event.type == pygame.NOEVENT:
+            return False
+        self.events.append(stamp([event])[0])
+        return motion_wakes or event.type != pygame.MOUSEMOTION
+
+
+class LatencyTracker:
+    def __init__(self, window=600, budget_ms=FRAME_MS):
+        # window: latencies kept for the percentiles
+        self.samples = deque(maxlen=window)
+        self.budget_ms = budget_ms
+        self.pending = []
+        self.count = 0
+        self.over_budget = 0
+        self.unchanged = 0
+
+    def handled(self, events):
+        # Called with the frame's events once they have been handled
+        for event in events:
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.pending.append(event.seen_ns)
+
+    def presented(self, presented):
+        # Called after the frame's present; presented is False when the
+        # frame drew nothing, i.e. its clicks changed nothing on screen
+        if not self.pending:
+            return
+        if presented:
+            now = perf_counter_ns()
+            for seen in self.pending:
+                latency = (now - seen) / 1e6
+                self.samples.append(latency)
+                self.count += 1
+                self.over_budget += latency > self.budget_ms
+        else:
+            self.unchanged += len(self.pending)
+        self.pending = []
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        # Milliseconds at each percentile over the rolling window
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+        return tuple(
+            samples[min(len(samples) - 1, len(samples) * q // 100)] for q in quantiles
+        )
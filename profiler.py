@@ -0,0 +1,89 @@
+# Opt-in frame profiler. Code marks its stages with
+#
+#   with profiler.stage("hand"):
+#       draw_hand(game)
+#
+# and the profiler keeps a rolling window of durations per stage (for
+# p50/p95/p99) plus a bounded trace of every timed stage, which export()
+# writes as Chrome trace JSON (chrome://tracing, ui.perfetto.dev). While
+# disabled, stage() hands back one shared no-op context manager.
+import json
+import os
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter_ns
+
+NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, perf_counter_ns())
+
+
+class FrameProfiler:
+    def __init__(self, window=600, max_trace=200000):
+        # window: samples kept per stage for the percentiles (10 s at 60 FPS)
+        self.enabled = False
+        self.window = window
+        self.stages = {}
+        self.samples = {}
+        self.trace = deque(maxlen=max_trace)
+        self.origin = perf_counter_ns()
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(self, name)
+            self.samples[name] = deque(maxlen=self.window)
+        return stage
+
+    def record(self, name, start, end):
+        self.samples[name].append(end - start)
+        self.trace.append((name, start, end))
+
+    def percentiles(self, name, quantiles=(50, 95, 99)):
+        # Milliseconds at each percentile over the rolling window
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return None
+        return tuple(
+            samples[min(len(samples) - 1, len(samples) * q // 100)] / 1e6 for q in quantiles
+        )
+
+    def report(self):
+        # (stage, count, p50, p95, p99) for every stage seen, slowest p99 first
+        rows = []
+        for name, samples in self.samples.items():
+            p50, p95, p99 = self.percentiles(name)
+            rows.append((name, len(samples), p50, p95, p99))
+        return sorted(rows, key=lambda row: -row[4])
+
+    def export(self, path):
+        events = [
+            {
+                "name": name,
+                "cat": "frame",
+                "ph": "X",
+                "ts": (start - self.origin) / 1e3,
+                "dur": (end - start) / 1e3,
+                "pid": os.getpid(),
+                "tid": 1,
+            }
+            for name, start, end in self.trace
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
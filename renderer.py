@@ -0,0 +1,73 @@
+# Retained-mode dirty-rectangle renderer. Each frame the state handlers
+# describe their screen as named regions with a rect and a state key; only
+# regions whose key changed are redrawn (with drawing clipped to them) and
+# pushed to the display with display.update(rects). A frame with no changed
+# region draws nothing, which lets the main loop go idle. The screen may be a
+# subsurface of the display (a letterboxed canvas); rects are translated to
+# display coordinates when presented.
+import pygame
+
+
+class DirtyRenderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.offset = screen.get_abs_offset()
+        self.scene = None
+        self.keys = {}
+        self.pending = []
+        self.full = True
+        self.frames = 0
+        self.idle_frames = 0
+
+    def invalidate(self):
+        # Force a full redraw on the next frame (resize, screen changes)
+        self.full = True
+
+    def retarget(self, screen):
+        # Draw into a new screen surface (the canvas moved or was resized):
+        # redraw it in full and show the whole display, borders included
+        self.screen = screen
+        self.offset = screen.get_abs_offset()
+        self.full = True
+        self.pending = [screen.get_abs_parent().get_rect()]
+
+    def begin(self, scene, regions):
+        # regions is a list of (name, rect, key). Returns the dirty rects and
+        # clips the screen to them, or returns [] when nothing changed.
+        self.frames += 1
+        if scene != self.scene:
+            self.scene = scene
+            self.full = True
+        keys = {name: key for name, _, key in regions}
+        if self.full:
+            dirty = [self.screen.get_rect()]
+        else:
+            dirty = [
+                pygame.Rect(rect)
+                for name, rect, key in regions
+                if self.keys.get(name, self) != key
+            ]
+        self.keys = keys
+        self.full = False
+        if not dirty:
+            self.idle_frames += 1
+            return []
+        self.screen.set_clip(dirty[0].unionall(dirty[1:]))
+        self.pending.extend(rect.move(self.offset) for rect in dirty)
+        return dirty
+
+    def end(self):
+        self.screen.set_clip(None)
+
+    def push(self, rect):
+        # Show a rect drawn outside begin()/end() (overlays) on next present
+        self.pending.append(pygame.Rect(rect).move(self.offset))
+
+    def present(self):
+        # Push the regions drawn since the last present. Returns False when
+        # there was nothing to show.
+        if not self.pending:
+            return False
+        pygame.display.update(self.pending)
+        self.pending = []
+        return True
@@ -0,0 +1,303 @@
+# Record/replay log of games. A game is fully determined by its mode, the
+# seed of its Random and the GameState actions taken, so the log stores just
+# those, back to back:
+#
+#   varint mode, varint seed, action codes..., END, zigzag varint final score
+#
+# An action code is the varint of kind | index << 3 (index: the card or die).
+# Every code but END is nonzero in every byte (varint continuation bytes have
+# the top bit set), so a reader finds the end of a game's actions with one
+# bytes.find. A game is written to the file in one write when it ends, so a
+# crash loses at most the game in progress.
+#
+# Replaying runs the logged actions through GameState, so a log can be
+# re-checked against a changed rules build; a mismatch is a game whose
+# replayed final score differs from the recorded one.
+#
+#   python replay.py verify games.log [--workers 4]
+#   python replay.py check
+import argparse
+import random
+import sys
+from collections import deque
+from multiprocessing import Pool
+
+from rules import GameState
+
+END = 0
+SELECT = 1
+DISCARD = 2
+ROLL = 3
+KEEP = 4
+LOCK = 5
+CHUNK_SIZE = 1 << 20
+# Games per worker task when verifying in parallel
+BATCH_GAMES = 2000
+
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    # (value, position after it), or None when data ends inside the varint
+    n = shift = 0
+    while pos < len(data):
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+    return None
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+class Recorder:
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        self.game = bytearray()
+
+    def begin(self, mode, seed):
+        # Starting a game drops one that was begun but never ended
+        self.game.clear()
+        write_varint(self.game, mode)
+        write_varint(self.game, seed)
+
+    def action(self, kind, index=0):
+        code = kind | index << 3
+        if code < 0x80:
+            self.game.append(code)
+        else:
+            write_varint(self.game, code)
+
+    def end(self, score):
+        self.game.append(END)
+        write_varint(self.game, zigzag(score))
+        self.file.write(self.game)
+        self.file.flush()
+        self.game.clear()
+
+    def close(self):
+        self.file.close()
+
+
+def open_recorder(path):
+    # A Recorder appending to path, or None when it cannot be opened
+    try:
+        return Recorder(path)
+    except OSError:
+        return None
+
+
+class RecordedGame(GameState):
+    # A GameState that logs every action taken on it; finish() writes it out
+    def __init__(self, max_holes, seed, recorder, high_scores=None, history=None):
+        super().__init__(max_holes, random.Random(seed), high_scores, history)
+        self.recorder = recorder
+        recorder.begin(max_holes, seed)
+
+    def toggle_select(self, index):
+        self.recorder.action(SELECT, index)
+        super().toggle_select(index)
+
+    def discard(self):
+        self.recorder.action(DISCARD)
+        return super().discard()
+
+    def roll(self):
+        self.recorder.action(ROLL)
+        return super().roll()
+
+    def toggle_keep(self, index):
+        self.recorder.action(KEEP, index)
+        super().toggle_keep(index)
+
+    def lock_in(self):
+        self.recorder.action(LOCK)
+        return super().lock_in()
+
+    def finish(self):
+        self.recorder.end(self.score)
+
+
+def read_games(f, chunk_size=CHUNK_SIZE):
+    # Stream (mode, seed, action codes, final score) from a binary file
+    # object, reading it a chunk at a time. Raises ValueError after the last
+    # complete game if the log ends partway through one.
+    data = b""
+    pos = 0
+    while True:
+        header = read_varint(data, pos)
+        seed = header and read_varint(data, header[1])
+        end = data.find(b"\0", seed[1]) if seed else -1
+        score = read_varint(data, end + 1) if end >= 0 else None
+        if score is None:
+            more = f.read(chunk_size)
+            if not more:
+                if pos < len(data):
+                    raise ValueError(f"log ends partway through a game ({len(data) - pos} bytes)")
+                return
+            data = data[pos:] + more
+            pos = 0
+            continue
+        yield header[0], seed[0], data[seed[1] : end], unzigzag(score[0])
+        pos = score[1]
+
+
+def _codes(actions):
+    # Action codes are single bytes unless an index is 16 or more
+    if actions.isascii():
+        return actions
+    codes = []
+    pos = 0
+    while pos < len(actions):
+        code, pos = read_varint(actions, pos)
+        codes.append(code)
+    return codes
+
+
+def replay_game(mode, seed, actions):
+    # The GameState after re-running a logged game
+    game = GameState(mode, random.Random(seed))
+    toggle_select, toggle_keep = game.toggle_select, game.toggle_keep
+    for code in _codes(actions):
+        kind = code & 7
+        if kind == ROLL:
+            game.roll()
+        elif kind == KEEP:
+            toggle_keep(code >> 3)
+        elif kind == SELECT:
+            toggle_select(code >> 3)
+        elif kind == LOCK:
+            game.lock_in()
+        elif kind == DISCARD:
+            game.discard()
+        else:
+            raise ValueError(f"unknown action code {code}")
+    return game
+
+
+def verify_batch(task):
+    # Worker entry point: (first game number, [(mode, seed, actions, score)])
+    # -> (games, actions, [(game number, recorded score, replayed score)])
+    first, games = task
+    actions = 0
+    mismatches = []
+    for number, (mode, seed, codes, score) in enumerate(games, first):
+        replayed = replay_game(mode, seed, codes).score
+        actions += len(codes)
+        if replayed != score:
+            mismatches.append((number, score, replayed))
+    return len(games), actions, mismatches
+
+
+def _batches(games, size):
+    # The games in lists of `size`; a damaged tail is raised after the games
+    # before it have been handed out
+    batch = []
+    first = 0
+    try:
+        for game in games:
+            batch.append(game)
+            if len(batch) == size:
+                yield first, batch
+                first += size
+                batch = []
+    except ValueError:
+        if batch:
+            yield first, batch
+        raise
+    if batch:
+        yield first, batch
+
+
+def verify(path, workers=1, batch_games=BATCH_GAMES):
+    # Replay every game in a log: (games, actions, mismatches, error), where
+    # error describes a damaged tail (None if the log is whole). Streams the
+    # file; with workers > 1 at most two batches per worker are in memory.
+    totals = [0, 0, []]
+    error = None
+
+    def add(result):
+        totals[0] += result[0]
+        totals[1] += result[1]
+        totals[2].extend(result[2])
+
+    with open(path, "rb") as f:
+        batches = _batches(read_games(f), batch_games)
+        try:
+            if workers == 1:
+                for task in batches:
+                    add(verify_batch(task))
+            else:
+                with Pool(workers) as pool:
+                    pending = deque()
+                    for task in batches:
+                        pending.append(pool.apply_async(verify_batch, (task,)))
+                        if len(pending) >= 2 * workers:
+                            add(pending.popleft().get())
+                    while pending:
+                        add(pending.popleft().get())
+        except ValueError as damaged:
+            error = str(damaged)
+    return totals[0], totals[1], totals[2], error
+
+
+def record_games(path, games, mode=9, seed=0, policy=None):
+    # Append `games` policy-played games to a log; returns the actions logged
+    from simulate import GreedyPolicy, play_hole
+
+    policy = policy or GreedyPolicy()
+    rng = random.Random(seed)
+    recorder = Recorder(path)
+    actions = 0
+    for _ in range(games):
+        game = RecordedGame(mode, rng.getrandbits(64), recorder)
+        header = len(recorder.game)
+        while not game.is_over():
+            play_hole(game, policy)
+        actions += len(recorder.game) - header
+        game.finish()
+    recorder.close()
+    return actions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Royal Set game logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("verify", help="replay a log and compare final scores")
+    check.add_argument("log")
+    check.add_argument("--workers", type=int, default=1)
+    commands.add_parser("check", help="run the recording and replay tests")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        import checks
+
+        sys.exit(checks.run("replay"))
+
+    games, actions, mismatches, error = verify(args.log, args.workers)
+    print(f"{games} games, {actions} actions replayed")
+    for number, recorded, replayed in mismatches[:20]:
+        print(f"game {number}: recorded {recorded}, replayed {replayed}")
+    if len(mismatches) > 20:
+        print(f"... {len(mismatches) - 20} more")
+    if error:
+        print(f"damaged log: {error}")
+    if mismatches or error:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
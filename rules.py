@@ -0,0 +1,459 @@
+# Royal Set rules core: cards, deck, dice, scoring and game state transitions.
+# Pure Python with no pygame dependency so it can run headless (tests,
+# simulations, worker processes). The pygame front end lives in cardgame.py.
+import random
+from itertools import combinations_with_replacement, permutations
+
+# Game assets
+SUITS = ["H", "D", "C"]
+RANKS = ["9", "10", "J", "Q", "K", "A"]
+POKER_DICE = ["9", "10", "J", "Q", "K", "A"]
+values = {"9": 9, "10": 10, "J": 10, "Q": 10, "K": 10, "A": 11}
+
+# Hole counts offered on the menu
+MODES = [3, 9, 18, 36, 54, 72]
+REROLL_COST = 5
+
+# Compact encoding: card id = suit index * 6 + rank index (0..17), die face =
+# rank index (0..5). NO_CARD pads hands shorter than three cards.
+NUM_CARDS = len(SUITS) * len(RANKS)
+NO_CARD = NUM_CARDS
+HAND_STRIDE = NUM_CARDS + 1
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+FACE_BITS = {face: 1 << RANK_INDEX[face] for face in POKER_DICE}
+
+
+def card_id(rank, suit):
+    return SUIT_INDEX[suit] * len(RANKS) + RANK_INDEX[rank]
+
+
+# Cards are immutable flyweights: the deck deals the shared instances in CARDS
+class Card:
+    __slots__ = ("rank", "suit", "value", "id", "rank_bit")
+
+    def __init__(self, rank, suit):
+        self.rank = rank
+        self.suit = suit
+        self.value = values[rank]
+        self.id = card_id(rank, suit)
+        self.rank_bit = 1 << RANK_INDEX[rank]
+
+    def __repr__(self):
+        return f"Card({self.rank}{self.suit})"
+
+
+CARDS = tuple(Card(rank, suit) for suit in SUITS for rank in RANKS)
+DECKS_PER_SHOE = 3
+SHOE = bytes(range(NUM_CARDS)) * DECKS_PER_SHOE
+SHOE_COUNTS = bytes([DECKS_PER_SHOE]) * NUM_CARDS
+
+
+# Deck class to manage cards. The shoe is a bytearray of card ids; cards
+# shoe[:size] are still to be dealt, from the end. counts tracks how many of
+# each id remain.
+class Deck:
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.shoe = bytearray(SHOE)
+        self.view = memoryview(self.shoe)
+        self.counts = bytearray(SHOE_COUNTS)
+        self.size = len(SHOE)
+        self.shuffle()
+
+    @property
+    def cards(self):
+        return [CARDS[i] for i in self.view[: self.size]]
+
+    def __len__(self):
+        return self.size
+
+    def shuffle(self):
+        # Shuffles the undealt cards in place
+        self.rng.shuffle(self.view[: self.size])
+
+    def reset(self):
+        self.shoe[:] = SHOE
+        self.counts[:] = SHOE_COUNTS
+        self.size = len(SHOE)
+        self.shuffle()
+
+    def deal(self, count):
+        if self.size < count:
+            self.reset()
+        hand = []
+        for _ in range(count):
+            self.size -= 1
+            card_id = self.shoe[self.size]
+            self.counts[card_id] -= 1
+            hand.append(CARDS[card_id])
+        return hand
+
+
+# Dice class with corrected mechanics
+class Dice:
+    def __init__(self, count, rng=random):
+        self.count = count
+        self.rng = rng
+        self.dice = []
+        self.kept = [False] * count
+
+    def roll(self):
+        self.dice = [self.rng.choice(POKER_DICE) for _ in range(self.count)]
+        self.kept = [False] * self.count
+
+    def roll_unkept(self):
+        self.dice = [
+            self.rng.choice(POKER_DICE) if not kept else die
+            for die, kept in zip(self.dice, self.kept)
+        ]
+
+    def reroll(self, game):
+        if game.score >= 5 and self.count == 3 and any(not kept for kept in self.kept):
+            game.score -= 5
+            for i in range(self.count):
+                if not self.kept[i]:
+                    self.dice[i] = self.rng.choice(POKER_DICE)
+
+    def toggle_keep(self, index):
+        if 0 <= index < self.count:
+            self.kept[index] = not self.kept[index]
+
+
+def max_rolls_for(hand_size):
+    # Rolls allowed per hole for a hand of this size, as set by update_max_rolls
+    if hand_size == 3:
+        return 2
+    if hand_size in (2, 1):
+        return 1
+    return 0
+
+
+def reroll_cost(hand_size, roll_count, max_rolls, score, kept):
+    # Points charged for rolling the unkept dice again, or None when the
+    # roll is not allowed. The first roll of a hole is always free.
+    if roll_count >= max_rolls:
+        return None
+    if not any(not k for k in kept):
+        return None
+    # Free reroll for 3-card hands (max 2 free rolls)
+    if hand_size == 3 and roll_count < 2:
+        return 0
+    # Free reroll for 2-card hands (max 1 free roll)
+    if hand_size == 2 and roll_count < 1:
+        return 0
+    # Paid reroll (costs 5 points)
+    if score >= REROLL_COST:
+        return REROLL_COST
+    return None
+
+
+# GameState class
+class GameState:
+    def __init__(self, max_holes, rng=random, high_scores=None, history=None):
+        # high_scores: best completed game per mode (e.g. a ScoreStore's),
+        # copied so the live score shown as HIGH only stays with this game.
+        # history: given every hole as it is locked in (see history.py)
+        self.rng = rng
+        self.history = history
+        self.round = 1
+        self.score = 0
+        self.high_scores = {mode: 0 for mode in MODES}
+        if high_scores:
+            self.high_scores.update(high_scores)
+        self.max_holes = max_holes
+        self.deck = Deck(rng)
+        self.hand = self.deal_hole()
+        self.dice = Dice(3, rng)
+        self.selected = [False] * 3
+        self.rolled = False
+        self.roll_count = 0
+        self.max_rolls = 2
+        self.discarded = False
+
+    def deal_hole(self):
+        # The dealt hand, and what was done with it, are kept per hole
+        self.dealt = self.deck.deal(3)
+        self.discard_mask = 0
+        self.paid_rerolls = 0
+        return self.dealt
+
+    @property
+    def hand(self):
+        return self._hand
+
+    @hand.setter
+    def hand(self, hand):
+        # Rank set kept alongside the hand for per-frame dice matching
+        self._hand = hand
+        self.hand_ranks = frozenset(card.rank for card in hand)
+
+    def update_max_rolls(self):
+        hand_size = len(self.hand)
+        self.max_rolls = max_rolls_for(hand_size)
+        self.dice = Dice(hand_size if self.max_rolls else 0, self.rng)
+        self.rolled = False
+        self.roll_count = 0
+
+    def can_discard(self):
+        return not self.discarded and not self.rolled
+
+    def toggle_select(self, index):
+        if self.can_discard() and 0 <= index < len(self.hand):
+            self.selected[index] = not self.selected[index]
+
+    def discard(self):
+        if not self.can_discard():
+            return False
+        selected_indices = [i for i, s in enumerate(self.selected) if s]
+        if not selected_indices:
+            return False
+        for i in selected_indices:
+            self.discard_mask |= 1 << i
+        new_hand = [
+            card for i, card in enumerate(self.hand) if i not in selected_indices
+        ]
+        new_cards = self.deck.deal(len(selected_indices))
+        self.hand = new_hand + new_cards
+        self.discarded = True
+        self.selected = [False] * len(self.hand)
+        self.update_max_rolls()
+        return True
+
+    def roll_cost(self):
+        if not self.rolled:
+            return 0
+        return reroll_cost(
+            len(self.hand), self.roll_count, self.max_rolls, self.score, self.dice.kept
+        )
+
+    def can_roll(self):
+        return self.roll_cost() is not None
+
+    def roll(self):
+        cost = self.roll_cost()
+        if cost is None:
+            return False
+        if not self.rolled:
+            self.dice.roll()
+            self.rolled = True
+            self.roll_count = 1
+            return True
+        if cost:
+            self.score -= cost
+            self.paid_rerolls += 1
+        self.dice.roll_unkept()
+        self.roll_count += 1
+        return True
+
+    def toggle_keep(self, index):
+        if self.rolled:
+            self.dice.toggle_keep(index)
+
+    def hand_score(self):
+        # (hand name, base score, multiplier) as shown in the score box
+        hand_name, base_score = score_hand(self.hand)
+        multiplier = calc_multiplier(self.hand, self.dice) if self.rolled else 1
+        return hand_name, base_score, multiplier
+
+    def lock_in(self):
+        # Bank the hole and deal the next one. Returns the points scored, or
+        # None when the dice have not been rolled yet.
+        if not self.rolled:
+            return None
+        hand_name, base_score = score_hand(self.hand)
+        multiplier = calc_multiplier(self.hand, self.dice)
+        points = base_score * multiplier
+        if self.history is not None:
+            self.history.add(self, multiplier, points)
+        self.score += points
+        self.high_scores[self.max_holes] = max(
+            self.high_scores[self.max_holes], self.score
+        )
+        self.round += 1
+        if self.is_over():
+            return points
+        self.hand = self.deal_hole()
+        self.selected = [False] * 3
+        self.discarded = False
+        self.update_max_rolls()
+        return points
+
+    def is_over(self):
+        return self.round > self.max_holes
+
+
+# Scoring functions. score_hand_reference/calc_multiplier_reference are the
+# rule definitions; score_hand/calc_multiplier answer from tables built from
+# them once at import.
+def score_hand_reference(hand):
+    if not hand:
+        return "Nothing", 0
+    ranks = [card.rank for card in hand]
+    suits = [card.suit for card in hand]
+    rank_counts = {rank: ranks.count(rank) for rank in set(ranks)}
+    suit_counts = {suit: suits.count(suit) for suit in set(suits)}
+    rank_order = "910JQKA"
+    rank_indices = sorted([rank_order.index(rank) for rank in ranks])
+    is_straight = (
+        len(rank_indices) == 3
+        and rank_indices[2] - rank_indices[0] == 2
+        and len(set(rank_indices)) == 3
+    )
+
+    # Royal Set: Three of a kind, all same suit
+    if len(set(ranks)) == 1 and len(set(suits)) == 1:
+        return "Royal Set", 50
+    # Royal Flush: A, K, Q same suit
+    if set(ranks) == {"A", "K", "Q"} and len(set(suits)) == 1:
+        return "Royal Flush", 40
+    # Straight Flush: Three consecutive ranks, same suit
+    if is_straight and len(set(suits)) == 1:
+        return "Straight Flush", 30
+    # Triple Double: Three of a kind, two same suit
+    if (
+        3 in rank_counts.values()
+        and len(set(suits)) == 2
+        and max(suit_counts.values()) == 2
+    ):
+        return "Triple Double", 20
+    # Trips: Three of a kind, all different suits
+    if 3 in rank_counts.values() and len(set(suits)) == 3:
+        return "Trips", 25
+    # Paired Flush: Flush with a pair
+    if len(set(suits)) == 1 and 2 in rank_counts.values():
+        return "Paired Flush", 15
+    # Flushed Pair: Pair with same suit, third different
+    if 2 in rank_counts.values():
+        pair_rank = [r for r, c in rank_counts.items() if c == 2][0]
+        pair_suits = [s for r, s in zip(ranks, suits) if r == pair_rank]
+        if len(set(pair_suits)) == 1 and len(set(suits)) > 1:
+            return "Flushed Pair", 10
+    # Flush: Three cards, same suit (no pair or straight)
+    if len(set(suits)) == 1 and 2 not in rank_counts.values() and not is_straight:
+        return "Flush", 5
+    # Straight: Three consecutive ranks, mixed suits
+    if is_straight and len(set(suits)) > 1:
+        return "Straight", 3
+    # Pair: Two cards same rank
+    if 2 in rank_counts.values():
+        return "Pair", 2
+    # High Card: None of the above
+    return "High Card", 1
+
+
+def calc_multiplier_reference(hand, dice):
+    if not dice.dice:
+        return 1
+    hand_ranks = set(card.rank for card in hand)
+    dice_ranks = set(dice.dice)
+    matches = len(hand_ranks & dice_ranks)
+    max_matches = len(hand)
+    if matches == max_matches:
+        return 8
+    elif matches == 2:
+        return 4
+    elif matches == 1:
+        return 2
+    return 1
+
+
+# Category ids in ascending base score; HAND_TABLE stores the id per hand
+HAND_CATEGORIES = [
+    ("Nothing", 0),
+    ("High Card", 1),
+    ("Pair", 2),
+    ("Straight", 3),
+    ("Flush", 5),
+    ("Flushed Pair", 10),
+    ("Paired Flush", 15),
+    ("Triple Double", 20),
+    ("Trips", 25),
+    ("Straight Flush", 30),
+    ("Royal Flush", 40),
+    ("Royal Set", 50),
+]
+CATEGORY_IDS = {category: i for i, category in enumerate(HAND_CATEGORIES)}
+
+
+def hand_key(ids):
+    # Table index for up to three card ids in any order, NO_CARD padded
+    ids = list(ids) + [NO_CARD] * (3 - len(ids))
+    return (ids[0] * HAND_STRIDE + ids[1]) * HAND_STRIDE + ids[2]
+
+
+def multiplier_key(hand_size, hand_mask, dice_mask):
+    return (hand_size << 12) | (hand_mask << 6) | dice_mask
+
+
+def _build_hand_table():
+    table = bytearray(HAND_STRIDE ** 3)
+    for combo in combinations_with_replacement(range(NUM_CARDS + 1), 3):
+        hand = [CARDS[i] for i in combo if i != NO_CARD]
+        category = CATEGORY_IDS[score_hand_reference(hand)]
+        for ordered in set(permutations(combo)):
+            table[hand_key(ordered)] = category
+    return bytes(table)
+
+
+def _build_multiplier_table():
+    table = bytearray(4 << 12)
+    popcount = [bin(mask).count("1") for mask in range(64)]
+    for hand_size in range(4):
+        for hand_mask in range(64):
+            for dice_mask in range(64):
+                if not dice_mask:
+                    multiplier = 1
+                else:
+                    matches = popcount[hand_mask & dice_mask]
+                    if matches == hand_size:
+                        multiplier = 8
+                    elif matches == 2:
+                        multiplier = 4
+                    elif matches == 1:
+                        multiplier = 2
+                    else:
+                        multiplier = 1
+                table[multiplier_key(hand_size, hand_mask, dice_mask)] = multiplier
+    return bytes(table)
+
+
+HAND_TABLE = _build_hand_table()
+MULTIPLIER_TABLE = _build_multiplier_table()
+
+
+def score_hand(hand):
+    size = len(hand)
+    if size == 3:
+        key = (hand[0].id * HAND_STRIDE + hand[1].id) * HAND_STRIDE + hand[2].id
+    elif size == 2:
+        key = (hand[0].id * HAND_STRIDE + hand[1].id) * HAND_STRIDE + NO_CARD
+    elif size == 1:
+        key = (hand[0].id * HAND_STRIDE + NO_CARD) * HAND_STRIDE + NO_CARD
+    elif size == 0:
+        key = (NO_CARD * HAND_STRIDE + NO_CARD) * HAND_STRIDE + NO_CARD
+    else:
+        return score_hand_reference(hand)
+    return HAND_CATEGORIES[HAND_TABLE[key]]
+
+
+def calc_multiplier(hand, dice):
+    if not dice.dice:
+        return 1
+    if len(hand) > 3:
+        return calc_multiplier_reference(hand, dice)
+    hand_mask = 0
+    for card in hand:
+        hand_mask |= card.rank_bit
+    dice_mask = 0
+    for die in dice.dice:
+        dice_mask |= FACE_BITS[die]
+    return MULTIPLIER_TABLE[(len(hand) << 12) | (hand_mask << 6) | dice_mask]
+
+
+if __name__ == "__main__":
+    import sys
+
+    import checks
+
+    sys.exit(checks.run("rules"))
@@ -0,0 +1,180 @@
+# Frame-driven scheduler for timers and tweens. The main loop calls
+# update(now_ms) once per frame; nothing here sleeps or blocks. Timers fire
+# from that call, one-shot or repeating. Tweens advance on a fixed timestep
+# (so an animation looks the same at any frame rate) and are read back
+# interpolated between the last two steps. Both can be cancelled.
+import heapq
+from itertools import count
+
+STEP_MS = 1000 / 60
+# Longest gap one update will simulate, so a stall (window drag, debugger)
+# does not replay a burst of steps and timers afterwards
+MAX_ELAPSED_MS = 250
+
+
+def linear(t):
+    return t
+
+
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+
+class Timer:
+    __slots__ = ("due", "interval", "callback", "cancelled", "done")
+
+    def __init__(self, due, interval, callback):
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Tween:
+    # Moves from start to end over a number of fixed steps, after an
+    # optional delay (in steps) during which it holds at start
+    __slots__ = ("scheduler", "start", "end", "steps", "ease", "step", "previous", "current",
+                 "cancelled", "done")
+
+    def __init__(self, scheduler, start, end, steps, ease, delay):
+        self.scheduler = scheduler
+        self.start = start
+        self.end = end
+        self.steps = steps
+        self.ease = ease
+        self.step = -delay
+        self.previous = self.current = start
+        self.cancelled = False
+        self.done = False
+
+    def advance(self):
+        self.step += 1
+        self.previous = self.current
+        t = min(max(self.step / self.steps, 0), 1)
+        self.current = self.start + (self.end - self.start) * self.ease(t)
+        self.done = self.step >= self.steps
+
+    @property
+    def value(self):
+        if self.done:
+            return self.end
+        return self.previous + (self.current - self.previous) * self.scheduler.alpha
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    def __init__(self, step_ms=STEP_MS):
+        self.step_ms = step_ms
+        self.now = None
+        self.timers = []
+        self.sequence = count()
+        self.tweens = []
+        self.named = {}
+        self.accumulator = 0.0
+        self.alpha = 0.0
+
+    def _clock(self):
+        return 0 if self.now is None else self.now
+
+    def after(self, delay_ms, callback):
+        return self._add(Timer(self._clock() + delay_ms, None, callback))
+
+    def every(self, interval_ms, callback):
+        return self._add(Timer(self._clock() + interval_ms, interval_ms, callback))
+
+    def _add(self, timer):
+        heapq.heappush(self.timers, (timer.due, next(self.sequence), timer))
+        return timer
+
+    def tween(self, duration_ms, start=0.0, end=1.0, ease=ease_out_cubic, delay_ms=0, key=None):
+        # A keyed tween replaces any running tween with the same key, which
+        # value(key) then reads
+        tween = Tween(
+            self,
+            start,
+            end,
+            max(1, round(duration_ms / self.step_ms)),
+            ease,
+            round(delay_ms / self.step_ms),
+        )
+        if key is not None:
+            old = self.named.get(key)
+            if old is not None:
+                old.cancel()
+            self.named[key] = tween
+        self.tweens.append(tween)
+        return tween
+
+    def value(self, key, default):
+        tween = self.named.get(key)
+        if tween is None or tween.cancelled or tween.done:
+            return default
+        return tween.value
+
+    def cancel_all(self):
+        for _, _, timer in self.timers:
+            timer.cancel()
+        for tween in self.tweens:
+            tween.cancel()
+        self.timers = []
+        self.tweens = []
+        self.named = {}
+
+    def busy(self):
+        # True while a tween is running, i.e. the screen needs new frames
+        return bool(self.tweens)
+
+    def wait_ms(self, limit):
+        # How long the loop may sleep before the next timer is due; at least
+        # 1 ms, since pygame.event.wait(0) would wait forever
+        while self.timers and self.timers[0][2].cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return limit
+        return max(1, min(limit, int(self.timers[0][0] - self._clock())))
+
+    def update(self, now):
+        elapsed = 0 if self.now is None else min(now - self.now, MAX_ELAPSED_MS)
+        self.now = now
+
+        while self.timers and self.timers[0][0] <= now:
+            _, _, timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            if timer.interval:
+                # Skip missed repeats rather than firing them all at once
+                missed = (now - timer.due) // timer.interval
+                timer.due += timer.interval * (missed + 1)
+                self._add(timer)
+            else:
+                timer.done = True
+            timer.callback()
+
+        if not self.tweens:
+            self.accumulator = 0.0
+            self.alpha = 0.0
+            return
+        self.accumulator += elapsed
+        while self.accumulator >= self.step_ms and self.tweens:
+            self.accumulator -= self.step_ms
+            for tween in self.tweens:
+                if not tween.cancelled:
+                    tween.advance()
+            self.tweens = [tween for tween in self.tweens if not (tween.cancelled or tween.done)]
+        for key in [key for key, tween in self.named.items() if tween.cancelled or tween.done]:
+            del self.named[key]
+        self.alpha = self.accumulator / self.step_ms
+
+
+if __name__ == "__main__":
+    import sys
+
+    import checks
+
+    sys.exit(checks.run("scheduler"))
@@ -0,0 +1,163 @@
+# Durable high-score store: every completed game is a row in an SQLite
+# database in WAL mode, so a crash never leaves it half-written. record() only
+# updates the in-memory high scores and queues the row; a background thread
+# commits queued rows in batches, so the game loop never waits on the disk.
+# Each batch also updates a per-mode summary row (games, total, best) in the
+# same transaction, so loading the highs and per-mode statistics read one
+# row per mode; top-N lists walk the (mode, score) index. Neither scans the
+# history.
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from rules import MODES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    mode INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_mode_score ON games (mode, score);
+CREATE TABLE IF NOT EXISTS mode_stats (
+    mode INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    best INTEGER NOT NULL
+);
+"""
+UPDATE_STATS = """
+INSERT INTO mode_stats (mode, games, total, best) VALUES (?, ?, ?, ?)
+ON CONFLICT (mode) DO UPDATE SET
+    games = games + excluded.games,
+    total = total + excluded.total,
+    best = MAX(best, excluded.best)
+"""
+# Rows written per transaction at most
+MAX_BATCH = 512
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    # With WAL a commit survives the process crashing; only a power loss
+    # can take back the last few transactions
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class ScoreStore:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # The main thread reads through its own connection; the writer
+        # thread has the other, and WAL lets them work side by side
+        self.db = connect(path)
+        self.db.executescript(SCHEMA)
+        self.high_scores = {mode: 0 for mode in MODES}
+        for mode, best in self.db.execute("SELECT mode, best FROM mode_stats"):
+            self.high_scores[mode] = max(best, 0)
+        self.queue = queue.Queue()
+        self.closed = False
+        self.writer = threading.Thread(
+            target=self._write, args=(connect(path),), name="scores", daemon=True
+        )
+        self.writer.start()
+        atexit.register(self.close)
+
+    def record(self, mode, score, finished=None):
+        # Called when a game is completed; returns at once
+        if self.closed:
+            # No writer is left to commit it
+            raise RuntimeError("score store is closed")
+        if score > self.high_scores.get(mode, 0):
+            self.high_scores[mode] = score
+        self.queue.put((mode, score, time.time() if finished is None else finished))
+
+    def _write(self, db):
+        while True:
+            rows = [self.queue.get()]
+            while len(rows) < MAX_BATCH:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            games = [row for row in rows if row is not None]
+            try:
+                if games:
+                    with db:
+                        db.executemany(
+                            "INSERT INTO games (mode, score, finished) VALUES (?, ?, ?)", games
+                        )
+                        db.executemany(UPDATE_STATS, summarize(games))
+            except sqlite3.Error:
+                # Disk full or the like: the batch is lost, but the game
+                # (and later batches) carry on
+                pass
+            finally:
+                for _ in rows:
+                    self.queue.task_done()
+            if len(games) < len(rows):
+                db.close()
+                return
+
+    def flush(self):
+        # Wait until everything recorded so far is committed
+        self.queue.join()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer.join()
+        self.db.close()
+
+    def top(self, mode, n=10):
+        # [(score, finished)] of the n best games in a mode, best first
+        return self.db.execute(
+            "SELECT score, finished FROM games WHERE mode = ? ORDER BY score DESC LIMIT ?",
+            (mode, n),
+        ).fetchall()
+
+    def stats(self, mode):
+        # (games played, mean score, best score) in a mode
+        row = self.db.execute(
+            "SELECT games, total, best FROM mode_stats WHERE mode = ?", (mode,)
+        ).fetchone()
+        if row is None:
+            return 0, 0.0, 0
+        games, total, best = row
+        return games, total / games, best
+
+
+def summarize(games):
+    # (mode, games, total, best) per mode in a batch of (mode, score, finished)
+    summary = {}
+    for mode, score, _ in games:
+        count, total, best = summary.get(mode, (0, 0, score))
+        summary[mode] = (count + 1, total + score, max(best, score))
+    return [(mode, *row) for mode, row in summary.items()]
+
+
+def open_store(path):
+    # The store, or None when the database cannot be opened (read-only
+    # directory, corrupt file) so the game still runs, without persistence
+    try:
+        return ScoreStore(path)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    import checks
+
+    sys.exit(checks.run("scores"))
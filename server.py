@@ -0,0 +1,457 @@
+# Hosted Royal Set: an asyncio server that keeps many independent GameState
+# sessions in memory and plays them over line-delimited JSON. Every request
+# is one JSON object on one line, answered in order by one line (blank lines
+# are skipped):
+#
+#   {"op": "new", "mode": 9, "seed": 7}     -> {"ok": true, "session": "...", "state": {...}}
+#   {"op": "select", "session": s, "card": 0}
+#   {"op": "discard", "session": s}
+#   {"op": "roll", "session": s}            first roll of the hole
+#   {"op": "reroll", "session": s}          roll the unkept dice again
+#   {"op": "keep", "session": s, "die": 1}
+#   {"op": "lock", "session": s}            -> also "points"
+#   {"op": "menu", "session": s, "mode": 3} start a new game in the session
+#   {"op": "end", "session": s}
+#   {"op": "stats"}
+#
+# An action the rules refuse (rolling with no rolls left, ...) answers
+# "ok": false with the unchanged state. Each session owns its Random (seeded
+# from "seed" or from the OS), so games never share a stream. Actions are a
+# few microseconds of pure Python and run inline on the event loop; nothing
+# here blocks on I/O, and finished games go to the ScoreStore's write-behind
+# queue. Sessions are not tied to a connection: one left idle for longer than
+# the idle timeout is evicted.
+#
+#   python server.py serve [--port 8765] [--idle 300] [--scores path]
+#   python server.py load [--sessions 10000] [--connections 64] [--seconds 10] [--pipeline 1]
+#   python server.py check
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import time
+from collections import OrderedDict, deque
+
+from rules import MODES, GameState
+from scores import open_store
+
+PORT = 8765
+IDLE_SECONDS = 300
+MAX_SESSIONS = 200000
+# Longest request line accepted
+MAX_LINE = 4096
+
+
+class Session:
+    __slots__ = ("id", "rng", "game", "last")
+
+    def __init__(self, session_id, rng, mode):
+        self.id = session_id
+        self.rng = rng
+        self.game = GameState(mode, rng)
+        self.last = time.monotonic()
+
+
+def game_state(game):
+    return {
+        "holes": game.max_holes,
+        "round": game.round,
+        "score": game.score,
+        "hand": [card.rank + card.suit for card in game.hand],
+        "selected": game.selected,
+        "dice": game.dice.dice,
+        "kept": game.dice.kept,
+        "rolled": game.rolled,
+        "can_discard": game.can_discard(),
+        "roll_cost": game.roll_cost(),
+        "over": game.is_over(),
+    }
+
+
+def _index(request, name):
+    index = request.get(name)
+    # bool is an int subclass, but true is not card 1
+    if not isinstance(index, int) or isinstance(index, bool):
+        raise ValueError(f"{name} must be an integer")
+    return index
+
+
+def select(game, request):
+    index = _index(request, "card")
+    if not game.can_discard() or not 0 <= index < len(game.hand):
+        return False
+    game.toggle_select(index)
+    return True
+
+
+def keep(game, request):
+    index = _index(request, "die")
+    if not game.rolled or not 0 <= index < game.dice.count:
+        return False
+    game.toggle_keep(index)
+    return True
+
+
+def roll(game, request):
+    return not game.rolled and game.roll()
+
+
+def reroll(game, request):
+    return game.rolled and game.roll()
+
+
+# op -> action(game, request) returning whether the rules allowed it
+ACTIONS = {
+    "select": select,
+    "discard": lambda game, request: game.discard(),
+    "roll": roll,
+    "reroll": reroll,
+    "keep": keep,
+}
+
+
+def _mode(request):
+    mode = request.get("mode")
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    return mode
+
+
+class GameServer:
+    def __init__(self, idle=IDLE_SECONDS, max_sessions=MAX_SESSIONS, store=None):
+        self.idle = idle
+        self.max_sessions = max_sessions
+        self.store = store
+        # Least recently used first, so eviction only looks at sessions it
+        # evicts
+        self.sessions = OrderedDict()
+        self.actions = 0
+        self.evicted = 0
+
+    def handle(self, line):
+        # One request line to one response line
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            response = self.dispatch(request)
+        except Exception as error:
+            # Bad JSON, nesting too deep for the decoder (RecursionError),
+            # wrong types: whatever a malformed request trips over, it gets
+            # an error line and the connection and its pipeline live on
+            response = {"ok": False, "error": str(error)}
+        self.actions += 1
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+
+    def dispatch(self, request):
+        op = request.get("op")
+        if op == "new":
+            return self.new_session(request)
+        if op == "stats":
+            return {"ok": True, **self.stats()}
+        session_id = request.get("session")
+        session = self.sessions.get(session_id) if isinstance(session_id, str) else None
+        if session is None:
+            raise ValueError("unknown or expired session")
+        session.last = time.monotonic()
+        self.sessions.move_to_end(session.id)
+        game = session.game
+        if op == "end":
+            del self.sessions[session.id]
+            return {"ok": True}
+        if op == "menu":
+            session.game = GameState(_mode(request), session.rng)
+            return {"ok": True, "state": game_state(session.game)}
+        if op == "lock":
+            if game.is_over():
+                return {"ok": False, "state": game_state(game)}
+            points = game.lock_in()
+            if game.is_over() and self.store is not None:
+                self.store.record(game.max_holes, game.score)
+            return {"ok": points is not None, "points": points, "state": game_state(game)}
+        action = ACTIONS.get(op)
+        if action is None:
+            raise ValueError(f"unknown op {op!r}")
+        ok = not game.is_over() and action(game, request)
+        return {"ok": bool(ok), "state": game_state(game)}
+
+    def new_session(self, request):
+        mode = _mode(request)
+        if len(self.sessions) >= self.max_sessions:
+            return {"ok": False, "error": "server full"}
+        seed = request.get("seed")
+        if seed is not None and not isinstance(seed, (int, str)):
+            raise ValueError("seed must be an integer or a string")
+        rng = random.Random(seed) if seed is not None else random.Random()
+        session = Session(secrets.token_hex(8), rng, mode)
+        self.sessions[session.id] = session
+        return {"ok": True, "session": session.id, "state": game_state(session.game)}
+
+    def evict(self, now=None):
+        # Drop sessions idle for longer than the timeout; returns how many
+        cutoff = (time.monotonic() if now is None else now) - self.idle
+        evicted = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.last > cutoff:
+                break
+            self.sessions.popitem(last=False)
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "actions": self.actions,
+            "evicted": self.evicted,
+            "cpu": time.process_time(),
+            "rss": rss(),
+        }
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(max(1, self.idle / 4))
+            self.evict()
+
+    async def serve(self, host="127.0.0.1", port=PORT, ready=None):
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: GameProtocol(self), host, port)
+        sweeper = asyncio.create_task(self.sweep())
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+
+class GameProtocol(asyncio.Protocol):
+    # One connection. Requests are handled straight from data_received, and
+    # the answers to all the lines that arrived together go out in one write
+    # (a pipelining client gets one send per batch, not per request). While
+    # the client is not reading its answers, the connection stops reading
+    # requests.
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        if len(self.buffer) > MAX_LINE:
+            self.transport.close()
+            return
+        handle = self.server.handle
+        answers = [handle(line) for line in lines if line.strip()]
+        if answers:
+            self.transport.write(b"".join(answers))
+
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+def rss():
+    # Resident memory in bytes where /proc is available, else None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+# Load generator. Each connection owns a share of the sessions and plays them
+# round robin with up to `pipeline` requests (for different sessions) in
+# flight, choosing each session's next action from its last returned state:
+# sometimes discard a card, roll, toggle a die and reroll while rerolls are
+# free, lock in, and start over when the game ends.
+def next_request(session_id, state, rng):
+    if state["over"]:
+        return {"op": "menu", "session": session_id, "mode": state["holes"]}
+    if state["can_discard"]:
+        if any(state["selected"]):
+            return {"op": "discard", "session": session_id}
+        if rng.random() < 0.3:
+            return {"op": "select", "session": session_id, "card": rng.randrange(len(state["hand"]))}
+    if not state["rolled"]:
+        return {"op": "roll", "session": session_id}
+    if state["roll_cost"] == 0:
+        if rng.random() < 0.5:
+            return {"op": "keep", "session": session_id, "die": rng.randrange(len(state["dice"]))}
+        return {"op": "reroll", "session": session_id}
+    return {"op": "lock", "session": session_id}
+
+
+def send(writer, message):
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+async def request(reader, writer, message):
+    send(writer, message)
+    return json.loads(await reader.readline())
+
+
+async def open_sessions(port, sessions, seed):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random(seed)
+    states = {}
+    for i in range(sessions):
+        response = await request(
+            reader, writer, {"op": "new", "mode": MODES[i % len(MODES)], "seed": rng.randrange(1 << 32)}
+        )
+        states[response["session"]] = response["state"]
+    return reader, writer, rng, states
+
+
+async def play_sessions(connection, deadline, latencies, pipeline):
+    reader, writer, rng, states = connection
+    order = list(states)
+    in_flight = deque()
+    i = 0
+
+    def send_next():
+        nonlocal i
+        session_id = order[i % len(order)]
+        i += 1
+        send(writer, next_request(session_id, states[session_id], rng))
+        in_flight.append((session_id, time.perf_counter_ns()))
+
+    # A window no larger than the session list never has two requests for
+    # one session in flight
+    for _ in range(min(pipeline, len(order))):
+        send_next()
+    while in_flight:
+        response = json.loads(await reader.readline())
+        session_id, start = in_flight.popleft()
+        latencies.append(time.perf_counter_ns() - start)
+        states[session_id] = response["state"]
+        if time.perf_counter() < deadline:
+            send_next()
+    writer.close()
+
+
+async def server_stats(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    stats = await request(reader, writer, {"op": "stats"})
+    writer.close()
+    return stats
+
+
+async def run_load(port, sessions, connections, seconds, pipeline=1, seed=0):
+    per_connection = [sessions // connections + (i < sessions % connections)
+                      for i in range(connections)]
+    opened = await asyncio.gather(*(
+        open_sessions(port, n, f"{seed}/{i}") for i, n in enumerate(per_connection) if n
+    ))
+    latencies = []
+    before = await server_stats(port)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        play_sessions(connection, start + seconds, latencies, pipeline) for connection in opened
+    ))
+    elapsed = time.perf_counter() - start
+    stats = await server_stats(port)
+    latencies.sort()
+    return {
+        "sessions": stats["sessions"],
+        "server_rss": stats["rss"],
+        "actions": len(latencies),
+        "actions_per_s": len(latencies) / elapsed,
+        # Server CPU per action: with the load generator on the same core,
+        # the throughput the server alone would sustain is about 1 / this
+        "server_cpu_us": (stats["cpu"] - before["cpu"]) * 1e6 / len(latencies),
+        "latency_ms_p50": latencies[len(latencies) // 2] / 1e6,
+        "latency_ms_p99": latencies[len(latencies) * 99 // 100] / 1e6,
+    }
+
+
+def spawn_server(idle):
+    # A server in its own process (on its own core where there is more than
+    # one), so the load generator does not share its event loop. Returns the
+    # process and the port it listens on.
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", "--port", "0",
+         "--idle", str(idle), "--scores", ""],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    port = int(process.stdout.readline().split()[-1])
+    return process, port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Royal Set game server")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server on localhost")
+    serve.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    serve.add_argument("--idle", type=float, default=IDLE_SECONDS,
+                       help="seconds before an idle session is evicted")
+    serve.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    serve.add_argument("--scores", default="", help="ScoreStore path for finished games")
+    load = commands.add_parser("load", help="load-test a server")
+    load.add_argument("--port", type=int, help="server to test; default starts one")
+    load.add_argument("--sessions", type=int, default=10000)
+    load.add_argument("--connections", type=int, default=64)
+    load.add_argument("--seconds", type=float, default=10)
+    load.add_argument("--pipeline", type=int, default=1,
+                      help="requests in flight per connection")
+    load.add_argument("--seed", type=int, default=0)
+    commands.add_parser("check", help="run the protocol and session isolation tests")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        import checks
+
+        sys.exit(checks.run("server"))
+
+    if args.command == "serve":
+        store = open_store(args.scores) if args.scores else None
+        server = GameServer(args.idle, args.max_sessions, store)
+
+        def ready(port):
+            print(f"listening on {port}", flush=True)
+
+        try:
+            asyncio.run(server.serve(port=args.port, ready=ready))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if store is not None:
+                store.close()
+        return
+
+    process = None
+    port = args.port
+    if port is None:
+        process, port = spawn_server(IDLE_SECONDS)
+    try:
+        report = asyncio.run(
+            run_load(port, args.sessions, args.connections, args.seconds, args.pipeline, args.seed)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print(f"sessions held: {report['sessions']}"
+          + (f" ({report['server_rss'] / 1e6:.1f} MB server RSS)" if report["server_rss"] else ""))
+    print(f"{report['actions']} actions, {report['actions_per_s']:,.0f} actions/s over "
+          f"{args.connections} connections, {args.pipeline} in flight each")
+    print(f"server CPU per action: {report['server_cpu_us']:.1f} us")
+    print(f"action latency: p50 {report['latency_ms_p50']:.3f} ms, "
+          f"p99 {report['latency_ms_p99']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
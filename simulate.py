@@ -0,0 +1,215 @@
+# Headless Monte Carlo simulator: plays complete GameState games with a
+# pluggable policy across a process pool and reports the final score
+# distribution per hole mode.
+#
+#   python simulate.py --modes 9 18 --games 20000 --policy greedy --seed 7
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import solver
+from rules import MODES, GameState, score_hand
+
+
+# Policies decide the three choices a player makes each hole. discard returns
+# the hand indices to throw away (empty to keep the hand), keep returns a
+# kept flag per die, and reroll says whether to roll the unkept dice again
+# (game.roll_cost() tells whether that costs points).
+class Policy:
+    def discard(self, game):
+        return []
+
+    def keep(self, game):
+        return list(game.dice.kept)
+
+    def reroll(self, game):
+        return False
+
+
+class StandPolicy(Policy):
+    # Play the dealt hand and lock in after the first roll
+    pass
+
+
+class GreedyPolicy(Policy):
+    # Throw away unpaired cards from a High Card hand, keep dice that match a
+    # card in hand and reroll the rest while rerolls are free
+    def discard(self, game):
+        hand_name, _ = score_hand(game.hand)
+        if hand_name != "High Card":
+            return []
+        return [min(range(len(game.hand)), key=lambda i: game.hand[i].value)]
+
+    def keep(self, game):
+        ranks = {card.rank for card in game.hand}
+        kept, seen = [], set()
+        for die in game.dice.dice:
+            kept.append(die in ranks and die not in seen)
+            seen.add(die)
+        return kept
+
+    def reroll(self, game):
+        return game.roll_cost() == 0
+
+
+class OptimalPolicy(Policy):
+    # Take the action with the best expected value from the exact solver
+    def discard(self, game):
+        action = solver.best_action(game)
+        return list(action.cards) if action.kind == "discard" else []
+
+    def keep(self, game):
+        self.action = solver.best_action(game)
+        if self.action.kind == "reroll":
+            return list(self.action.kept)
+        return list(game.dice.kept)
+
+    def reroll(self, game):
+        return self.action.kind == "reroll"
+
+
+POLICIES = {
+    "stand": StandPolicy,
+    "greedy": GreedyPolicy,
+    "optimal": OptimalPolicy,
+}
+
+
+def play_hole(game, policy):
+    for index in policy.discard(game):
+        game.toggle_select(index)
+    game.discard()
+    game.roll()
+    while game.can_roll():
+        for i, keep in enumerate(policy.keep(game)):
+            if game.dice.kept[i] != keep:
+                game.toggle_keep(i)
+        if not game.can_roll() or not policy.reroll(game):
+            break
+        game.roll()
+    return game.lock_in()
+
+
+def play_game(mode, policy, rng, history=None):
+    game = GameState(mode, rng, history=history)
+    while not game.is_over():
+        play_hole(game, policy)
+    return game.score
+
+
+def run_chunk(task):
+    # Worker entry point. Each chunk owns a Random seeded from (seed, mode,
+    # chunk index), so results do not depend on the worker count or on which
+    # worker picks the chunk up.
+    mode, policy_name, games, seed, chunk = task
+    rng = random.Random(f"{seed}/{mode}/{chunk}")
+    policy = POLICIES[policy_name]()
+    scores = Counter()
+    for _ in range(games):
+        scores[play_game(mode, policy, rng)] += 1
+    return mode, scores
+
+
+class ModeStats:
+    def __init__(self, mode):
+        self.mode = mode
+        self.histogram = Counter()
+
+    @property
+    def games(self):
+        return sum(self.histogram.values())
+
+    def mean(self):
+        return sum(s * n for s, n in self.histogram.items()) / self.games
+
+    def variance(self):
+        mean = self.mean()
+        return sum(n * (s - mean) ** 2 for s, n in self.histogram.items()) / self.games
+
+    def percentile(self, q):
+        target = q * self.games
+        seen = 0
+        for score in sorted(self.histogram):
+            seen += self.histogram[score]
+            if seen >= target:
+                return score
+        return max(self.histogram)
+
+
+def simulate(modes, games, policy="greedy", seed=0, workers=None, chunk_size=1000):
+    # Returns ({mode: ModeStats}, elapsed seconds)
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy!r}, expected one of {sorted(POLICIES)}")
+    tasks = []
+    for mode in modes:
+        for chunk, start in enumerate(range(0, games, chunk_size)):
+            tasks.append((mode, policy, min(chunk_size, games - start), seed, chunk))
+    # Long games first so the pool does not finish on a single straggler
+    tasks.sort(key=lambda task: task[0] * task[2], reverse=True)
+
+    stats = {mode: ModeStats(mode) for mode in modes}
+    start = time.perf_counter()
+    if workers == 1:
+        for mode, scores in map(run_chunk, tasks):
+            stats[mode].histogram.update(scores)
+    else:
+        with Pool(workers) as pool:
+            for mode, scores in pool.imap_unordered(run_chunk, tasks):
+                stats[mode].histogram.update(scores)
+    return stats, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Royal Set games headlessly")
+    parser.add_argument("--modes", type=int, nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--games", type=int, default=10000, help="games per mode")
+    parser.add_argument("--policy", default="greedy", choices=sorted(POLICIES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--json", help="write histograms and summary to this file")
+    args = parser.parse_args(argv)
+
+    stats, elapsed = simulate(
+        args.modes, args.games, args.policy, args.seed, args.workers, args.chunk_size
+    )
+    holes = sum(mode * s.games for mode, s in stats.items())
+    print(f"policy={args.policy} seed={args.seed} workers={args.workers}")
+    print(f"{'holes':>6} {'games':>8} {'mean':>9} {'var':>11} {'p5':>6} {'p50':>6} {'p95':>6} {'max':>6}")
+    for mode in args.modes:
+        s = stats[mode]
+        print(
+            f"{mode:>6} {s.games:>8} {s.mean():>9.2f} {s.variance():>11.2f} "
+            f"{s.percentile(0.05):>6} {s.percentile(0.5):>6} {s.percentile(0.95):>6} "
+            f"{max(s.histogram):>6}"
+        )
+    print(f"{holes} holes in {elapsed:.2f}s ({holes / elapsed:,.0f} holes/sec)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "policy": args.policy,
+                    "seed": args.seed,
+                    "holes_per_sec": holes / elapsed,
+                    "modes": {
+                        str(mode): {
+                            "games": s.games,
+                            "mean": s.mean(),
+                            "variance": s.variance(),
+                            "histogram": {str(k): v for k, v in sorted(s.histogram.items())},
+                        }
+                        for mode, s in stats.items()
+                    },
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# Exact expected-value solver for the decisions of a hole: which cards to
+# discard, which dice to keep, whether to (pay to) reroll and when to lock in.
+# The value of an action is the expected number of points it adds to the
+# score by the end of the hole (hole points minus any reroll cost), assuming
+# optimal play afterwards.
+#
+# Dice only matter through the set of hand ranks they show, so faces that
+# match no card in hand are folded into a single MISS face. Deck draws are
+# enumerated as multisets over the remaining card counts, and the discard
+# search is memoized on a suit-permutation canonical form of (hand, counts).
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement, permutations
+from math import comb, factorial
+
+from rules import (
+    HAND_CATEGORIES,
+    HAND_TABLE,
+    MULTIPLIER_TABLE,
+    NUM_CARDS,
+    POKER_DICE,
+    RANKS,
+    RANK_INDEX,
+    REROLL_COST,
+    SUITS,
+    hand_key,
+    max_rolls_for,
+    multiplier_key,
+    reroll_cost,
+)
+
+MISS = len(RANKS)
+FULL_SHOE = (3,) * NUM_CARDS
+# Card id relabellings for each permutation of the suits, with their inverse
+SUIT_PERMUTATIONS = []
+for _suits in permutations(range(len(SUITS))):
+    _perm = [_suits[i // len(RANKS)] * len(RANKS) + i % len(RANKS) for i in range(NUM_CARDS)]
+    SUIT_PERMUTATIONS.append((_perm, [_perm.index(j) for j in range(NUM_CARDS)]))
+
+
+class Action:
+    # kind is "discard" (cards: hand indices), "roll" (first roll of the hole),
+    # "reroll" (kept: flag per die) or "lock"
+    def __init__(self, kind, ev, cards=(), kept=(), cost=0):
+        self.kind = kind
+        self.ev = ev
+        self.cards = cards
+        self.kept = kept
+        self.cost = cost
+
+    def __repr__(self):
+        return f"Action({self.kind}, ev={self.ev:.3f}, cards={self.cards}, kept={self.kept})"
+
+    def describe(self, game):
+        if self.kind == "discard":
+            names = ", ".join(game.hand[i].rank + game.hand[i].suit for i in self.cards)
+            return f"Discard {names}"
+        if self.kind == "roll":
+            return "Roll"
+        if self.kind == "reroll":
+            kept = [die for die, k in zip(game.dice.dice, self.kept) if k]
+            text = f"Keep {', '.join(kept)} and reroll" if kept else "Reroll all"
+            return text + (f" (-{self.cost})" if self.cost else "")
+        return "Lock in"
+
+
+def _hand_info(ids):
+    # (hand size, rank mask, base score) for a tuple of card ids
+    mask = 0
+    for i in ids:
+        mask |= 1 << (i % len(RANKS))
+    return len(ids), mask, HAND_CATEGORIES[HAND_TABLE[hand_key(ids)]][1]
+
+
+def _multiplier(hand_size, hand_mask, faces):
+    dice_mask = 0
+    for face in faces:
+        if face != MISS:
+            dice_mask |= 1 << face
+    return MULTIPLIER_TABLE[multiplier_key(hand_size, hand_mask, dice_mask)]
+
+
+def _canonical_faces(faces, hand_mask):
+    return tuple(sorted(f if hand_mask >> f & 1 else MISS for f in faces))
+
+
+@lru_cache(maxsize=None)
+def _roll_outcomes(hand_mask, count):
+    # Every multiset of `count` freshly rolled faces with its probability
+    weights = {f: 1 for f in range(len(RANKS)) if hand_mask >> f & 1}
+    if len(weights) < len(POKER_DICE):
+        weights[MISS] = len(POKER_DICE) - len(weights)
+    outcomes = []
+    for faces in combinations_with_replacement(sorted(weights), count):
+        ways = factorial(count)
+        p = 1.0
+        for face in set(faces):
+            n = faces.count(face)
+            ways //= factorial(n)
+            p *= (weights[face] / len(POKER_DICE)) ** n
+        outcomes.append((faces, ways * p))
+    return tuple(outcomes)
+
+
+def _keep_choices(faces):
+    # Distinct multisets of dice to keep while rerolling at least one
+    seen = set()
+    for count in range(len(faces)):
+        for kept in combinations(faces, count):
+            if kept not in seen:
+                seen.add(kept)
+                yield kept
+
+
+def _reroll_value(hand, dice_count, kept, roll_count, max_rolls, score):
+    # Expected points of rerolling every die but the `kept` faces, and its cost
+    hand_size, hand_mask, base = hand
+    flags = [True] * len(kept) + [False] * (dice_count - len(kept))
+    cost = reroll_cost(hand_size, roll_count, max_rolls, score, flags)
+    if cost is None:
+        return None, None
+    ev = -cost
+    for outcome, p in _roll_outcomes(hand_mask, dice_count - len(kept)):
+        ev += p * _rolled_value(
+            hand, tuple(sorted(kept + outcome)), roll_count + 1, max_rolls, score - cost
+        )
+    return ev, cost
+
+
+@lru_cache(maxsize=None)
+def _rolled_value(hand, faces, roll_count, max_rolls, score):
+    # Best expected points once the dice show `faces`
+    hand_size, hand_mask, base = hand
+    best = base * _multiplier(hand_size, hand_mask, faces)
+    for kept in _keep_choices(faces):
+        ev, _ = _reroll_value(hand, len(faces), kept, roll_count, max_rolls, score)
+        if ev is not None and ev > best:
+            best = ev
+    return best
+
+
+@lru_cache(maxsize=None)
+def _fresh_value(hand, score):
+    # Expected points of a hand that has not been rolled yet
+    hand_size, hand_mask, _ = hand
+    max_rolls = max_rolls_for(hand_size)
+    if not max_rolls:
+        return 0.0
+    return sum(
+        p * _rolled_value(hand, faces, 1, max_rolls, _cap(score, max_rolls))
+        for faces, p in _roll_outcomes(hand_mask, hand_size)
+    )
+
+
+def _cap(score, max_rolls):
+    # Scores above what the remaining rolls could spend behave the same
+    return min(score, REROLL_COST * max_rolls)
+
+
+@lru_cache(maxsize=None)
+def _hand_values(score):
+    # Fresh-hand value of every sorted tuple of 1-3 card ids. Built once per
+    # (capped) score, it turns the discard search into plain dict lookups.
+    return {
+        ids: _fresh_value(_hand_info(ids), score)
+        for size in range(1, 4)
+        for ids in combinations_with_replacement(range(NUM_CARDS), size)
+    }
+
+
+def warm_up():
+    # Generator filling the fresh-hand tables for every score the discard
+    # search can see, a hand per step, so a UI can spread the first hint's
+    # cost over frames; _hand_values then only collects cached values
+    for score in range(REROLL_COST * max_rolls_for(3) + 1):
+        for size in range(1, 4):
+            for ids in combinations_with_replacement(range(NUM_CARDS), size):
+                _fresh_value(_hand_info(ids), score)
+                yield
+        _hand_values(score)
+        yield
+
+
+@lru_cache(maxsize=65536)
+def _discard_value(kept, counts, count, score):
+    # Expected points after replacing `count` cards, keeping card ids `kept`.
+    # Sums value * ways over every multiset the deck can deal, where ways is
+    # the number of card combinations giving that multiset.
+    if sum(counts) < count:
+        counts = FULL_SHOE
+    values = _hand_values(score)
+    ids = [i for i in range(NUM_CARDS) if counts[i]]
+    total = 0.0
+    if count == 1:
+        for i in ids:
+            total += counts[i] * values[tuple(sorted(kept + (i,)))]
+    elif count == 2:
+        for a, i in enumerate(ids):
+            ci = counts[i]
+            total += ci * (ci - 1) // 2 * values[tuple(sorted(kept + (i, i)))]
+            for j in ids[a + 1 :]:
+                total += ci * counts[j] * values[tuple(sorted(kept + (i, j)))]
+    else:
+        # Replacing three cards means the whole hand, so nothing is kept
+        for a, i in enumerate(ids):
+            ci = counts[i]
+            total += comb(ci, 3) * values[(i, i, i)]
+            for b in range(a + 1, len(ids)):
+                j = ids[b]
+                cj = counts[j]
+                total += ci * (ci - 1) // 2 * cj * values[(i, i, j)]
+                total += ci * cj * (cj - 1) // 2 * values[(i, j, j)]
+                for k in ids[b + 1 :]:
+                    total += ci * cj * counts[k] * values[(i, j, k)]
+    return total / comb(sum(counts), count)
+
+
+def _canonical_form(ids, counts):
+    # Suit relabelling that maps (hand, deck counts) to its smallest form,
+    # returned with the relabelled counts
+    best = None
+    for perm, inverse in SUIT_PERMUTATIONS:
+        key = (tuple(sorted(perm[i] for i in ids)), tuple(counts[j] for j in inverse))
+        if best is None or key < best[0]:
+            best = (key, perm)
+    return best[1], best[0][1]
+
+
+def evaluate(game):
+    # Every legal action for the current state, best first
+    if game.is_over():
+        return []
+    ids = [card.id for card in game.hand]
+    hand = _hand_info(tuple(sorted(ids)))
+    actions = []
+    if not game.rolled:
+        actions.append(Action("roll", _fresh_value(hand, game.score)))
+        if game.can_discard():
+            perm, counts = _canonical_form(ids, game.deck.counts)
+            score = _cap(game.score, max_rolls_for(len(ids)))
+            for count in range(1, len(ids) + 1):
+                for cards in combinations(range(len(ids)), count):
+                    kept = tuple(
+                        sorted(perm[ids[i]] for i in range(len(ids)) if i not in cards)
+                    )
+                    ev = _discard_value(kept, counts, count, score)
+                    actions.append(Action("discard", ev, cards=cards))
+    else:
+        hand_size, hand_mask, _ = hand
+        dice = [RANK_INDEX[die] for die in game.dice.dice]
+        faces = [f if hand_mask >> f & 1 else MISS for f in dice]
+        actions.append(
+            Action("lock", hand[2] * _multiplier(hand_size, hand_mask, faces))
+        )
+        score = _cap(game.score, game.max_rolls)
+        seen = set()
+        for count in range(len(dice)):
+            for positions in combinations(range(len(dice)), count):
+                kept = tuple(sorted(faces[i] for i in positions))
+                if kept in seen:
+                    continue
+                seen.add(kept)
+                ev, cost = _reroll_value(
+                    hand, len(dice), kept, game.roll_count, game.max_rolls, score
+                )
+                if ev is not None:
+                    flags = tuple(i in positions for i in range(len(dice)))
+                    actions.append(Action("reroll", ev, kept=flags, cost=cost))
+    actions.sort(key=lambda action: action.ev, reverse=True)
+    return actions
+
+
+def best_action(game):
+    actions = evaluate(game)
+    return actions[0] if actions else None
+
+
+def hint(game):
+    action = best_action(game)
+    if action is None:
+        return ""
+    return f"Hint: {action.describe(game)} (EV {action.ev:.1f})"
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from rules import GameState
+
+    game = GameState(9, random.Random(1))
+    start = time.perf_counter()
+    decisions = 0
+    while not game.is_over():
+        action = best_action(game)
+        decisions += 1
+        if action.kind == "discard":
+            for i in action.cards:
+                game.toggle_select(i)
+            game.discard()
+        elif action.kind in ("roll", "reroll"):
+            for i, kept in enumerate(action.kept):
+                if game.dice.kept[i] != kept:
+                    game.toggle_keep(i)
+            game.roll()
+        else:
+            game.lock_in()
+    elapsed = time.perf_counter() - start
+    print(f"score {game.score}, {decisions} decisions, {elapsed / decisions * 1000:.3f} ms each")
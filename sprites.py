@@ -0,0 +1,144 @@
+# Card and dice sprites. Each of the 18 card faces is decoded once, converted
+# to the display format and packed into a master atlas; scaled atlases are
+# built per target size on first use and handed out as subsurfaces, so
+# drawing a card is a plain blit with no per-frame conversion or scaling.
+# Dice faces are pre-rendered into a sheet the same way. Both can also be
+# built as generators, a face per step, to spread the work over frames.
+from collections import OrderedDict
+from itertools import product
+
+import pygame
+
+from rules import CARDS, RANKS, SUITS
+from viewport import allocate, run_steps
+
+
+class CardSprites:
+    def __init__(self, load_face, master_size, max_sizes=2):
+        # load_face(card) returns the full-size face Surface. master_size is
+        # the resolution faces are kept at after loading; scaled variants are
+        # made from it. Only the max_sizes most recently used sizes are kept.
+        self.load_face = load_face
+        self.master_size = master_size
+        self.max_sizes = max_sizes
+        self.master = None
+        self.variants = OrderedDict()
+
+    def _new_atlas(self, size):
+        # Generator, as a big atlas is allocated over several steps; it comes
+        # cleared and in the convert_alpha() format
+        width, height = size
+        return (yield from allocate((width * len(RANKS), height * len(SUITS)), alpha=True))
+
+    def _cells(self, atlas, size):
+        width, height = size
+        return [
+            atlas.subsurface(
+                ((card.id % len(RANKS)) * width, (card.id // len(RANKS)) * height, width, height)
+            )
+            for card in CARDS
+        ]
+
+    def _put(self, cell, face, size):
+        # Copy a face into its cell. BLEND_RGBA_MAX onto the cleared atlas
+        # copies the pixels, alpha included, without blending them.
+        if face.get_size() != size:
+            face = pygame.transform.smoothscale(face, size)
+        cell.blit(face, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+
+    def _load_master(self):
+        # Generator: decodes one face per step
+        master = yield from self._new_atlas(self.master_size)
+        cells = self._cells(master, self.master_size)
+        for cell, card in zip(cells, CARDS):
+            self._put(cell, self.load_face(card).convert_alpha(), self.master_size)
+            yield
+        self.master = master
+        self.master_cells = cells
+
+    def add_atlas(self, atlas, size):
+        # Register a ready-made atlas (e.g. from the asset bundle) laid out
+        # like _new_atlas for the given face size. One at master_size stands
+        # in for the master, so the face images are never loaded.
+        size = (int(size[0]), int(size[1]))
+        cells = self._cells(atlas, size)
+        if size == tuple(self.master_size):
+            self.master = atlas
+            self.master_cells = cells
+        self.variants[size] = cells
+        while len(self.variants) > self.max_sizes:
+            self.variants.popitem(last=False)
+
+    def faces(self, size):
+        # Subsurface per card id at the given (width, height)
+        return run_steps(self.build(size))
+
+    def build(self, size):
+        # faces() as a generator that yields after each face it decodes or
+        # scales, so a new size can be built a little per frame; returns
+        # the cells
+        size = (int(size[0]), int(size[1]))
+        cells = self.variants.get(size)
+        if cells is not None:
+            self.variants.move_to_end(size)
+            return cells
+        if self.master is None:
+            yield from self._load_master()
+        if size == self.master_size:
+            cells = self.master_cells
+        else:
+            atlas = yield from self._new_atlas(size)
+            cells = self._cells(atlas, size)
+            yield
+            for cell, face in zip(cells, self.master_cells):
+                self._put(cell, face, size)
+                yield
+        self.variants[size] = cells
+        while len(self.variants) > self.max_sizes:
+            self.variants.popitem(last=False)
+        return cells
+
+    def get(self, card, size):
+        return self.faces(size)[card.id]
+
+
+class DiceSprites:
+    # Sprite sheet with every die face in every (matched, kept) state, drawn
+    # once by draw_die(surface, rect, face, matched, kept) on first use.
+    # Cells have a margin because the outlines spill past the die's rect.
+    def __init__(self, size, faces, draw_die, margin=1):
+        self.size = size
+        self.faces = faces
+        self.draw_die = draw_die
+        self.margin = margin
+        self.sheet = None
+        self.cells = {}
+
+    def build(self):
+        # Generator drawing one face (all four states) per step
+        width, height = self.size
+        cell_width, cell_height = width + 2 * self.margin, height + 2 * self.margin
+        states = list(product((False, True), repeat=2))
+        sheet = pygame.Surface(
+            (cell_width * len(self.faces), cell_height * len(states)), pygame.SRCALPHA
+        ).convert_alpha()
+        for col, face in enumerate(self.faces):
+            for row, (matched, kept) in enumerate(states):
+                cell = sheet.subsurface(
+                    (col * cell_width, row * cell_height, cell_width, cell_height)
+                )
+                self.draw_die(
+                    cell, pygame.Rect(self.margin, self.margin, width, height), face, matched, kept
+                )
+                self.cells[(face, matched, kept)] = cell
+            yield
+        self.sheet = sheet
+
+    def get(self, face, matched, kept):
+        if self.sheet is None:
+            run_steps(self.build())
+        return self.cells[(face, matched, kept)]
+
+    def origin(self, x, y):
+        # Where to blit a cell so the die itself lands at (x, y)
+        return x - self.margin, y - self.margin
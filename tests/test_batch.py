@@ -0,0 +1,53 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from batch import (
+    CATEGORY_NAMES,
+    encode_dice,
+    encode_hands,
+    multipliers_batch,
+    score_hands_batch,
+)
+from rules import CARDS, NUM_CARDS, POKER_DICE, calc_multiplier, score_hand
+
+
+class _Dice:
+    def __init__(self, dice):
+        self.dice = dice
+
+
+HANDS = [
+    [CARDS[i] for i in ids] for size in range(4) for ids in product(range(NUM_CARDS), repeat=size)
+]
+ROLLS = [list(faces) for size in range(4) for faces in product(POKER_DICE, repeat=size)]
+
+
+def test_scores_match_score_hand():
+    categories, base_scores = score_hands_batch(encode_hands(HANDS))
+    for hand, category, base in zip(HANDS, categories, base_scores):
+        assert score_hand(hand) == (CATEGORY_NAMES[category], base), hand
+
+
+def test_multipliers_match_calc_multiplier():
+    # Every padded hand against every roll
+    hand_rows = np.repeat(encode_hands(HANDS), len(ROLLS), axis=0)
+    dice_rows = np.tile(encode_dice(ROLLS), (len(HANDS), 1))
+    multipliers = multipliers_batch(hand_rows, dice_rows)
+    expected = [calc_multiplier(hand, _Dice(roll)) for hand in HANDS for roll in ROLLS]
+    assert multipliers.tolist() == expected
+
+
+@pytest.mark.parametrize("bad", [18, 40, 254])
+def test_out_of_range_ids_rejected(bad):
+    hands = encode_hands(HANDS[:4])
+    hands[2, 1] = bad
+    with pytest.raises(ValueError, match="hands row 2"):
+        score_hands_batch(hands)
+    with pytest.raises(ValueError, match="hands row 2"):
+        multipliers_batch(hands, encode_dice(ROLLS[:4]))
+    dice = encode_dice(ROLLS[:4])
+    dice[3, 0] = len(POKER_DICE)
+    with pytest.raises(ValueError, match="dice row 3"):
+        multipliers_batch(encode_hands(HANDS[:4]), dice)
@@ -0,0 +1,40 @@
+import os
+
+import pygame
+import pytest
+
+from bundle import MAGIC, load_bundle, write_bundle
+
+
+@pytest.fixture
+def bundle_bytes(tmp_path):
+    image = pygame.Surface((8, 4), pygame.SRCALPHA)
+    image.fill((10, 20, 30, 40))
+    path = os.path.join(tmp_path, "whole.bin")
+    write_bundle(path, {"a": image, "b": pygame.Surface((16, 16))})
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_whole_bundle_loads(tmp_path, bundle_bytes):
+    path = os.path.join(tmp_path, "bundle.bin")
+    with open(path, "wb") as f:
+        f.write(bundle_bytes)
+    bundle = load_bundle(path)
+    assert "a" in bundle and bundle.surface("a").get_at((1, 1)) == (10, 20, 30, 40)
+
+
+@pytest.mark.parametrize(
+    "keep",
+    [0, len(MAGIC), len(MAGIC) + 2, len(MAGIC) + 10, -1, -16 * 16 * 4],
+)
+def test_truncated_bundle_is_dropped(tmp_path, bundle_bytes, keep):
+    # Cut anywhere: inside the magic, the length, the header or the pixels
+    path = os.path.join(tmp_path, "bundle.bin")
+    with open(path, "wb") as f:
+        f.write(bundle_bytes[:keep])
+    assert load_bundle(path) is None
+
+
+def test_missing_bundle_is_dropped(tmp_path):
+    assert load_bundle(os.path.join(tmp_path, "none.bin")) is None
@@ -0,0 +1,42 @@
+import random
+from collections import defaultdict
+
+import solver
+from distribution import POLICIES, _ordered_deals, hole_distribution
+from rules import CARDS, MODES, GameState
+from simulate import play_hole
+
+
+def test_sampled_holes_match_exact_distribution():
+    # Sampled holes, each from a fresh shoe as the enumeration assumes
+    holes, seed = 100000, 0
+    dist = hole_distribution("greedy")
+    assert abs(sum(dist.values()) - 1) < 1e-12
+    rng = random.Random(seed)
+    player = POLICIES["greedy"]()
+    samples = defaultdict(int)
+    for _ in range(holes):
+        samples[play_hole(GameState(MODES[0], rng), player)] += 1
+    mean = sum(s * p for s, p in dist.items())
+    std = sum((s - mean) ** 2 * p for s, p in dist.items()) ** 0.5
+    sampled = sum(s * n for s, n in samples.items()) / holes
+    assert abs(sampled - mean) < 5 * std / holes ** 0.5, (sampled, mean)
+    for points, n in samples.items():
+        p = dist.get(points, 0)
+        assert abs(n / holes - p) < 6 * (p * (1 - p) / holes) ** 0.5 + 1e-4, (points, n, p)
+
+
+def test_optimal_mean_matches_solver_ev():
+    optimal = hole_distribution("optimal")
+    ev = 0.0
+    game = GameState(MODES[0], random.Random(0))
+    values = {}
+    for deal, p, counts in _ordered_deals():
+        key = tuple(sorted(deal))
+        if key not in values:
+            game.hand = [CARDS[i] for i in deal]
+            game.deck.counts = counts
+            values[key] = solver.best_action(game).ev
+        ev += p * values[key]
+    optimal_mean = sum(s * p for s, p in optimal.items())
+    assert abs(optimal_mean - ev) < 1e-9, (optimal_mean, ev)
@@ -0,0 +1,107 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from batch import PAD, multipliers_batch, score_hands_batch
+from history import COLUMNS, ROW, ROW_DTYPE, HandHistory, HistoryWriter, _ids, export
+from rules import REROLL_COST, GameState
+from simulate import GreedyPolicy, play_hole
+
+
+@pytest.fixture
+def played(tmp_path):
+    # 400 9-hole games written in 1000-row chunks: the history directory,
+    # (dealt, discard mask, points) per hole and each game's score
+    directory = str(tmp_path)
+    writer = HistoryWriter(directory, chunk_rows=1000)
+    rng = random.Random(0)
+    policy = GreedyPolicy()
+    scores = []
+    locked = []
+    for _ in range(400):
+        game = GameState(9, rng, history=writer)
+        while not game.is_over():
+            dealt = _ids(game.dealt)
+            mask = sum(1 << i for i in policy.discard(game))
+            locked.append((dealt, mask, play_hole(game, policy)))
+        scores.append(game.score)
+    writer.close()
+    # A chunk left half-written by a crash is ignored
+    os.makedirs(os.path.join(directory, "zz.tmp"))
+    return directory, locked, scores
+
+
+def test_columns_match_games_played(played):
+    directory, locked, scores = played
+    history = HandHistory(directory)
+    assert len(history.chunks) == 4 and len(history) == 3600
+    columns = [np.concatenate(parts) for parts in zip(*history.columns(*COLUMNS))]
+    row = dict(zip(COLUMNS, columns))
+    assert row["dealt"].tolist() == [dealt for dealt, _, _ in locked]
+    assert row["discard_mask"].tolist() == [mask for _, mask, _ in locked]
+    assert row["points"].tolist() == [points for _, _, points in locked]
+    assert row["hole"].tolist() == list(range(1, 10)) * 400
+    total = row["points"].astype(np.int64) - REROLL_COST * row["paid_rerolls"]
+    assert total.sum() == sum(scores)
+    categories, base = score_hands_batch(row["hand"])
+    assert (categories == row["category"]).all()
+    assert (multipliers_batch(row["hand"], row["dice"]) == row["multiplier"]).all()
+    assert (base.astype(np.int64) * row["multiplier"] == row["points"]).all()
+
+
+def test_aggregates(played):
+    directory, locked, _ = played
+    history = HandHistory(directory)
+    category, multiplier = (
+        np.concatenate(parts) for parts in zip(*history.columns("category", "multiplier"))
+    )
+    counts = history.category_counts()
+    assert counts.tolist() == np.bincount(category, minlength=len(counts)).tolist()
+    assert history.category_counts(mode=3).sum() == 0
+    assert history.multiplier_by_hand_size()[3] == (3600, multiplier.mean())
+    holes, rolls, _, _ = history.reroll_usage()
+    assert holes == 3600 and rolls.sum() == 3600
+    assert history.discard_counts()[0] == sum(not mask for _, mask, _ in locked)
+
+
+def test_short_hand_is_padded(tmp_path):
+    # Shorter hands (not dealt under the current rules) are padded
+    path = str(tmp_path)
+    writer = HistoryWriter(path)
+    game = GameState(9, random.Random(0), history=writer)
+    game.hand = game.hand[:2]
+    game.update_max_rolls()
+    game.roll()
+    points = game.lock_in()
+    writer.close()
+    (hand, dice, category, multiplier), = HandHistory(path).columns(
+        "hand", "dice", "category", "multiplier"
+    )
+    assert hand[0, 2] == PAD and dice[0, 2] == PAD
+    categories, base = score_hands_batch(hand)
+    assert categories[0] == category[0] and base[0] * multiplier[0] == points
+
+
+def test_row_layout_matches_dtype():
+    assert ROW_DTYPE.itemsize == ROW.size
+
+
+def test_repeated_exports_share_a_directory(tmp_path):
+    path = str(tmp_path)
+    for _ in range(2):
+        assert export(path, 3, 50, workers=1, games_per_task=20) == 150
+    assert len(HandHistory(path)) == 300
+    assert not [name for name in os.listdir(path) if name.endswith(".tmp")]
+
+
+def test_failed_rename_leaves_no_temporary(tmp_path):
+    path = str(tmp_path)
+    writer = HistoryWriter(path, prefix="fixed-")
+    os.makedirs(os.path.join(path, "fixed-000000", "taken"))
+    game = GameState(3, random.Random(0), history=writer)
+    play_hole(game, GreedyPolicy())
+    with pytest.raises(OSError):
+        writer.flush()
+    assert os.listdir(path) == ["fixed-000000"]
@@ -0,0 +1,73 @@
+import os
+
+from replay import (
+    CHUNK_SIZE,
+    DISCARD,
+    ROLL,
+    RecordedGame,
+    Recorder,
+    read_games,
+    read_varint,
+    record_games,
+    replay_game,
+    unzigzag,
+    verify,
+    write_varint,
+    zigzag,
+)
+from simulate import GreedyPolicy, play_hole
+
+NUMBERS = (0, 1, 127, 128, 300, 1 << 63)
+
+
+def test_varints_round_trip():
+    out = bytearray()
+    for n in NUMBERS:
+        write_varint(out, n)
+    pos = 0
+    for n in NUMBERS:
+        value, pos = read_varint(out, pos)
+        assert value == n
+    assert all(unzigzag(zigzag(n)) == n for n in range(-300, 300))
+
+
+def record_log(path):
+    # 300 whole 9-hole games, then one abandoned part-way through, as when
+    # leaving a game for the menu
+    record_games(path, 300, mode=9)
+    recorder = Recorder(path)
+    game = RecordedGame(3, 12345, recorder)
+    play_hole(game, GreedyPolicy())
+    game.toggle_select(1)
+    game.finish()
+    recorder.close()
+
+
+def test_recorded_games_replay(tmp_path):
+    path = os.path.join(tmp_path, "games.log")
+    record_log(path)
+    for workers, chunk_size in ((1, 7), (1, CHUNK_SIZE), (2, CHUNK_SIZE)):
+        with open(path, "rb") as f:
+            games = list(read_games(f, chunk_size))
+        assert len(games) == 301 and games[-1][:2] == (3, 12345)
+        assert verify(path, workers, batch_games=64)[2:] == ([], None)
+    assert replay_game(*games[-1][:3]).round == 2
+
+
+def test_changed_action_and_torn_tail_reported(tmp_path):
+    path = os.path.join(tmp_path, "games.log")
+    record_log(path)
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+        f.seek(0)
+        mode, seed, actions, score = next(read_games(f))
+    start = data.find(actions)
+    # Swap the first discard for a roll
+    data[start + actions.index(DISCARD)] = ROLL
+    # and tear the last game
+    data += data[: len(actions) // 2]
+    with open(path, "wb") as f:
+        f.write(data)
+    games, _, mismatches, error = verify(path)
+    assert [number for number, _, _ in mismatches] == [0], mismatches
+    assert error is not None and games == 301
@@ -0,0 +1,37 @@
+from itertools import combinations_with_replacement, product
+
+from rules import (
+    CARDS,
+    NUM_CARDS,
+    POKER_DICE,
+    calc_multiplier,
+    calc_multiplier_reference,
+    score_hand,
+    score_hand_reference,
+)
+
+
+class _Dice:
+    def __init__(self, dice):
+        self.dice = dice
+
+
+def test_score_table_matches_reference():
+    for size in range(4):
+        for ids in product(range(NUM_CARDS), repeat=size):
+            hand = [CARDS[i] for i in ids]
+            assert score_hand(hand) == score_hand_reference(hand), hand
+
+
+def test_multiplier_table_matches_reference():
+    # Exhaustive over hands (as multisets) and rolls of up to three
+    rolls = [
+        _Dice(list(faces)) for size in range(4) for faces in product(POKER_DICE, repeat=size)
+    ]
+    for ids in combinations_with_replacement(range(NUM_CARDS), 3):
+        for size in range(4):
+            hand = [CARDS[i] for i in ids[:size]]
+            for dice in rolls:
+                assert calc_multiplier(hand, dice) == calc_multiplier_reference(
+                    hand, dice
+                ), (hand, dice.dice)
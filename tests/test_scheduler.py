@@ -0,0 +1,33 @@
+from scheduler import Scheduler
+
+
+def test_timers_fire_in_order_repeat_and_cancel():
+    fired = []
+    scheduler = Scheduler()
+    scheduler.update(0)
+    scheduler.after(30, lambda: fired.append("once"))
+    repeat = scheduler.every(20, lambda: fired.append("repeat"))
+    scheduler.after(10, lambda: fired.append("cancelled")).cancel()
+    for now in range(0, 101, 10):
+        if now == 70:
+            repeat.cancel()
+        scheduler.update(now)
+    assert fired == ["repeat", "once", "repeat", "repeat"], fired
+    assert scheduler.wait_ms(1000) == 1000
+
+
+def test_tween_independent_of_frame_rate():
+    samples = {}
+    for frame_ms in (7, 16, 33):
+        scheduler = Scheduler()
+        scheduler.update(0)
+        scheduler.tween(500, 0, 100, key="x")
+        now = 0
+        while now + frame_ms <= 400:
+            now += frame_ms
+            scheduler.update(now)
+        scheduler.update(400)
+        samples[frame_ms] = scheduler.value("x", None)
+        scheduler.update(600)
+        assert scheduler.value("x", None) is None and not scheduler.busy()
+    assert max(samples.values()) - min(samples.values()) < 1e-9, samples
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from rules import MODES
+from scores import ScoreStore
+
+
+def test_scores_survive_reopen(tmp_path):
+    path = os.path.join(tmp_path, "scores.db")
+    store = ScoreStore(path)
+    for mode, score in [(3, 40), (3, 75), (9, 120), (3, 60), (9, 90)]:
+        store.record(mode, score)
+    assert store.high_scores[3] == 75 and store.high_scores[18] == 0
+    store.close()
+
+    store = ScoreStore(path)
+    assert store.high_scores == {mode: {3: 75, 9: 120}.get(mode, 0) for mode in MODES}
+    assert [score for score, _ in store.top(3, 2)] == [75, 60]
+    assert store.stats(9) == (2, 105.0, 120) and store.stats(18) == (0, 0.0, 0)
+    assert store.stats(3) == store.db.execute(
+        "SELECT COUNT(*), AVG(score), MAX(score) FROM games WHERE mode = 3"
+    ).fetchone()
+    store.close()
+
+
+def test_queries_use_the_index(tmp_path):
+    store = ScoreStore(os.path.join(tmp_path, "scores.db"))
+    for query in (
+        "SELECT score, finished FROM games WHERE mode = 3 ORDER BY score DESC LIMIT 10",
+        "SELECT games, total, best FROM mode_stats WHERE mode = 3",
+    ):
+        plan = " ".join(row[-1] for row in store.db.execute("EXPLAIN QUERY PLAN " + query))
+        assert plan.startswith("SEARCH") and "SCAN" not in plan, plan
+    store.close()
+
+
+def test_record_after_close_raises(tmp_path):
+    store = ScoreStore(os.path.join(tmp_path, "scores.db"))
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.record(3, 50)
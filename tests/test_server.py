@@ -0,0 +1,103 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from rules import GameState
+from server import GameServer, game_state, request
+from simulate import GreedyPolicy, play_hole
+
+
+def call(server, **fields):
+    return json.loads(server.handle(json.dumps(fields).encode()))
+
+
+def test_interleaved_sessions_play_like_lone_games():
+    server = GameServer(idle=60)
+    ids = [call(server, op="new", mode=9, seed=seed)["session"] for seed in (1, 2)]
+    alone = []
+    for seed in (1, 2):
+        game = GameState(9, random.Random(seed))
+        while not game.is_over():
+            play_hole(game, GreedyPolicy())
+        alone.append(game.score)
+    # Play both sessions a hole at a time, alternating, driving the server's
+    # GameStates with the same policy
+    policy = GreedyPolicy()
+    while not all(server.sessions[i].game.is_over() for i in ids):
+        for session_id in ids:
+            game = server.sessions[session_id].game
+            if game.is_over():
+                continue
+            for index in policy.discard(game):
+                call(server, op="select", session=session_id, card=index)
+            call(server, op="discard", session=session_id)
+            call(server, op="roll", session=session_id)
+            while game.can_roll():
+                for i, kept in enumerate(policy.keep(game)):
+                    if game.dice.kept[i] != kept:
+                        call(server, op="keep", session=session_id, die=i)
+                if not game.can_roll() or not policy.reroll(game):
+                    break
+                call(server, op="reroll", session=session_id)
+            call(server, op="lock", session=session_id)
+    assert [server.sessions[i].game.score for i in ids] == alone, alone
+    assert call(server, op="lock", session=ids[0])["ok"] is False
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        b"{not json\n",
+        b"[1, 2]",
+        b'{"op": "roll", "session": "nope"}',
+        b'{"op": "roll", "session": [1]}',
+        b'{"op": "roll", "session": {"a": 1}}',
+        b'{"op": "fly"}',
+        b'{"op": "new", "mode": 4}',
+        b'{"op": "new", "mode": [9]}',
+        b"[" * 2000 + b"]" * 2000,
+    ],
+)
+def test_bad_requests_get_errors(line):
+    assert "error" in json.loads(GameServer().handle(line))
+
+
+def test_bad_arguments_and_eviction():
+    server = GameServer(idle=60)
+    ids = [call(server, op="new", mode=3)["session"] for _ in range(2)]
+    assert "error" in call(server, op="fly", session=ids[0])
+    assert "error" in call(server, op="keep", session=ids[0], die="x")
+    for flag in (True, False):
+        assert "error" in call(server, op="select", session=ids[0], card=flag)
+    fresh = call(server, op="new", mode=3)["session"]
+    assert call(server, op="end", session=fresh)["ok"]
+    server.sessions[ids[0]].last -= 61
+    server.sessions.move_to_end(ids[1])
+    assert server.evict() == 1 and list(server.sessions) == [ids[1]]
+
+
+def test_protocol_over_socket():
+    server = GameServer(idle=60)
+
+    async def over_socket():
+        ports = []
+        task = asyncio.create_task(server.serve(port=0, ready=ports.append))
+        while not ports:
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_connection("127.0.0.1", ports[0])
+        response = await request(reader, writer, {"op": "new", "mode": 3, "seed": 5})
+        # A malformed request gets its error and the connection lives on
+        assert "error" in await request(reader, writer, {"op": "roll", "session": [1]})
+        writer.write(b"[" * 2000 + b"]" * 2000 + b"\n")
+        assert "error" in json.loads(await reader.readline())
+        state = (await request(reader, writer, {"op": "roll", "session": response["session"]}))["state"]
+        writer.close()
+        task.cancel()
+        return state
+
+    state = asyncio.run(over_socket())
+    game = GameState(3, random.Random(5))
+    game.roll()
+    assert state == game_state(game), state
@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+
+from batch import PAD
+from rules import POKER_DICE, GameState, card_id
+from vecenv import HAND_SIZE, NUM_ACTIONS, ROLL, VectorEnv, random_actions, step_game
+
+
+def test_matches_game_state_step_for_step():
+    # Step VectorEnv and GameStates with the same seeds through the same
+    # actions, legal or not, and compare every game after every step
+    games, steps, seed = 64, 3000, 0
+    modes = [3, 9, 18]
+    max_holes = [modes[i % len(modes)] for i in range(games)]
+    env = VectorEnv(max_holes, [random.Random(f"{seed}/{i}") for i in range(games)])
+    scalar = [GameState(max_holes[i], random.Random(f"{seed}/{i}")) for i in range(games)]
+    rng = np.random.default_rng(seed)
+    finished = 0
+    for step in range(steps):
+        if step % 2:
+            actions = rng.integers(0, NUM_ACTIONS, games)
+        else:
+            actions = random_actions(env.legal_actions(), rng)
+        legal = env.legal_actions()
+        rewards, dones = env.step(actions)
+        for i, game in enumerate(scalar):
+            can_roll = game.can_roll()
+            reward, done = step_game(game, int(actions[i]))
+            assert (reward, done) == (rewards[i], dones[i]), (step, i)
+            if done:
+                assert env.final_scores[i] == game.score
+                finished += 1
+                game = scalar[i] = GameState(game.max_holes, game.rng)
+            assert legal[i, ROLL] == can_roll
+            assert env.hands[i].tolist() == [card_id(c.rank, c.suit) for c in game.hand], (step, i)
+            assert env.dice[i].tolist() == (
+                [POKER_DICE.index(d) for d in game.dice.dice] or [PAD] * HAND_SIZE
+            ), (step, i)
+            assert env.kept[i].tolist() == game.dice.kept
+            assert (env.roll_count[i], env.discarded[i], env.score[i], env.round[i]) == (
+                game.roll_count, game.discarded, game.score, game.round
+            ), (step, i)
+            assert env.size[i] == game.deck.size
+            assert env.counts[i].tolist() == list(game.deck.counts)
+    assert finished
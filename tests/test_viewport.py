@@ -0,0 +1,38 @@
+import pygame
+
+from viewport import ALLOCATE_AT_ONCE, ALLOCATE_STEP, allocate
+
+
+def steps(job):
+    count = 0
+    while True:
+        try:
+            next(job)
+        except StopIteration as done:
+            return count, done.value
+        count += 1
+
+
+def test_big_surface_is_allocated_over_steps():
+    size = (2048, 2048)
+    count, surface = steps(allocate(size, alpha=True))
+    assert size[0] * size[1] * 4 > ALLOCATE_AT_ONCE
+    assert count == size[0] * size[1] * 4 // ALLOCATE_STEP
+    assert surface.get_size() == size
+    assert surface.get_masks() == pygame.Surface((1, 1), pygame.SRCALPHA, 32).get_masks()
+    assert surface.get_at((0, 0)) == (0, 0, 0, 0) == surface.get_at((2047, 2047))
+
+
+def test_big_opaque_surface_blits_without_alpha():
+    count, surface = steps(allocate((2048, 1500)))
+    assert count > 1 and surface.get_alpha() is None
+    surface.fill((10, 20, 30, 0))
+    target = pygame.Surface((4, 4))
+    target.blit(surface, (0, 0))
+    assert target.get_at((1, 1)) == (10, 20, 30, 255)
+
+
+def test_small_surface_is_allocated_at_once():
+    count, surface = steps(allocate((64, 32), alpha=True))
+    assert count == 0 and surface.get_size() == (64, 32)
+    assert surface.get_flags() & pygame.SRCALPHA
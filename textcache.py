@@ -0,0 +1,51 @@
+# Text rendering cache for the HUD. Fonts are resolved once per (name, size,
+# bold) and rendered surfaces are kept in a bounded LRU keyed by font, text
+# and color, so a string is only rendered again when it changes.
+from collections import OrderedDict
+
+import pygame
+
+
+class CachedFont:
+    # Drop-in for pygame.font.Font.render that goes through the cache
+    def __init__(self, cache, font, key):
+        self.cache = cache
+        self.font = font
+        self.key = key
+
+    def render(self, text, antialias, color):
+        return self.cache.render(self, text, antialias, color)
+
+    def size(self, text):
+        return self.font.size(text)
+
+
+class TextCache:
+    def __init__(self, max_surfaces=256):
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, name, size, bold=False):
+        key = (name, size, bold)
+        font = self.fonts.get(key)
+        if font is None:
+            font = CachedFont(self, pygame.font.SysFont(name, size, bold=bold), key)
+            self.fonts[key] = font
+        return font
+
+    def render(self, font, text, antialias, color):
+        key = (font.key, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
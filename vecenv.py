@@ -0,0 +1,275 @@
+# Vectorized Royal Set for training bots: N games stepped in lockstep, their
+# state held in NumPy arrays (one row per game) rather than N GameStates.
+# step(actions) applies one action per game with masked array operations
+# and starts a new game wherever one finishes.
+#
+# Every game owns a random.Random and draws from it exactly as GameState
+# does (shuffles, then one choice per rolled die, in die order), so game i
+# of VectorEnv(mode, rngs) plays card for card like GameState(mode, rngs[i])
+# given the same actions, and step_game() is that scalar reference. Only
+# those draws run per game in Python; dealing, scoring, roll costs and the
+# legal-action masks are array operations on the rules' tables.
+#
+# Actions, one int per game:
+#   NOOP          do nothing
+#   1..7          discard the cards whose bits are set (bit i = hand card i)
+#   KEEP + i      toggle keeping die i (0..2)
+#   ROLL          first roll of the hole, or reroll the unkept dice
+#   LOCK          bank the hole
+# An action the rules refuse (see legal_actions) does nothing, as with
+# GameState.
+import random
+
+import numpy as np
+
+from batch import PAD, multipliers_batch, score_hands_batch
+from rules import NUM_CARDS, POKER_DICE, REROLL_COST, SHOE, SHOE_COUNTS, max_rolls_for, reroll_cost
+
+NOOP = 0
+DISCARD = 1
+KEEP = 8
+ROLL = 11
+LOCK = 12
+NUM_ACTIONS = 13
+
+# Discarding always deals the hand back up to three cards, so every hand has
+# three cards and three dice
+HAND_SIZE = 3
+# rng.choice(FACES) draws exactly as rng.choice(POKER_DICE) does, as an index
+FACES = range(len(POKER_DICE))
+
+
+def _draw_die(getrandbits):
+    # rng.choice(FACES) spelled out for a plain random.Random: Random._randbelow
+    # takes 3-bit draws until one is below 6. A roll then costs one C call
+    # instead of three Python-level ones, and likewise for the shuffle.
+    face = getrandbits(3)
+    while face >= 6:
+        face = getrandbits(3)
+    return face
+
+
+# (index, bound, bits) of each swap Random.shuffle makes over a full shoe
+SHUFFLE_STEPS = [(i, i + 1, (i + 1).bit_length()) for i in reversed(range(1, len(SHOE)))]
+
+
+def _shuffle_shoe(shoe, getrandbits):
+    # rng.shuffle(shoe) spelled out the same way
+    for i, bound, bits in SHUFFLE_STEPS:
+        j = getrandbits(bits)
+        while j >= bound:
+            j = getrandbits(bits)
+        shoe[i], shoe[j] = shoe[j], shoe[i]
+
+
+def _inline_draws_match():
+    a, b = random.Random(0), random.Random(0)
+    for _ in range(4):
+        expected, shoe = bytearray(SHOE), bytearray(SHOE)
+        a.shuffle(expected)
+        _shuffle_shoe(shoe, b.getrandbits)
+        if shoe != expected:
+            return False
+    return all(a.choice(FACES) == _draw_die(b.getrandbits) for _ in range(256))
+
+
+# Checked once against this Python's random module; other rng types, or a
+# random module that draws differently, go through rng.choice
+INLINE_DRAWS = _inline_draws_match()
+
+
+def _build_roll_costs():
+    # [roll_count, score >= REROLL_COST, any die unkept] -> points charged
+    # for ROLL, or -1 when the roll is not allowed. Row 0 is the first roll
+    # of a hole, which is free.
+    max_rolls = max_rolls_for(HAND_SIZE)
+    table = np.zeros((max_rolls + 1, 2, 2), dtype=np.int32)
+    for roll_count in range(1, max_rolls + 1):
+        for can_pay in (0, 1):
+            for unkept in (0, 1):
+                cost = reroll_cost(
+                    HAND_SIZE,
+                    roll_count,
+                    max_rolls,
+                    REROLL_COST if can_pay else 0,
+                    [not unkept] + [True] * (HAND_SIZE - 1),
+                )
+                table[roll_count, can_pay, unkept] = -1 if cost is None else cost
+    return table
+
+
+ROLL_COSTS = _build_roll_costs()
+# Hand columns kept by each discard action, in hand order
+KEPT_COLUMNS = {
+    mask: [i for i in range(HAND_SIZE) if not mask >> i & 1] for mask in range(DISCARD, KEEP)
+}
+
+
+class VectorEnv:
+    def __init__(self, max_holes, rngs):
+        # max_holes: one mode for all games or one per game; rngs: one
+        # random.Random per game
+        self.rngs = list(rngs)
+        n = self.n = len(self.rngs)
+        self.max_holes = np.broadcast_to(np.asarray(max_holes, dtype=np.int32), (n,)).copy()
+        self.shoe = np.empty((n, len(SHOE)), dtype=np.uint8)
+        # Shoe cursor: cards shoe[:size] are still to be dealt, from the end
+        self.size = np.zeros(n, dtype=np.int32)
+        self.counts = np.empty((n, NUM_CARDS), dtype=np.uint8)
+        self.hands = np.empty((n, HAND_SIZE), dtype=np.uint8)
+        # Face indices into POKER_DICE, PAD before the hole's first roll
+        self.dice = np.full((n, HAND_SIZE), PAD, dtype=np.uint8)
+        self.kept = np.zeros((n, HAND_SIZE), dtype=bool)
+        self.roll_count = np.zeros(n, dtype=np.int32)
+        self.discarded = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.round = np.ones(n, dtype=np.int32)
+        # Final score of each game's last finished game
+        self.final_scores = np.zeros(n, dtype=np.int32)
+        self._new_games(np.arange(n))
+
+    def _new_shoe(self, env):
+        # Deck.reset for one game: a full shoe shuffled by its rng
+        shoe = bytearray(SHOE)
+        rng = self.rngs[env]
+        if INLINE_DRAWS and type(rng) is random.Random:
+            _shuffle_shoe(shoe, rng.getrandbits)
+        else:
+            rng.shuffle(memoryview(shoe))
+        self.shoe[env] = np.frombuffer(shoe, dtype=np.uint8)
+        self.size[env] = len(SHOE)
+        self.counts[env] = np.frombuffer(SHOE_COUNTS, dtype=np.uint8)
+
+    def _deal(self, rows, count):
+        # Deck.deal(count) for each game in rows, reshuffling the shoes that
+        # run short; returns the cards, shape (len(rows), count)
+        for env in rows[self.size[rows] < count].tolist():
+            self._new_shoe(env)
+        positions = self.size[rows, None] - 1 - np.arange(count)
+        cards = self.shoe[rows[:, None], positions]
+        self.size[rows] -= count
+        np.subtract.at(self.counts, (rows[:, None], cards), 1)
+        return cards
+
+    def _new_holes(self, rows):
+        self.hands[rows] = self._deal(rows, HAND_SIZE)
+        self.dice[rows] = PAD
+        self.kept[rows] = False
+        self.roll_count[rows] = 0
+        self.discarded[rows] = False
+
+    def _new_games(self, rows):
+        for env in rows.tolist():
+            self._new_shoe(env)
+        self.score[rows] = 0
+        self.round[rows] = 1
+        self._new_holes(rows)
+
+    def roll_costs(self):
+        # Points ROLL would charge per game, -1 where it is not allowed
+        return ROLL_COSTS[
+            self.roll_count,
+            (self.score >= REROLL_COST).astype(np.intp),
+            (~self.kept.all(axis=1)).astype(np.intp),
+        ]
+
+    def legal_actions(self):
+        # (N, NUM_ACTIONS) bool mask of the actions the rules allow now
+        rolled = self.roll_count > 0
+        legal = np.empty((self.n, NUM_ACTIONS), dtype=bool)
+        legal[:, NOOP] = True
+        legal[:, DISCARD:KEEP] = (~self.discarded & ~rolled)[:, None]
+        legal[:, KEEP:ROLL] = rolled[:, None]
+        legal[:, ROLL] = self.roll_costs() >= 0
+        legal[:, LOCK] = rolled
+        return legal
+
+    def step(self, actions):
+        # Returns (rewards, dones): each game's score change and whether its
+        # game finished this step. A finished game's score is in final_scores
+        # and it has already been replaced by a new game.
+        actions = np.asarray(actions)
+        if actions.shape != (self.n,):
+            raise ValueError(f"actions must have shape ({self.n},), got {actions.shape}")
+        if actions.size and (actions.min() < 0 or actions.max() >= NUM_ACTIONS):
+            raise ValueError(f"actions must be in 0..{NUM_ACTIONS - 1}")
+        rows = np.arange(self.n)
+        actions = np.where(self.legal_actions()[rows, actions], actions, NOOP)
+        rewards = np.zeros(self.n, dtype=np.int32)
+        dones = np.zeros(self.n, dtype=bool)
+
+        for mask, columns in KEPT_COLUMNS.items():
+            rows = np.flatnonzero(actions == mask)
+            if rows.size:
+                dealt = self._deal(rows, HAND_SIZE - len(columns))
+                self.hands[rows] = np.concatenate([self.hands[rows][:, columns], dealt], axis=1)
+                self.discarded[rows] = True
+
+        rows = np.flatnonzero((actions >= KEEP) & (actions < ROLL))
+        self.kept[rows, actions[rows] - KEEP] ^= True
+
+        rows = np.flatnonzero(actions == ROLL)
+        if rows.size:
+            cost = self.roll_costs()[rows]
+            self.score[rows] -= cost
+            rewards[rows] -= cost
+            dice = self.dice[rows].tolist()
+            kept = self.kept[rows].tolist()
+            for i, env in enumerate(rows.tolist()):
+                rng = self.rngs[env]
+                if INLINE_DRAWS and type(rng) is random.Random:
+                    getrandbits = rng.getrandbits
+                    dice[i] = [
+                        die if keep else _draw_die(getrandbits) for die, keep in zip(dice[i], kept[i])
+                    ]
+                else:
+                    choice = rng.choice
+                    dice[i] = [die if keep else choice(FACES) for die, keep in zip(dice[i], kept[i])]
+            self.dice[rows] = dice
+            self.roll_count[rows] += 1
+
+        rows = np.flatnonzero(actions == LOCK)
+        if rows.size:
+            _, base = score_hands_batch(self.hands[rows])
+            points = base * multipliers_batch(self.hands[rows], self.dice[rows]).astype(np.int32)
+            self.score[rows] += points
+            rewards[rows] += points
+            self.round[rows] += 1
+            over = self.round[rows] > self.max_holes[rows]
+            finished = rows[over]
+            dones[finished] = True
+            self.final_scores[finished] = self.score[finished]
+            self._new_games(finished)
+            self._new_holes(rows[~over])
+        return rewards, dones
+
+
+def step_game(game, action):
+    # The same action on a GameState: the scalar reference for VectorEnv.
+    # Returns (reward, done); the caller starts the next game when done.
+    before = game.score
+    if DISCARD <= action < KEEP:
+        for i in range(len(game.hand)):
+            if action >> i & 1:
+                game.toggle_select(i)
+        game.discard()
+    elif KEEP <= action < ROLL:
+        game.toggle_keep(action - KEEP)
+    elif action == ROLL:
+        game.roll()
+    elif action == LOCK and game.lock_in() is not None:
+        return game.score - before, game.is_over()
+    return game.score - before, False
+
+
+def random_actions(legal, rng):
+    # One uniformly random allowed action per game (rng: numpy Generator)
+    return np.argmax(np.where(legal, rng.random(legal.shape), -1), axis=1)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import checks
+
+    sys.exit(checks.run("vecenv"))
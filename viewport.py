@@ -0,0 +1,184 @@
+# Fits the game's fixed logical canvas into a window of any size. The canvas
+# keeps its aspect ratio, is scaled uniformly to the largest size that fits
+# and centred (letterboxed). The game draws straight into it at the window's
+# real resolution, with images, fonts and sprites already scaled for that
+# canvas size, so no frame scales anything.
+#
+# Each canvas size gets its own set of assets, kept in a ResolutionCache. A
+# set is built by a generator that yields between steps; step() runs the
+# pending build for a few milliseconds a frame, so a resize never stalls a
+# frame, and the set in use keeps drawing until the new one is complete.
+# A step can also yield a callable, which runs on a worker thread while the
+# frames go on, its result sent back into the generator. That is for pixel
+# work pygame does without holding the GIL, like smoothscale into a surface
+# allocated beforehand. Worker jobs must not create pygame objects: with
+# pygame 2.6.1, Surfaces made off the main thread (image.load, Surface())
+# intermittently corrupted reference counts in the main loop.
+#
+# Big surfaces are not made with pygame.Surface() in a build: SDL clears the
+# pixels as it allocates them, one step of about 16 ms for a 4K canvas.
+# allocate() maps the memory and touches it a slice per step instead.
+import mmap
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import pygame
+
+
+class Scale:
+    # Maps logical lengths, sizes and rects to canvas pixels
+    def __init__(self, factor):
+        self.factor = factor
+
+    def __call__(self, n):
+        # Positive lengths stay at least a pixel, so thin lines survive
+        # small scales
+        if n > 0:
+            return max(1, round(n * self.factor))
+        return round(n * self.factor)
+
+    def size(self, size):
+        return self(size[0]), self(size[1])
+
+    def rect(self, rect):
+        # Scales the edges rather than the width and height, so rects that
+        # touch in logical space still touch on the canvas
+        x, y, width, height = rect
+        left, top = round(x * self.factor), round(y * self.factor)
+        right, bottom = round((x + width) * self.factor), round((y + height) * self.factor)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+
+def run_steps(steps):
+    # Drive a build generator to the end on this thread, running the work
+    # it hands out inline; returns the generator's result
+    result = None
+    while True:
+        try:
+            work = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result = work() if work is not None else None
+
+
+# allocate() makes surfaces of up to ALLOCATE_AT_ONCE bytes in one step (SDL
+# clears them at roughly 0.6 ms per MB), bigger ones ALLOCATE_STEP at a time
+ALLOCATE_AT_ONCE = 1 << 23
+ALLOCATE_STEP = 1 << 21
+
+
+def allocate(size, alpha=False):
+    # Generator: a cleared 32-bit Surface of the given size, with per-pixel
+    # alpha (the convert_alpha() format) or opaque. A small one is an
+    # ordinary Surface, an opaque one in the display format. A bigger
+    # one is an anonymous mapping (zeroed by the kernel on first touch)
+    # whose pages are touched a slice per step, wrapped as BGRA; blitting
+    # that to the display converts rather than copies, a little slower, but
+    # no step pays for all of it. The Surface keeps the mapping alive.
+    width, height = size
+    total = width * height * 4
+    if total <= ALLOCATE_AT_ONCE:
+        if alpha:
+            return pygame.Surface(size, pygame.SRCALPHA, 32)
+        return pygame.Surface(size, 0, pygame.display.get_surface())
+    pixels = mmap.mmap(-1, total)
+    for start in range(0, total, ALLOCATE_STEP):
+        pages = range(start, min(start + ALLOCATE_STEP, total), mmap.PAGESIZE)
+        pixels[pages.start : pages.stop : pages.step] = bytes(len(pages))
+        yield
+    surface = pygame.image.frombuffer(pixels, (width, height), "BGRA")
+    if not alpha:
+        surface.set_alpha(None)
+    return surface
+
+
+def fit(logical_size, window_size):
+    # (scale factor, canvas size) for the largest uniform scale of the
+    # logical canvas that fits the window
+    width, height = logical_size
+    factor = min(window_size[0] / width, window_size[1] / height)
+    return factor, (max(1, round(width * factor)), max(1, round(height * factor)))
+
+
+def letterbox(size, window_size):
+    # Rect of a canvas of the given size centred in the window, clipped to
+    # it (a canvas built for a bigger window is cropped until replaced)
+    rect = pygame.Rect((0, 0), size)
+    rect.center = (window_size[0] // 2, window_size[1] // 2)
+    return rect.clip(pygame.Rect((0, 0), window_size))
+
+
+class ResolutionCache:
+    def __init__(self, build, max_sets=2):
+        # build(factor, size) returns a generator that yields between build
+        # steps and returns the finished set. The max_sets most recently
+        # used sets are kept, so resizing back and forth costs nothing.
+        self.build = build
+        self.max_sets = max_sets
+        self.sets = OrderedDict()
+        self.pending = None
+        self.waiting = None
+        self.worker = None
+
+    def _store(self, size, assets):
+        self.sets[size] = assets
+        self.sets.move_to_end(size)
+        while len(self.sets) > self.max_sets:
+            self.sets.popitem(last=False)
+        return assets
+
+    def get(self, factor, size):
+        # The set for size, built now if needed (startup)
+        assets = self.request(factor, size)
+        if assets is None:
+            _, job = self.pending
+            self.pending = None
+            assets = self._store(size, run_steps(job))
+        return assets
+
+    def request(self, factor, size):
+        # The set for size if it is cached; otherwise start building it in
+        # place of any other pending build and return None
+        assets = self.sets.get(size)
+        if assets is not None:
+            self.sets.move_to_end(size)
+            self.pending = self.waiting = None
+            return assets
+        if self.pending is None or self.pending[0] != size:
+            # An abandoned build's worker job just finishes unused
+            self.pending = (size, self.build(factor, size))
+            self.waiting = None
+        return None
+
+    def building(self):
+        return self.pending is not None
+
+    def step(self, budget_ms):
+        # Run the pending build for about budget_ms (at least one step, if
+        # it is not waiting on the worker). Returns the set once it is
+        # finished, else None.
+        if self.pending is None:
+            return None
+        result = None
+        if self.waiting is not None:
+            if not self.waiting.done():
+                return None
+            result = self.waiting.result()
+            self.waiting = None
+        size, job = self.pending
+        deadline = perf_counter() + budget_ms / 1000
+        try:
+            while True:
+                work = job.send(result)
+                result = None
+                if work is not None:
+                    if self.worker is None:
+                        self.worker = ThreadPoolExecutor(1, thread_name_prefix="assets")
+                    self.waiting = self.worker.submit(work)
+                    return None
+                if perf_counter() >= deadline:
+                    return None
+        except StopIteration as done:
+            self.pending = None
+            return self._store(size, done.value)